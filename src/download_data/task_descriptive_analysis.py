@@ -6,6 +6,7 @@ import pytask
 import seaborn as sns
 
 from src.config import BLD
+from src.simulation_analysis.rendering import render_figures
 
 PLOT_ARGS = {"markersize": 4, "alpha": 0.6}
 
@@ -58,6 +59,7 @@ def plot_historical_timeseries(euro_usd_pd, path):
 
     # save result to folder
     fig.savefig(path)
+    plt.close(fig)
 
 
 @pytask.mark.depends_on(BLD / "historical_data" / "raw_data.pickle")
@@ -68,4 +70,4 @@ def task_descriptive_analysis(depends_on, produces):
     with open(depends_on, "rb") as f:
         raw_data = pickle.load(f)
 
-    plot_historical_timeseries(raw_data, produces)
+    render_figures([(plot_historical_timeseries, (raw_data, produces))])
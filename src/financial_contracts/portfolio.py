@@ -0,0 +1,127 @@
+"""
+Revalues a book of outstanding currency swap contracts.
+
+Every row of a book is one contract: certificate pairs issued at
+start_exchange_rate on issue_date with the given leverage and
+USD_asset_allocation, redeemed at maturity. All contracts are valued together
+as arrays (see payout_currency_swap_array, which broadcasts the contract terms
+against the exchange rates), so the cost of a date is one vectorized pass over
+the book and never a Python loop per contract.
+
+Deposits of a contract earn the daily deposit rates from its issue date on
+(see deposit_growth). A contract is part of the book from its issue date up to
+and including its maturity.
+"""
+import numpy as np
+import pandas as pd
+
+from src.financial_contracts.swap_contract import deposit_growth
+from src.financial_contracts.swap_contract import payout_currency_swap_array
+
+BOOK_COLUMNS = [
+    "start_exchange_rate",
+    "leverage",
+    "USD_asset_allocation",
+    "issue_date",
+    "maturity",
+]
+EXPOSURE_COLUMNS = [
+    "outstanding",
+    "EURlong value in USD",
+    "EURshort value in USD",
+    "EURO deposits",
+    "USD deposits",
+    "negative_value",
+]
+
+
+def _daily_growth(daily_rate, dates):
+    # value of one unit deposited before the first date after each date
+    if np.ndim(daily_rate) == 0:
+        daily_rate = np.full(len(dates), daily_rate, dtype=np.float64)
+    else:
+        daily_rate = pd.Series(daily_rate).reindex(dates).to_numpy()
+        assert not np.isnan(daily_rate).any(), "Deposit rate missing on some dates"
+    return deposit_growth(daily_rate)
+
+
+def revalue_book(book, exchange_rate, euro_deposit_rate=0.0, usd_deposit_rate=0.0):
+    """Aggregated exposures of a book of contracts on every date of an exchange rate
+    path or of a set of exchange rate scenarios.
+
+    Args:
+        book (pd.DataFrame): one contract per row with the terms BOOK_COLUMNS and
+        optionally "notional" (number of certificate pairs, 1 if missing).
+        exchange_rate (pd.Series or pd.DataFrame): EURO/USD exchange rate indexed by
+        date (rate path) or one scenario per row and one date per column (scenario
+        set).
+        euro_deposit_rate (float or pd.Series): simple return of euro deposits per
+        day (indexed by date if it varies).
+        usd_deposit_rate (float or pd.Series): simple return of usd deposits per day.
+
+    Returns:
+        (pd.DataFrame): per date (and scenario) the number of outstanding
+        certificate pairs, the value of all EURlong and EURshort certificates (in
+        USD), the EURO and USD deposits held as collateral and the number of pairs
+        with a certificate of negative value.
+    """
+    missing = set(BOOK_COLUMNS) - set(book.columns)
+    assert not missing, f"Book misses contract terms {sorted(missing)}"
+    is_path = isinstance(exchange_rate, pd.Series)
+    rates = exchange_rate.to_frame().T if is_path else exchange_rate
+    dates = pd.DatetimeIndex(rates.columns)
+    assert dates.is_monotonic_increasing, "Dates of the exchange rate must be sorted"
+    rate_values = rates.to_numpy(dtype=np.float64)
+
+    # contract terms as arrays, broadcast against the scenarios (rows)
+    start_exchange_rate = book["start_exchange_rate"].to_numpy(dtype=np.float64)
+    leverage = book["leverage"].to_numpy(dtype=np.float64)
+    USD_asset_allocation = book["USD_asset_allocation"].to_numpy(dtype=np.float64)
+    notional = (
+        book["notional"].to_numpy(dtype=np.float64)
+        if "notional" in book.columns
+        else np.ones(len(book))
+    )
+    # position of the first date on / the last date before the term
+    issue_position = dates.searchsorted(pd.DatetimeIndex(book["issue_date"]))
+    maturity_position = (
+        dates.searchsorted(pd.DatetimeIndex(book["maturity"]), side="right") - 1
+    )
+
+    euro_growth = _daily_growth(euro_deposit_rate, dates)
+    usd_growth = _daily_growth(usd_deposit_rate, dates)
+    issue_day = np.minimum(issue_position, len(dates) - 1)
+    euro_deposits = 2 * (1 - USD_asset_allocation) / start_exchange_rate
+    usd_deposits = 2 * USD_asset_allocation
+
+    exposures = np.zeros((len(rates), len(dates), len(EXPOSURE_COLUMNS)))
+    for day in range(len(dates)):
+        weight = notional * (issue_position <= day) * (day <= maturity_position)
+        return_on_euro_deposits = euro_growth[day] / euro_growth[issue_day] - 1
+        return_on_usd_deposits = usd_growth[day] / usd_growth[issue_day] - 1
+        eurlong_value, eurshort_value = payout_currency_swap_array(
+            rate_values[:, day, np.newaxis],
+            start_exchange_rate,
+            USD_asset_allocation,
+            leverage,
+            return_on_euro_deposits,
+            return_on_usd_deposits,
+        )
+        is_negative = (eurlong_value < 0) | (eurshort_value < 0)
+        exposures[:, day, 0] = weight.sum()
+        exposures[:, day, 1] = eurlong_value @ weight
+        exposures[:, day, 2] = eurshort_value @ weight
+        exposures[:, day, 3] = euro_deposits * (1 + return_on_euro_deposits) @ weight
+        exposures[:, day, 4] = usd_deposits * (1 + return_on_usd_deposits) @ weight
+        exposures[:, day, 5] = is_negative @ weight
+
+    if is_path:
+        return pd.DataFrame(exposures[0], index=dates, columns=EXPOSURE_COLUMNS)
+    index = pd.MultiIndex.from_product(
+        [rates.index, dates], names=[rates.index.name or "scenario", "date"]
+    )
+    return pd.DataFrame(
+        exposures.reshape(-1, len(EXPOSURE_COLUMNS)),
+        index=index,
+        columns=EXPOSURE_COLUMNS,
+    )
@@ -0,0 +1,240 @@
+"""
+Keeps the values of live contracts up to date as EURO/USD quotes arrive.
+
+The state of a book is a dictionary of contiguous arrays with one entry per
+contract (terms, deposits, collateral, payout factors, certificate values,
+wipe-out flags and preallocated scratch arrays and masks). update_stream_state
+revalues every contract for a new quote with a fixed number of in-place array
+operations (out=), so one quote costs O(contracts) vectorized work and allocates
+no arrays. The arithmetic is the one of
+payout_currency_swap_array with the accrued deposit returns folded into the
+deposits (see accrue_deposits).
+
+A contract is wiped out the first time one of its certificates is worth at most
+the barrier (see knock_out_day). From then on its values stay at the value of
+that quote, floored at zero.
+
+replay_ticks feeds a CSV file of quotes through the state as a stand-in for a
+live feed and measures the sustained number of updates per second::
+
+    python -m src.financial_contracts.streaming book.csv ticks.csv
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+STATE_ARRAYS = [
+    "collateral",
+    "eurlong_factor",
+    "eurshort_factor",
+    "eurlong_value",
+    "eurshort_value",
+    "scratch_eurlong",
+    "scratch_eurshort",
+]
+STATE_MASKS = ["is_live", "is_wiped_out", "scratch_mask"]
+
+
+def init_stream_state(book):
+    """Per-contract state of a book before the first quote.
+
+    Args:
+        book (pd.DataFrame): one contract per row with start_exchange_rate, leverage,
+        USD_asset_allocation and optionally notional (number of certificate pairs,
+        1 if missing).
+
+    Returns:
+        (dict): contract terms, deposits, collateral, payout factors, certificate
+        values (in USD) and wipe-out flags as np.arrays, plus the last quote and the
+        number of updates.
+    """
+    leverage = book["leverage"].to_numpy(dtype=np.float64)
+    USD_asset_allocation = book["USD_asset_allocation"].to_numpy(dtype=np.float64)
+    assert np.all(leverage > 1), "Leverage factor must be higher than 1"
+    assert np.all(
+        (0 <= USD_asset_allocation) & (USD_asset_allocation <= 1)
+    ), "Share of assets invested must be positive"
+
+    start_exchange_rate = book["start_exchange_rate"].to_numpy(dtype=np.float64)
+    n_contracts = len(book)
+    state = {
+        "start_exchange_rate": start_exchange_rate,
+        "leverage": leverage,
+        "notional": (
+            book["notional"].to_numpy(dtype=np.float64)
+            if "notional" in book.columns
+            else np.ones(n_contracts)
+        ),
+        # allocate assets (see _redeem_certificates)
+        "euro_deposits": 2 * (1 - USD_asset_allocation) / start_exchange_rate,
+        "usd_deposits": 2 * USD_asset_allocation,
+        "wiped_out": np.zeros(n_contracts, dtype=bool),
+        "last_quote": np.nan,
+        "n_updates": 0,
+    }
+    for name in STATE_ARRAYS:
+        state[name] = np.zeros(n_contracts)
+    for name in STATE_MASKS:
+        state[name] = np.zeros(n_contracts, dtype=bool)
+    _update_collateral_ex_premium(state)
+    # certificates are worth half the collateral at issue
+    state["eurlong_value"][:] = state["collateral_ex_premium"] / 2
+    state["eurshort_value"][:] = state["collateral_ex_premium"] / 2
+    return state
+
+
+def _update_collateral_ex_premium(state):
+    # collateral valued at the start exchange rate
+    state["collateral_ex_premium"] = (
+        state["usd_deposits"] + state["euro_deposits"] * state["start_exchange_rate"]
+    )
+
+
+def accrue_deposits(state, return_on_euro_deposits, return_on_usd_deposits):
+    """Let the deposits of all contracts earn one period's return, e.g. at the end
+    of a trading day. Values change with the next quote.
+
+    Args:
+        state (dict): state of the book (see init_stream_state), updated in place.
+        return_on_euro_deposits (float or np.array): Return on euro deposits.
+        return_on_usd_deposits (float or np.array): Return on usd deposits.
+    """
+    state["euro_deposits"] *= 1 + return_on_euro_deposits
+    state["usd_deposits"] *= 1 + return_on_usd_deposits
+    _update_collateral_ex_premium(state)
+
+
+def update_stream_state(state, exchange_rate, barrier=0.0):
+    """Revalue all contracts for a new EURO/USD quote.
+
+    Args:
+        state (dict): state of the book (see init_stream_state), updated in place.
+        exchange_rate (float): current EURO/USD exchange rate.
+        barrier (float): wipe-out level of the certificate values.
+    """
+    start_exchange_rate = state["start_exchange_rate"]
+    collateral = state["collateral"]
+    collateral_ex_premium = state["collateral_ex_premium"]
+    eurlong_factor, eurshort_factor = state["eurlong_factor"], state["eurshort_factor"]
+    eurlong, eurshort = state["scratch_eurlong"], state["scratch_eurshort"]
+    is_live, is_wiped_out = state["is_live"], state["is_wiped_out"]
+    scratch_mask = state["scratch_mask"]
+
+    # current value of collateral
+    np.multiply(state["euro_deposits"], exchange_rate, out=collateral)
+    collateral += state["usd_deposits"]
+
+    # payout factors (see _get_payout_factor)
+    np.subtract(exchange_rate, start_exchange_rate, out=eurlong_factor)
+    eurlong_factor /= start_exchange_rate
+    eurlong_factor *= state["leverage"]
+    eurlong_factor += 1
+    np.subtract(2, eurlong_factor, out=eurshort_factor)
+
+    # certificate values: half the collateral ex premium each, premium to EURshort
+    np.multiply(eurlong_factor, collateral_ex_premium, out=eurlong)
+    eurlong /= 2
+    np.multiply(eurshort_factor, collateral_ex_premium, out=eurshort)
+    eurshort /= 2
+    eurshort += collateral
+    eurshort -= collateral_ex_premium
+
+    # wiped-out contracts keep their value
+    np.logical_not(state["wiped_out"], out=is_live)
+    np.copyto(state["eurlong_value"], eurlong, where=is_live)
+    np.copyto(state["eurshort_value"], eurshort, where=is_live)
+    np.less_equal(eurlong, barrier, out=is_wiped_out)
+    np.less_equal(eurshort, barrier, out=scratch_mask)
+    np.logical_or(is_wiped_out, scratch_mask, out=is_wiped_out)
+    np.logical_and(is_wiped_out, is_live, out=is_wiped_out)
+    np.logical_or(state["wiped_out"], is_wiped_out, out=state["wiped_out"])
+    np.maximum(state["eurlong_value"], 0, out=state["eurlong_value"], where=is_wiped_out)
+    np.maximum(
+        state["eurshort_value"], 0, out=state["eurshort_value"], where=is_wiped_out
+    )
+
+    state["last_quote"] = exchange_rate
+    state["n_updates"] += 1
+
+
+def stream_exposures(state):
+    """Aggregated exposures of the book at the last quote.
+
+    Args:
+        state (dict): state of the book (see init_stream_state).
+
+    Returns:
+        (pd.Series): last quote, value of all EURlong and EURshort certificates (in
+        USD), collateral (in USD) and number of wiped-out certificate pairs.
+    """
+    notional = state["notional"]
+    return pd.Series(
+        {
+            "exchange_rate": state["last_quote"],
+            "EURlong value in USD": state["eurlong_value"] @ notional,
+            "EURshort value in USD": state["eurshort_value"] @ notional,
+            "collateral in USD": state["collateral"] @ notional,
+            "wiped_out": notional[state["wiped_out"]].sum(),
+        }
+    )
+
+
+def replay_ticks(
+    state,
+    tick_path,
+    euro_deposit_rate=0.0,
+    usd_deposit_rate=0.0,
+    barrier=0.0,
+    chunk_size=100_000,
+):
+    """Feed a CSV file of quotes through the state as a stand-in for a live feed.
+    Deposits accrue one day's return whenever the date of the quotes changes.
+
+    Args:
+        state (dict): state of the book (see init_stream_state), updated in place.
+        tick_path (pathlib.Path): CSV file with columns timestamp and exchange_rate,
+        sorted by timestamp.
+        euro_deposit_rate (float): simple return of euro deposits per day.
+        usd_deposit_rate (float): simple return of usd deposits per day.
+        barrier (float): wipe-out level of the certificate values.
+        chunk_size (int): number of ticks read from the file at once.
+
+    Returns:
+        (dict): number of updates, seconds spent updating (reading the file
+        excluded) and sustained updates per second.
+    """
+    n_updates, update_time = 0, 0.0
+    last_date = None
+    for ticks in pd.read_csv(
+        tick_path, parse_dates=["timestamp"], chunksize=chunk_size
+    ):
+        dates = ticks["timestamp"].dt.normalize().to_numpy()
+        exchange_rates = ticks["exchange_rate"].to_numpy(dtype=np.float64)
+
+        start = time.perf_counter()
+        for date, exchange_rate in zip(dates, exchange_rates):
+            if last_date is not None and date != last_date:
+                accrue_deposits(state, euro_deposit_rate, usd_deposit_rate)
+            last_date = date
+            update_stream_state(state, exchange_rate, barrier)
+        update_time += time.perf_counter() - start
+        n_updates += len(ticks)
+
+    return {
+        "n_updates": n_updates,
+        "seconds": update_time,
+        "updates_per_second": n_updates / update_time if update_time > 0 else np.nan,
+    }
+
+
+if __name__ == "__main__":
+    book_path, tick_path = sys.argv[1:3]
+    state = init_stream_state(pd.read_csv(book_path))
+    statistics = replay_ticks(state, tick_path)
+    print(stream_exposures(state).to_string())
+    print(
+        f"{statistics['n_updates']} updates of {len(state['leverage'])} contracts in "
+        f"{statistics['seconds']:.3f}s ({statistics['updates_per_second']:.0f}/s)"
+    )
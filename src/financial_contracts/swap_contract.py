@@ -1,10 +1,31 @@
+import numpy as np
 import pandas as pd
 
+try:
+    import numba
+    from numba.extending import register_jitable
+except ImportError:
+    numba = None
 
+    def register_jitable(func):
+        return func
+
+
+PAYOUT_SUM_COLUMNS = [
+    "negative_payout",
+    "EURlong payout in USD",
+    "EURshort payout in USD",
+    "EURlong payout in EURO",
+    "EURshort payout in EURO",
+]
+
+
+@register_jitable
 def _convert_to_USD(exchange_rate, EURO_amount):
     return EURO_amount * exchange_rate
 
 
+@register_jitable
 def _get_collateral_value(
     euro_deposits,
     usd_deposits,
@@ -19,6 +40,7 @@ def _get_collateral_value(
     return total_deposits
 
 
+@register_jitable
 def _apply_return(
     euro_deposits, usd_deposits, return_on_euro_deposits, return_on_usd_deposits
 ):
@@ -27,6 +49,7 @@ def _apply_return(
     return euro_deposits, usd_deposits
 
 
+@register_jitable
 def _get_payout_factor(exchange_rate, start_exchange_rate, leverage):
     EURlong_payout_fac = (
         1 + (exchange_rate - start_exchange_rate) / start_exchange_rate * leverage
@@ -35,7 +58,8 @@ def _get_payout_factor(exchange_rate, start_exchange_rate, leverage):
     return EURlong_payout_fac, EURshort_payout_fac
 
 
-def payout_currency_swap(
+@register_jitable
+def _redeem_certificates(
     final_exchange_rate,
     start_exchange_rate,
     USD_asset_allocation,
@@ -43,23 +67,6 @@ def payout_currency_swap(
     return_on_euro_deposits,
     return_on_usd_deposits,
 ):
-    """
-    Simulates payoff profile of some currency swap contract.
-
-    Args:
-        final_exchange_rate (pd.Series): Final EURO/USD exchange rate.
-        start_exchange_rate (float): Initial EURO/USD exchange rate.
-        USD_asset_allocation (float): Share of assets invested in USD. Must be between 0 and 1.
-        leverage (float): Leverage factor of the currency swap. Must be larger than 1.
-        return_on_euro_deposits (float): Return on euro deposits.
-        return_on_usd_deposits (float): Return on usd deposits.
-
-    Returns:
-        EURpayout (pd.DataFrame): Payout of EURlong / EURshort certificate
-    """
-    assert leverage > 1, "Leverage factor must be higher than 1"
-    assert 0 <= USD_asset_allocation <= 1, "Share of assets invested must be positive"
-
     # allocate assets
     euro_deposits = 2 * (1 - USD_asset_allocation) / start_exchange_rate
     usd_deposits = 2 * USD_asset_allocation
@@ -89,8 +96,439 @@ def payout_currency_swap(
     # redeem EURlong, EURshort
     eurlong_payout = EURlong_payout_fac * collateral_ex_premium / 2
     eurshort_payout = EURshort_payout_fac * collateral_ex_premium / 2 + forex_premium
-    pd.testing.assert_series_equal(
-        eurlong_payout.add(eurshort_payout), collateral, atol=0.0001
+
+    return eurlong_payout, eurshort_payout
+
+
+def payout_currency_swap_array(
+    final_exchange_rate,
+    start_exchange_rate,
+    USD_asset_allocation,
+    leverage,
+    return_on_euro_deposits,
+    return_on_usd_deposits,
+):
+    """
+    Simulates payoff profile of some currency swap contract on plain arrays.
+
+    Args:
+        final_exchange_rate (np.array): Final EURO/USD exchange rates (any shape).
+        start_exchange_rate (float): Initial EURO/USD exchange rate.
+        USD_asset_allocation (float or np.array): Share of assets invested in USD.
+        Must be between 0 and 1. Arrays are broadcast against final_exchange_rate.
+        leverage (float or np.array): Leverage factor of the currency swap. Must be
+        larger than 1. Arrays are broadcast against final_exchange_rate.
+        return_on_euro_deposits (float or np.array): Return on euro deposits.
+        return_on_usd_deposits (float or np.array): Return on usd deposits. Arrays of
+        deposit returns are broadcast like leverage.
+
+    Returns:
+        eurlong_payout (np.array): Payout of EURlong certificate.
+        eurshort_payout (np.array): Payout of EURshort certificate.
+    """
+    assert np.all(np.asarray(leverage) > 1), "Leverage factor must be higher than 1"
+    assert np.all(
+        (0 <= np.asarray(USD_asset_allocation))
+        & (np.asarray(USD_asset_allocation) <= 1)
+    ), "Share of assets invested must be positive"
+    final_exchange_rate = np.asarray(final_exchange_rate, dtype=np.float64)
+
+    return _redeem_certificates(
+        final_exchange_rate,
+        start_exchange_rate,
+        USD_asset_allocation,
+        leverage,
+        return_on_euro_deposits,
+        return_on_usd_deposits,
+    )
+
+
+def deposit_growth(daily_rates):
+    """
+    Growth of deposits earning time-varying daily rates, compounded day by day
+    (cumulative product over the day axis).
+
+    Args:
+        daily_rates (np.array(..., T)): simple deposit return of each day, e.g. one
+        row per simulated path.
+
+    Returns:
+        (np.array(..., T)): value of one unit deposited at the start after each day.
+        The accrued return over the horizon, as used by payout_currency_swap_array,
+        is the last day minus one.
+    """
+    daily_rates = np.asarray(daily_rates, dtype=np.float64)
+    return np.cumprod(1 + daily_rates, axis=-1)
+
+
+def _accrued_return(deposit_return, n_days):
+    # deposit return accrued after each day: a horizon return is spread
+    # geometrically over the days, daily returns are compounded
+    if np.ndim(deposit_return) == 0:
+        return (1 + deposit_return) ** (np.arange(1, n_days + 1) / n_days) - 1
+    return deposit_growth(deposit_return) - 1
+
+
+def mark_to_market_array(
+    return_paths,
+    start_exchange_rate,
+    USD_asset_allocation,
+    leverage,
+    return_on_euro_deposits,
+    return_on_usd_deposits,
+):
+    """
+    Daily mark-to-market value of both certificates along simulated paths. Every
+    day the contract is valued as if it was redeemed at that day's exchange rate
+    with the deposit returns accrued so far.
+
+    Args:
+        return_paths (np.array(P, T)): daily logarithmic EURO/USD returns of each path.
+        start_exchange_rate (float): Initial EURO/USD exchange rate.
+        USD_asset_allocation (float): Share of assets invested in USD.
+        leverage (float): Leverage factor of the currency swap.
+        return_on_euro_deposits (float or np.array(P, T)): Return on euro deposits over
+        the whole horizon (accrued geometrically day by day) or daily returns of each
+        path (compounded, see deposit_growth).
+        return_on_usd_deposits (float or np.array(P, T)): Return on usd deposits, as
+        return_on_euro_deposits.
+
+    Returns:
+        eurlong_value (np.array(P, T)): Value of EURlong certificate after each day.
+        eurshort_value (np.array(P, T)): Value of EURshort certificate after each day.
+        The last day equals the payout at the final exchange rate.
+    """
+    return_paths = np.asarray(return_paths, dtype=np.float64)
+    n_days = return_paths.shape[-1]
+    # exchange rate after each day, as the final exchange rate of the payout stage
+    exchange_rate = start_exchange_rate + np.cumsum(return_paths, axis=-1)
+    return payout_currency_swap_array(
+        exchange_rate,
+        start_exchange_rate,
+        USD_asset_allocation,
+        leverage,
+        _accrued_return(return_on_euro_deposits, n_days),
+        _accrued_return(return_on_usd_deposits, n_days),
+    )
+
+
+def knock_out_day(value_paths, barrier=0.0):
+    """
+    First day on which a certificate's value touches the knock-out barrier. The
+    running minimum over the days is at or below the barrier from that day on, so
+    the first passage is the first index where it is.
+
+    Args:
+        value_paths (np.array(P, T)): value of a certificate after each day (see
+        mark_to_market_array).
+        barrier (float): knock-out level of the value (0: wiped out).
+
+    Returns:
+        (np.array(P,)): index of the knock-out day of each path, -1 if the
+        certificate survives the horizon.
+    """
+    is_knocked_out = np.minimum.accumulate(value_paths, axis=-1) <= barrier
+    return np.where(is_knocked_out[..., -1], np.argmax(is_knocked_out, axis=-1), -1)
+
+
+def apply_knock_out(value_paths, day):
+    """
+    Value paths of a knock-out certificate: from its knock-out day on the
+    certificate is terminated and redeemed at its value on that day. A negative
+    value on that day is the loss of a gap through the barrier.
+
+    Args:
+        value_paths (np.array(P, T)): value of a certificate after each day (see
+        mark_to_market_array).
+        day (np.array(P,)): knock-out day of each path, -1 if never (see
+        knock_out_day).
+
+    Returns:
+        (np.array(P, T)): value after each day with knock-out.
+    """
+    value_paths = np.asarray(value_paths, dtype=np.float64)
+    redemption = np.take_along_axis(
+        value_paths, np.maximum(day, 0)[:, np.newaxis], axis=-1
+    )
+    is_terminated = (day[:, np.newaxis] >= 0) & (
+        np.arange(value_paths.shape[-1]) >= day[:, np.newaxis]
+    )
+    return np.where(is_terminated, redemption, value_paths)
+
+
+def payout_coefficients(
+    start_exchange_rate,
+    USD_asset_allocation,
+    leverage,
+    return_on_euro_deposits,
+    return_on_usd_deposits,
+):
+    """
+    Both certificate payouts are affine in the final exchange rate:
+    payout = intercept + slope * final_exchange_rate. The coefficients are read off
+    two evaluations of the contract.
+
+    Args:
+        start_exchange_rate (float): Initial EURO/USD exchange rate.
+        USD_asset_allocation (float or np.array): Share of assets invested in USD.
+        leverage (float or np.array): Leverage factor of the currency swap.
+        return_on_euro_deposits (float): Return on euro deposits.
+        return_on_usd_deposits (float): Return on usd deposits.
+
+    Returns:
+        eurlong (tuple): intercept and slope (np.array) of the EURlong payout in USD.
+        eurshort (tuple): intercept and slope (np.array) of the EURshort payout in USD.
+    """
+    eurlong_intercept, eurshort_intercept = payout_currency_swap_array(
+        0.0,
+        start_exchange_rate,
+        USD_asset_allocation,
+        leverage,
+        return_on_euro_deposits,
+        return_on_usd_deposits,
+    )
+    eurlong_at_one, eurshort_at_one = payout_currency_swap_array(
+        1.0,
+        start_exchange_rate,
+        USD_asset_allocation,
+        leverage,
+        return_on_euro_deposits,
+        return_on_usd_deposits,
+    )
+    return (
+        (eurlong_intercept, eurlong_at_one - eurlong_intercept),
+        (eurshort_intercept, eurshort_at_one - eurshort_intercept),
+    )
+
+
+def _scenario_axis(return_on_euro_deposits, return_on_usd_deposits):
+    # deposit-return scenarios as np.array(S,) pairs, None for one scalar scenario
+    if np.ndim(return_on_euro_deposits) == 0 and np.ndim(return_on_usd_deposits) == 0:
+        return None
+    return_on_euro_deposits, return_on_usd_deposits = np.broadcast_arrays(
+        np.asarray(return_on_euro_deposits, dtype=np.float64).reshape(-1),
+        np.asarray(return_on_usd_deposits, dtype=np.float64).reshape(-1),
+    )
+    return return_on_euro_deposits, return_on_usd_deposits
+
+
+def payout_currency_swap_grid(
+    final_exchange_rate,
+    start_exchange_rate,
+    leverage,
+    USD_asset_allocation,
+    return_on_euro_deposits,
+    return_on_usd_deposits,
+):
+    """
+    Evaluates the swap contract for every (leverage, USD_asset_allocation) pair
+    in one broadcasted computation. Arrays of deposit returns add a leading
+    scenario axis, one scenario per (return_on_euro_deposits,
+    return_on_usd_deposits) pair.
+
+    Args:
+        final_exchange_rate (np.array(P,)): Final EURO/USD exchange rate of each path.
+        start_exchange_rate (float): Initial EURO/USD exchange rate.
+        leverage (np.array(L,)): Leverage factors of the currency swap.
+        USD_asset_allocation (np.array(A,)): Shares of assets invested in USD.
+        return_on_euro_deposits (float or np.array(S,)): Return on euro deposits.
+        return_on_usd_deposits (float or np.array(S,)): Return on usd deposits.
+
+    Returns:
+        eurlong_payout (np.array([S,] L, A, P)): Payout cube of EURlong certificate.
+        eurshort_payout (np.array([S,] L, A, P)): Payout cube of EURshort certificate.
+    """
+    leverage = np.asarray(leverage, dtype=np.float64).reshape(-1, 1, 1)
+    USD_asset_allocation = np.asarray(USD_asset_allocation, dtype=np.float64)
+    USD_asset_allocation = USD_asset_allocation.reshape(1, -1, 1)
+    final_exchange_rate = np.asarray(final_exchange_rate, dtype=np.float64)
+    final_exchange_rate = final_exchange_rate.reshape(1, 1, -1)
+    scenarios = _scenario_axis(return_on_euro_deposits, return_on_usd_deposits)
+    if scenarios is not None:
+        return_on_euro_deposits, return_on_usd_deposits = (
+            rate.reshape(-1, 1, 1, 1) for rate in scenarios
+        )
+
+    eurlong_payout, eurshort_payout = payout_currency_swap_array(
+        final_exchange_rate,
+        start_exchange_rate,
+        USD_asset_allocation,
+        leverage,
+        return_on_euro_deposits,
+        return_on_usd_deposits,
+    )
+    return eurlong_payout, eurshort_payout
+
+
+def _sum_payout_grid_numpy(
+    final_exchange_rate,
+    start_exchange_rate,
+    leverage,
+    USD_asset_allocation,
+    return_on_euro_deposits,
+    return_on_usd_deposits,
+):
+    n_scenarios = len(return_on_euro_deposits)
+    payout_sums = np.zeros((n_scenarios, len(leverage), len(USD_asset_allocation), 5))
+    for s in range(n_scenarios):
+        for i, lev in enumerate(leverage):
+            # one (allocation, path) slice at a time keeps memory at A x P
+            eurlong_payout, eurshort_payout = payout_currency_swap_array(
+                final_exchange_rate[np.newaxis, :],
+                start_exchange_rate,
+                USD_asset_allocation[:, np.newaxis],
+                lev,
+                return_on_euro_deposits[s],
+                return_on_usd_deposits[s],
+            )
+            eurlong_payout_euro = eurlong_payout / final_exchange_rate
+            eurshort_payout_euro = eurshort_payout / final_exchange_rate
+            is_negative = (eurlong_payout_euro < 0) | (eurshort_payout_euro < 0)
+            payout_sums[s, i, :, 0] = is_negative.sum(axis=-1)
+            payout_sums[s, i, :, 1] = eurlong_payout.sum(axis=-1)
+            payout_sums[s, i, :, 2] = eurshort_payout.sum(axis=-1)
+            payout_sums[s, i, :, 3] = eurlong_payout_euro.sum(axis=-1)
+            payout_sums[s, i, :, 4] = eurshort_payout_euro.sum(axis=-1)
+    return payout_sums
+
+
+def _sum_payout_grid_kernel(
+    final_exchange_rate,
+    start_exchange_rate,
+    leverage,
+    USD_asset_allocation,
+    return_on_euro_deposits,
+    return_on_usd_deposits,
+):
+    # payout of each path fused with the per-configuration sums; compiled with
+    # numba and run in parallel over the (scenario, leverage, allocation) grid
+    n_scenarios = len(return_on_euro_deposits)
+    n_leverage, n_allocation = len(leverage), len(USD_asset_allocation)
+    n_grid = n_leverage * n_allocation
+    payout_sums = np.zeros((n_scenarios * n_grid, 5))
+    for config in numba.prange(n_scenarios * n_grid):
+        scenario, grid_config = config // n_grid, config % n_grid
+        for path in range(len(final_exchange_rate)):
+            exchange_rate = final_exchange_rate[path]
+            eurlong_payout, eurshort_payout = _redeem_certificates(
+                exchange_rate,
+                start_exchange_rate,
+                USD_asset_allocation[grid_config % n_allocation],
+                leverage[grid_config // n_allocation],
+                return_on_euro_deposits[scenario],
+                return_on_usd_deposits[scenario],
+            )
+            if eurlong_payout / exchange_rate < 0 or eurshort_payout / exchange_rate < 0:
+                payout_sums[config, 0] += 1
+            payout_sums[config, 1] += eurlong_payout
+            payout_sums[config, 2] += eurshort_payout
+            payout_sums[config, 3] += eurlong_payout / exchange_rate
+            payout_sums[config, 4] += eurshort_payout / exchange_rate
+    return payout_sums.reshape(n_scenarios, n_leverage, n_allocation, 5)
+
+
+if numba is not None:
+    _sum_payout_grid_kernel = numba.njit(parallel=True, cache=True)(
+        _sum_payout_grid_kernel
+    )
+
+
+def sum_payout_grid(
+    final_exchange_rate,
+    start_exchange_rate,
+    leverage,
+    USD_asset_allocation,
+    return_on_euro_deposits,
+    return_on_usd_deposits,
+    backend="auto",
+):
+    """
+    Sums payout statistics of every (leverage, USD_asset_allocation) pair over all
+    paths without materializing the payout of each path.
+
+    Args:
+        final_exchange_rate (np.array(P,)): Final EURO/USD exchange rate of each path.
+        start_exchange_rate (float): Initial EURO/USD exchange rate.
+        leverage (np.array(L,)): Leverage factors of the currency swap.
+        USD_asset_allocation (np.array(A,)): Shares of assets invested in USD.
+        return_on_euro_deposits (float or np.array(S,)): Return on euro deposits.
+        return_on_usd_deposits (float or np.array(S,)): Return on usd deposits. Arrays
+        add a leading scenario axis as in payout_currency_swap_grid.
+        backend (str): "numba" (compiled, parallel over the grid), "numpy" or "auto"
+        (numba if installed).
+
+    Returns:
+        (np.array([S,] L, A, 5)): sums over paths of PAYOUT_SUM_COLUMNS: number of paths
+        with a negative payout of any certificate and EURlong/EURshort payouts in USD
+        and EURO.
+    """
+    leverage = np.asarray(leverage, dtype=np.float64)
+    USD_asset_allocation = np.asarray(USD_asset_allocation, dtype=np.float64)
+    final_exchange_rate = np.asarray(final_exchange_rate, dtype=np.float64).reshape(-1)
+    assert np.all(leverage > 1), "Leverage factor must be higher than 1"
+    assert np.all(
+        (0 <= USD_asset_allocation) & (USD_asset_allocation <= 1)
+    ), "Share of assets invested must be positive"
+
+    if backend == "auto":
+        backend = "numpy" if numba is None else "numba"
+    if backend == "numba":
+        if numba is None:
+            raise ImportError("The numba backend requires numba to be installed.")
+        sum_payout = _sum_payout_grid_kernel
+    elif backend == "numpy":
+        sum_payout = _sum_payout_grid_numpy
+    else:
+        raise ValueError(f"Unknown backend {backend}. Use 'auto', 'numba' or 'numpy'.")
+
+    # the kernels always run over a scenario axis, a scalar scenario is dropped again
+    scenarios = _scenario_axis(return_on_euro_deposits, return_on_usd_deposits)
+    payout_sums = sum_payout(
+        final_exchange_rate,
+        float(start_exchange_rate),
+        leverage,
+        USD_asset_allocation,
+        *(
+            scenarios
+            or (
+                np.array([return_on_euro_deposits], dtype=np.float64),
+                np.array([return_on_usd_deposits], dtype=np.float64),
+            )
+        ),
+    )
+    return payout_sums[0] if scenarios is None else payout_sums
+
+
+def payout_currency_swap(
+    final_exchange_rate,
+    start_exchange_rate,
+    USD_asset_allocation,
+    leverage,
+    return_on_euro_deposits,
+    return_on_usd_deposits,
+):
+    """
+    Simulates payoff profile of some currency swap contract.
+    Pandas adapter around payout_currency_swap_array.
+
+    Args:
+        final_exchange_rate (pd.Series): Final EURO/USD exchange rate.
+        start_exchange_rate (float): Initial EURO/USD exchange rate.
+        USD_asset_allocation (float): Share of assets invested in USD. Must be between 0 and 1.
+        leverage (float): Leverage factor of the currency swap. Must be larger than 1.
+        return_on_euro_deposits (float): Return on euro deposits.
+        return_on_usd_deposits (float): Return on usd deposits.
+
+    Returns:
+        EURpayout (pd.DataFrame): Payout of EURlong / EURshort certificate
+    """
+    eurlong_payout, eurshort_payout = payout_currency_swap_array(
+        final_exchange_rate.to_numpy(),
+        start_exchange_rate,
+        USD_asset_allocation,
+        leverage,
+        return_on_euro_deposits,
+        return_on_usd_deposits,
     )
 
     EURpayout = pd.DataFrame(
@@ -98,7 +536,7 @@ def payout_currency_swap(
             "EURlong payout": eurlong_payout,
             "EURshort payout": eurshort_payout,
         },
-        index=EURshort_payout_fac.index,
+        index=final_exchange_rate.index,
     )
 
     return EURpayout
@@ -0,0 +1,102 @@
+""" Testing the revaluation of a book of currency swap contracts. """
+import pandas as pd
+import pytest
+
+from src.financial_contracts.portfolio import revalue_book
+from src.financial_contracts.swap_contract import payout_currency_swap_array
+
+
+@pytest.fixture
+def dates():
+    return pd.date_range("2021-01-04", periods=6, freq="B")
+
+
+@pytest.fixture
+def exchange_rate(dates):
+    return pd.Series([1.20, 1.22, 1.18, 1.25, 1.10, 1.21], index=dates)
+
+
+@pytest.fixture
+def book(dates):
+    return pd.DataFrame(
+        {
+            "start_exchange_rate": [1.20, 1.18, 1.25],
+            "leverage": [2, 5, 10],
+            "USD_asset_allocation": [0.5, 0, 1],
+            "issue_date": dates[[0, 2, 3]],
+            "maturity": dates[[5, 4, 5]],
+            "notional": [10, 20, 5],
+        }
+    )
+
+
+def _contract_values(contract, rate, euro_return=0, usd_return=0):
+    return payout_currency_swap_array(
+        rate,
+        contract["start_exchange_rate"],
+        contract["USD_asset_allocation"],
+        contract["leverage"],
+        euro_return,
+        usd_return,
+    )
+
+
+def test_book_value_is_sum_of_outstanding_contracts(book, exchange_rate):
+    exposures = revalue_book(book, exchange_rate)
+
+    for day, (date, rate) in enumerate(exchange_rate.items()):
+        expected_eurlong, outstanding = 0, 0
+        for _, contract in book.iterrows():
+            if contract["issue_date"] <= date <= contract["maturity"]:
+                outstanding += contract["notional"]
+                expected_eurlong += (
+                    contract["notional"] * _contract_values(contract, rate)[0]
+                )
+        assert exposures.loc[date, "outstanding"] == outstanding
+        assert exposures.loc[date, "EURlong value in USD"] == pytest.approx(
+            expected_eurlong
+        )
+
+
+def test_contract_is_worth_its_collateral_at_issue(book, exchange_rate):
+    exposures = revalue_book(book.iloc[:1], exchange_rate)
+
+    first_day = exposures.iloc[0]
+    assert first_day["EURlong value in USD"] == pytest.approx(10)
+    assert first_day["EURshort value in USD"] == pytest.approx(10)
+    assert first_day["EURO deposits"] * 1.20 + first_day["USD deposits"] == (
+        pytest.approx(20)
+    )
+
+
+def test_deposits_accrue_from_issue_date(book, exchange_rate):
+    contract = book.iloc[[1]]
+
+    exposures = revalue_book(contract, exchange_rate, euro_deposit_rate=0.001)
+
+    # issued on the third date, accrued over the two dates up to maturity
+    expected = _contract_values(contract.iloc[0], 1.10, euro_return=1.001**2 - 1)
+    assert exposures.loc[exchange_rate.index[4], "EURshort value in USD"] == (
+        pytest.approx(20 * expected[1])
+    )
+    assert exposures.loc[exchange_rate.index[4], "EURO deposits"] == pytest.approx(
+        20 * 2 / 1.18 * 1.001**2
+    )
+
+
+def test_scenario_set_matches_rate_paths(book, exchange_rate):
+    scenarios = pd.DataFrame(
+        [exchange_rate.to_numpy(), exchange_rate.to_numpy() * 0.8],
+        columns=exchange_rate.index,
+    )
+
+    exposures = revalue_book(book, scenarios, usd_deposit_rate=0.0002)
+
+    for scenario, path in scenarios.iterrows():
+        pd.testing.assert_frame_equal(
+            exposures.xs(scenario, level="scenario"),
+            revalue_book(book, path, usd_deposit_rate=0.0002),
+            check_names=False,
+            check_freq=False,
+        )
+    assert exposures["negative_value"].xs(1, level="scenario").max() > 0
@@ -0,0 +1,116 @@
+""" Testing the revaluation of live contracts on incoming quotes. """
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.financial_contracts.streaming import accrue_deposits
+from src.financial_contracts.streaming import init_stream_state
+from src.financial_contracts.streaming import replay_ticks
+from src.financial_contracts.streaming import stream_exposures
+from src.financial_contracts.streaming import update_stream_state
+from src.financial_contracts.swap_contract import payout_currency_swap_array
+
+
+@pytest.fixture
+def book():
+    return pd.DataFrame(
+        {
+            "start_exchange_rate": [1.20, 1.10, 1.25, 1.0],
+            "leverage": [2, 5, 10, 3],
+            "USD_asset_allocation": [0.5, 0, 1, 0.3],
+            "notional": [10, 20, 5, 1],
+        }
+    )
+
+
+def _expected_values(book, exchange_rate, euro_return=0, usd_return=0):
+    return payout_currency_swap_array(
+        exchange_rate,
+        book["start_exchange_rate"].to_numpy(),
+        book["USD_asset_allocation"].to_numpy(),
+        book["leverage"].to_numpy(),
+        euro_return,
+        usd_return,
+    )
+
+
+def test_update_matches_contract_payout(book):
+    state = init_stream_state(book)
+
+    for exchange_rate in [1.18, 1.21]:
+        update_stream_state(state, exchange_rate)
+        eurlong, eurshort = _expected_values(book, exchange_rate)
+        np.testing.assert_allclose(state["eurlong_value"], eurlong)
+        np.testing.assert_allclose(state["eurshort_value"], eurshort)
+    assert state["n_updates"] == 2
+
+
+def test_accrued_deposits_match_deposit_returns(book):
+    state = init_stream_state(book)
+
+    accrue_deposits(state, 0.01, 0.02)
+    accrue_deposits(state, 0.01, 0.02)
+    update_stream_state(state, 1.15)
+
+    eurlong, eurshort = _expected_values(book, 1.15, 1.01**2 - 1, 1.02**2 - 1)
+    np.testing.assert_allclose(state["eurlong_value"], eurlong)
+    np.testing.assert_allclose(state["eurshort_value"], eurshort)
+
+
+def test_wiped_out_contracts_keep_their_value(book):
+    state = init_stream_state(book)
+
+    # EURlong of the leverage 10 contract is wiped out, then the rate recovers
+    update_stream_state(state, 1.10)
+    wiped_out = state["wiped_out"].copy()
+    frozen_value = state["eurlong_value"][2]
+    update_stream_state(state, 1.30)
+
+    np.testing.assert_array_equal(wiped_out, [False, False, True, False])
+    np.testing.assert_array_equal(state["wiped_out"], wiped_out)
+    assert frozen_value == 0
+    assert state["eurlong_value"][2] == 0
+    assert stream_exposures(state)["wiped_out"] == 5
+
+
+def test_update_allocates_no_arrays(book):
+    state = init_stream_state(book.sample(10_000, replace=True, random_state=0))
+    update_stream_state(state, 1.15)
+
+    tracemalloc.start()
+    for exchange_rate in [1.10, 1.20, 1.30]:
+        update_stream_state(state, exchange_rate)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # a single bool mask of the book would take 10kB
+    assert peak < 10_000
+
+
+def test_replay_accrues_deposits_on_new_dates(book, tmp_path):
+    ticks = pd.DataFrame(
+        {
+            "timestamp": [
+                "2021-01-04 09:00",
+                "2021-01-04 15:30",
+                "2021-01-05 09:00",
+                "2021-01-06 12:00",
+            ],
+            "exchange_rate": [1.19, 1.2, 1.21, 1.22],
+        }
+    )
+    ticks.to_csv(tmp_path / "ticks.csv", index=False)
+    state = init_stream_state(book)
+
+    statistics = replay_ticks(
+        state, tmp_path / "ticks.csv", euro_deposit_rate=0.001, chunk_size=3
+    )
+
+    assert statistics["n_updates"] == 4
+    eurlong, _ = _expected_values(book, 1.22, euro_return=1.001**2 - 1)
+    np.testing.assert_allclose(state["eurlong_value"], eurlong)
+    assert stream_exposures(state)["EURlong value in USD"] == pytest.approx(
+        eurlong @ book["notional"].to_numpy()
+    )
@@ -9,6 +9,13 @@ import pandas as pd
 import pytest
 
 from src.financial_contracts.swap_contract import payout_currency_swap
+from src.financial_contracts.swap_contract import payout_currency_swap_array
+from src.financial_contracts.swap_contract import deposit_growth
+from src.financial_contracts.swap_contract import apply_knock_out
+from src.financial_contracts.swap_contract import knock_out_day
+from src.financial_contracts.swap_contract import mark_to_market_array
+from src.financial_contracts.swap_contract import payout_currency_swap_grid
+from src.financial_contracts.swap_contract import sum_payout_grid
 
 
 @pytest.fixture
@@ -121,6 +128,213 @@ def test_swap_total_payout_usd_0(default_data):
     )
 
 
+""" test array kernel """
+
+
+def test_swap_array_matches_pandas_adapter(default_data):
+    default_data["final_exchange_rate"] = pd.Series(data=[0.9, 1, 1.1])
+    expected_payout = payout_currency_swap(**default_data)
+
+    default_data["final_exchange_rate"] = np.array([[0.9, 1, 1.1], [0.9, 1, 1.1]])
+    eurlong_payout, eurshort_payout = payout_currency_swap_array(**default_data)
+
+    assert eurlong_payout.shape == (2, 3)
+    np.testing.assert_allclose(eurlong_payout[1], expected_payout["EURlong payout"])
+    np.testing.assert_allclose(eurshort_payout[0], expected_payout["EURshort payout"])
+
+
+def test_swap_array_total_payout_equals_collateral(default_data):
+    default_data["final_exchange_rate"] = np.linspace(0.5, 1.5, 11)
+    default_data["USD_asset_allocation"] = 0.3
+    default_data["return_on_euro_deposits"] = 0.01
+    default_data["return_on_usd_deposits"] = 0.02
+
+    eurlong_payout, eurshort_payout = payout_currency_swap_array(**default_data)
+    collateral = 2 * 0.3 * 1.02 + 2 * 0.7 * 1.01 * default_data["final_exchange_rate"]
+
+    np.testing.assert_allclose(eurlong_payout + eurshort_payout, collateral)
+
+
+""" test grid evaluation """
+
+
+def test_swap_grid_matches_single_configurations():
+    final_exchange_rate = np.array([0.9, 1, 1.1, 1.2])
+    leverage = [2, 5, 10]
+    USD_asset_allocation = [0, 0.5, 1]
+
+    eurlong_cube, eurshort_cube = payout_currency_swap_grid(
+        final_exchange_rate=final_exchange_rate,
+        start_exchange_rate=1,
+        leverage=leverage,
+        USD_asset_allocation=USD_asset_allocation,
+        return_on_euro_deposits=0.01,
+        return_on_usd_deposits=0.02,
+    )
+
+    assert eurlong_cube.shape == (3, 3, 4)
+    for i, lev in enumerate(leverage):
+        for j, alloc in enumerate(USD_asset_allocation):
+            eurlong_payout, eurshort_payout = payout_currency_swap_array(
+                final_exchange_rate, 1, alloc, lev, 0.01, 0.02
+            )
+            np.testing.assert_allclose(eurlong_cube[i, j], eurlong_payout)
+            np.testing.assert_allclose(eurshort_cube[i, j], eurshort_payout)
+
+
+def test_swap_grid_rejects_invalid_leverage():
+    with pytest.raises(AssertionError):
+        payout_currency_swap_grid(np.ones(3), 1, [0.5, 2], [0.5], 0, 0)
+
+
+""" test aggregated payout statistics """
+
+
+@pytest.fixture
+def grid_data():
+    out = {}
+    out["final_exchange_rate"] = np.linspace(0.7, 1.3, 25)
+    out["start_exchange_rate"] = 1
+    out["leverage"] = [2, 5, 10]
+    out["USD_asset_allocation"] = [0, 0.5, 1]
+    out["return_on_euro_deposits"] = 0.01
+    out["return_on_usd_deposits"] = 0.02
+    return out
+
+
+def test_sum_payout_grid_numpy_matches_payout_cube(grid_data):
+    eurlong_cube, eurshort_cube = payout_currency_swap_grid(**grid_data)
+    exchange_rate = grid_data["final_exchange_rate"]
+
+    payout_sums = sum_payout_grid(**grid_data, backend="numpy")
+
+    is_negative = (eurlong_cube < 0) | (eurshort_cube < 0)
+    np.testing.assert_allclose(payout_sums[..., 0], is_negative.sum(axis=-1))
+    np.testing.assert_allclose(payout_sums[..., 1], eurlong_cube.sum(axis=-1))
+    np.testing.assert_allclose(payout_sums[..., 2], eurshort_cube.sum(axis=-1))
+    np.testing.assert_allclose(
+        payout_sums[..., 3], (eurlong_cube / exchange_rate).sum(axis=-1)
+    )
+    np.testing.assert_allclose(
+        payout_sums[..., 4], (eurshort_cube / exchange_rate).sum(axis=-1)
+    )
+
+
+def test_sum_payout_grid_numba_matches_numpy(grid_data):
+    pytest.importorskip("numba")
+    numpy_sums = sum_payout_grid(**grid_data, backend="numpy")
+    numba_sums = sum_payout_grid(**grid_data, backend="numba")
+
+    np.testing.assert_allclose(numba_sums, numpy_sums, rtol=1e-10, atol=1e-10)
+
+
+def test_swap_grid_scenario_axis_matches_single_scenarios(grid_data):
+    scenarios = {
+        "return_on_euro_deposits": np.array([0.0, 0.01, 0.03]),
+        "return_on_usd_deposits": np.array([0.0, 0.02, 0.01]),
+    }
+
+    eurlong_cube, eurshort_cube = payout_currency_swap_grid(
+        **{**grid_data, **scenarios}
+    )
+    payout_sums = sum_payout_grid(**{**grid_data, **scenarios}, backend="numpy")
+
+    assert eurlong_cube.shape == (3, 3, 3, 25)
+    for s in range(3):
+        scenario = {key: rates[s] for key, rates in scenarios.items()}
+        expected_eurlong, expected_eurshort = payout_currency_swap_grid(
+            **{**grid_data, **scenario}
+        )
+        np.testing.assert_allclose(eurlong_cube[s], expected_eurlong)
+        np.testing.assert_allclose(eurshort_cube[s], expected_eurshort)
+        np.testing.assert_allclose(
+            payout_sums[s],
+            sum_payout_grid(**{**grid_data, **scenario}, backend="numpy"),
+        )
+
+
+def test_sum_payout_grid_numba_scenario_axis_matches_numpy(grid_data):
+    pytest.importorskip("numba")
+    grid_data["return_on_euro_deposits"] = [0.0, 0.05]
+    grid_data["return_on_usd_deposits"] = [0.02, 0.0]
+
+    np.testing.assert_allclose(
+        sum_payout_grid(**grid_data, backend="numba"),
+        sum_payout_grid(**grid_data, backend="numpy"),
+        rtol=1e-10,
+        atol=1e-10,
+    )
+
+
+def test_deposit_growth_compounds_daily_rates():
+    daily_rates = np.array([[0.01, 0.02, -0.01], [0.001, 0.001, 0.001]])
+
+    growth = deposit_growth(daily_rates)
+
+    np.testing.assert_allclose(
+        growth[0], [1.01, 1.01 * 1.02, 1.01 * 1.02 * 0.99], rtol=1e-12
+    )
+    np.testing.assert_allclose(growth[1, -1], 1.001**3, rtol=1e-12)
+
+
+def test_mark_to_market_ends_at_final_payout():
+    return_paths = np.random.default_rng(0).normal(0, 0.01, (6, 20))
+    daily_rates = np.full((6, 20), 0.0005)
+
+    for euro_return, usd_return in [(0.01, 0.02), (daily_rates, 2 * daily_rates)]:
+        eurlong_value, eurshort_value = mark_to_market_array(
+            return_paths, 1, 0.3, 5, euro_return, usd_return
+        )
+        if np.ndim(euro_return) > 0:
+            euro_return = deposit_growth(euro_return)[:, -1] - 1
+            usd_return = deposit_growth(usd_return)[:, -1] - 1
+        expected = payout_currency_swap_array(
+            1 + return_paths.sum(axis=1), 1, 0.3, 5, euro_return, usd_return
+        )
+
+        assert eurlong_value.shape == return_paths.shape
+        np.testing.assert_allclose(eurlong_value[:, -1], expected[0])
+        np.testing.assert_allclose(eurshort_value[:, -1], expected[1])
+
+
+def test_mark_to_market_values_each_day():
+    return_paths = np.array([[0.1, -0.2, 0.05]])
+
+    eurlong_value, _ = mark_to_market_array(return_paths, 1, 0.5, 2, 0, 0)
+
+    expected = payout_currency_swap_array(np.array([1.1, 0.9, 0.95]), 1, 0.5, 2, 0, 0)
+    np.testing.assert_allclose(eurlong_value[0], expected[0])
+
+
+def test_knock_out_day_is_first_passage():
+    value_paths = np.array(
+        [[1.0, 0.5, -0.1, 0.3], [1.0, 1.1, 0.9, 1.2], [1.0, 0.2, 0.1, 0.0]]
+    )
+
+    np.testing.assert_array_equal(knock_out_day(value_paths), [2, -1, 3])
+    np.testing.assert_array_equal(knock_out_day(value_paths, barrier=0.2), [2, -1, 1])
+
+
+def test_knocked_out_certificate_keeps_redemption_value():
+    value_paths = np.array([[1.0, -0.1, 0.3], [1.0, 0.4, 0.6]])
+
+    day = knock_out_day(value_paths, barrier=0.5)
+    knocked_out_paths = apply_knock_out(value_paths, day)
+
+    np.testing.assert_array_equal(day, [1, 1])
+    np.testing.assert_allclose(
+        knocked_out_paths, [[1.0, -0.1, -0.1], [1.0, 0.4, 0.4]]
+    )
+    np.testing.assert_array_equal(
+        apply_knock_out(value_paths, np.array([-1, -1])), value_paths
+    )
+
+
+def test_sum_payout_grid_rejects_unknown_backend(grid_data):
+    with pytest.raises(ValueError):
+        sum_payout_grid(**grid_data, backend="fortran")
+
+
 if __name__ == "__main__":
     out = {}
     out["final_exchange_rate"] = pd.Series(data=[np.ones(3) + 0.1])
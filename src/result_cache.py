@@ -0,0 +1,121 @@
+"""
+Content-addressed cache of intermediate results.
+
+pytask reruns a task whenever one of its dependencies changes, even if the
+parts of it that matter for a result did not: re-downloading identical raw data
+or adding one leverage value to swap_config.json reruns every simulation or
+payout. Results are therefore also stored under a SHA-256 hash of exactly what
+they depend on (data contents, the relevant configuration fields and the source
+code of the computing modules) and reused whenever that hash is known.
+
+Entries are pickles at BLD / "cache" / namespace / key[:2] / key.pickle. The
+cache can be deleted at any time. Simulated samples are not pickled here: their
+hash is recorded in the sidecar of the sample store instead (see
+src.simulation.sample_store.stored_content_key).
+"""
+import hashlib
+import inspect
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.config import BLD
+
+CACHE_DIR = BLD / "cache"
+
+
+def _update_hash(hasher, part):
+    # tag every part with its type, so different objects never share a byte stream
+    if isinstance(part, (pd.Series, pd.DataFrame)):
+        hasher.update(type(part).__name__.encode())
+        _update_hash(hasher, part.index)
+        _update_hash(hasher, part.to_numpy())
+    elif isinstance(part, pd.Index):
+        hasher.update(b"index")
+        _update_hash(hasher, part.to_numpy())
+    elif isinstance(part, np.ndarray):
+        if part.dtype == object:
+            part = part.astype(str)
+        hasher.update(f"array{part.dtype.str}{part.shape}".encode())
+        hasher.update(np.ascontiguousarray(part).tobytes())
+    elif isinstance(part, dict):
+        hasher.update(f"dict{len(part)}".encode())
+        for key in sorted(part, key=repr):
+            _update_hash(hasher, key)
+            _update_hash(hasher, part[key])
+    elif isinstance(part, (list, tuple)):
+        hasher.update(f"{type(part).__name__}{len(part)}".encode())
+        for item in part:
+            _update_hash(hasher, item)
+    elif isinstance(part, (str, bytes, int, float, bool, np.generic)) or part is None:
+        hasher.update(f"{type(part).__name__}:{part!r};".encode())
+    else:
+        raise TypeError(f"Cannot hash object of type {type(part).__name__}.")
+
+
+def content_hash(*parts):
+    """SHA-256 hash of the contents of data, configurations and scalars.
+
+    Args:
+        *parts: np.arrays, pandas objects, dicts, lists, tuples, strings or numbers.
+
+    Returns:
+        (str): hex digest.
+    """
+    hasher = hashlib.sha256()
+    for part in parts:
+        _update_hash(hasher, part)
+    return hasher.hexdigest()
+
+
+def source_version(*modules):
+    """Hash of the source code of modules, so cached results are invalidated when
+    the code computing them changes.
+
+    Args:
+        *modules (module): modules the result is computed with.
+
+    Returns:
+        (str): hex digest.
+    """
+    return content_hash(*(inspect.getsource(module) for module in modules))
+
+
+def load_or_compute(namespace, key, compute, cache_dir=CACHE_DIR):
+    """Return the cached result of key or compute and cache it.
+
+    Args:
+        namespace (str): kind of result, a sub-directory of the cache.
+        key (str): content hash of everything the result depends on.
+        compute (callable): computes the result if it is not cached.
+        cache_dir (pathlib.Path): cache directory.
+
+    Returns:
+        the (cached) result.
+    """
+    cache_path = cache_dir / namespace / key[:2] / f"{key}.pickle"
+    if cache_path.exists():
+        return pd.read_pickle(cache_path)
+
+    result = compute()
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    # write to a temporary file first, so concurrent tasks never read partial entries
+    temporary_path = cache_path.with_name(f"{key}.{os.getpid()}.tmp")
+    pd.to_pickle(result, temporary_path)
+    os.replace(temporary_path, cache_path)
+    return result
+
+
+def is_cached(namespace, key, cache_dir=CACHE_DIR):
+    """Whether a result is cached under key.
+
+    Args:
+        namespace (str): kind of result, a sub-directory of the cache.
+        key (str): content hash of everything the result depends on.
+        cache_dir (pathlib.Path): cache directory.
+
+    Returns:
+        (bool)
+    """
+    return (cache_dir / namespace / key[:2] / f"{key}.pickle").exists()
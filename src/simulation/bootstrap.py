@@ -0,0 +1,170 @@
+"""
+Vectorized stationary bootstrap (Politis & Romano, 1994).
+
+Instead of bootstrapped values the engine returns compact int32 index arrays
+into the historical return series. Values are only gathered when needed and
+the same indices can be reused for several horizons.
+
+Replications are drawn in chunks. Every chunk has its own random generator
+spawned from SeedSequence(seed), so the result only depends on the seed and
+the chunk size and not on the number of worker processes drawing the chunks.
+"""
+import collections
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+def stationary_bootstrap_indices(
+    n_obs, block_length, replications, sub_sample_length, rng
+):
+    """Draw index arrays of stationary bootstrapped sub-samples.
+
+    Blocks start at a uniformly drawn position of the (circularly wrapped) series
+    and have geometric lengths with mean block_length. Only one length and one
+    start are drawn per block and the indices are built with one in-place int32
+    cumulative sum. Peak memory is the int32 result plus per-block arrays (about
+    4 bytes per day for long blocks, 10-12 bytes per day for blocks of 3-8 days).
+
+    Args:
+        n_obs (int): Length of the historical series.
+        block_length (float): Average block length.
+        replications (int): Number of sub-samples.
+        sub_sample_length (int): Length of each sub-sample.
+        rng (np.random.Generator): Random number generator.
+
+    Returns:
+        np.array(replications, sub_sample_length): int32 indices into the series.
+    """
+    start_probability = min(1.0, 1.0 / block_length)
+    n_days = replications * sub_sample_length
+    assert n_days < np.iinfo(np.int32).max - n_obs, "Chunk too large for int32"
+    if start_probability == 1.0:
+        # every day starts a new block
+        return rng.integers(
+            0, n_obs, size=(replications, sub_sample_length), dtype=np.int32
+        )
+
+    # geometric block lengths laid out over all sub-samples back to back; every
+    # sub-sample starts a new block (a geometric length cut at the border is
+    # geometric again, so this does not change the distribution)
+    block_start = np.concatenate(
+        (
+            _draw_geometric_block_starts(start_probability, n_days, rng),
+            np.arange(0, n_days, sub_sample_length, dtype=np.int32),
+        )
+    )
+    block_start.sort()
+    block_start = block_start[np.diff(block_start, prepend=np.int32(-1)) > 0]
+    block_days = np.diff(block_start, append=np.int32(n_days))
+
+    # one uniform start in the historical series per block
+    block_offset = rng.integers(0, n_obs, size=len(block_start), dtype=np.int32)
+
+    # index = offset + days since block start: a running sum of ones that jumps
+    # to the offset of the next block at every block start
+    indices = np.ones(n_days, dtype=np.int32)
+    indices[block_start] = block_offset
+    indices[block_start[1:]] -= block_offset[:-1] + block_days[:-1] - 1
+    del block_start, block_offset, block_days
+    np.cumsum(indices, dtype=np.int32, out=indices)
+
+    # wrap around the end of the series
+    np.remainder(indices, n_obs, out=indices)
+    return indices.reshape(replications, sub_sample_length)
+
+
+def _draw_geometric_block_starts(start_probability, n_days, rng):
+    """Start days of blocks with geometric lengths covering n_days days."""
+    block_ends = []
+    covered_days = 0
+    while covered_days < n_days:
+        n_blocks = int((n_days - covered_days) * start_probability * 1.1) + 16
+        block_end = np.minimum(
+            rng.geometric(start_probability, size=n_blocks), n_days
+        ).astype(np.int32)
+        np.cumsum(block_end, out=block_end)
+        block_end += covered_days
+        block_ends.append(block_end[block_end < n_days])
+        covered_days = int(block_end[-1])
+    return np.concatenate([np.zeros(1, dtype=np.int32)] + block_ends)
+
+
+def gather_returns(values, indices):
+    """Gather bootstrapped returns from the historical series.
+
+    Args:
+        values (np.array(N,)): Timeseries of logarithmic EURO/USD returns.
+        indices (np.array): Indices into values.
+
+    Returns:
+        np.array: returns with the shape of indices.
+    """
+    return np.asarray(values, dtype=np.float64)[indices]
+
+
+def _chunk_indices(
+    n_obs, block_length, replications, sub_sample_length, seed_sequence
+):
+    rng = np.random.default_rng(seed_sequence)
+    return stationary_bootstrap_indices(
+        n_obs, block_length, replications, sub_sample_length, rng
+    )
+
+
+def iter_stationary_bootstrap_indices(
+    n_obs,
+    block_length,
+    replications,
+    sub_sample_length,
+    seed,
+    chunk_size,
+    n_workers=1,
+):
+    """Stream index arrays of stationary bootstrapped sub-samples chunk by chunk.
+
+    Chunk k is drawn with the k-th generator spawned from SeedSequence(seed). With
+    n_workers > 1 chunks are drawn in a process pool; at most 2 * n_workers chunks
+    are in flight, so memory stays bounded by the chunk size.
+
+    Args:
+        n_obs (int): Length of the historical series.
+        block_length (float): Average block length.
+        replications (int): Number of sub-samples.
+        sub_sample_length (int): Length of each sub-sample.
+        seed (int): Seed of the SeedSequence.
+        chunk_size (int): Number of sub-samples per chunk (the last one may be smaller).
+        n_workers (int): Number of worker processes.
+
+    Yields:
+        np.array(chunk_size, sub_sample_length): int32 indices into the series, in
+        chunk order.
+    """
+    chunk_sizes = [
+        min(chunk_size, replications - start)
+        for start in range(0, replications, chunk_size)
+    ]
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    chunk_args = [
+        (n_obs, block_length, size, sub_sample_length, seed_sequence)
+        for size, seed_sequence in zip(chunk_sizes, seed_sequences)
+    ]
+
+    if n_workers == 1:
+        for args in chunk_args:
+            yield _chunk_indices(*args)
+        return
+
+    # spawn instead of fork: forking after numba started its threading layer
+    # deadlocks the workers
+    with ProcessPoolExecutor(
+        max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        in_flight = collections.deque()
+        for args in chunk_args:
+            in_flight.append(executor.submit(_chunk_indices, *args))
+            if len(in_flight) >= 2 * n_workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
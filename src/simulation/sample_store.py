@@ -0,0 +1,147 @@
+"""
+On-disk store of simulated samples as raw .npy arrays with a JSON sidecar.
+
+A sample (paths DataFrame, cumulative-change Series or the horizon dictionaries
+of multi-horizon simulations) is flattened into one .npy file per array next to
+the sidecar, which records the nesting, the index of every frame and the array
+files. Consumers open the arrays with np.load(mmap_mode="r"): nothing is read
+until it is accessed, and several tasks reading the same simulation share the
+operating system's page cache instead of holding private unpickled copies.
+
+Layout of a store with sidecar simulated_data_bootstrapped.json::
+
+    simulated_data_bootstrapped.json
+    simulated_data_bootstrapped.0.npy
+    simulated_data_bootstrapped.1.npy
+    ...
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+STORE_FORMAT_VERSION = 1
+
+
+def _array_path(sidecar_path, array_name):
+    return sidecar_path.with_name(f"{sidecar_path.stem}.{array_name}.npy")
+
+
+def _save_index(index, arrays):
+    if isinstance(index, pd.RangeIndex):
+        return {"kind": "range", "start": index.start, "step": index.step}
+    array_name = str(len(arrays))
+    arrays[array_name] = np.asarray(index.to_numpy())
+    return {"kind": "array", "array": array_name}
+
+
+def _save_node(node, arrays):
+    if isinstance(node, dict):
+        return {
+            "kind": "dict",
+            "keys": list(node),
+            "items": [_save_node(item, arrays) for item in node.values()],
+        }
+    if isinstance(node, pd.DataFrame):
+        kind, values = "frame", node.to_numpy()
+    elif isinstance(node, pd.Series):
+        kind, values = "series", node.to_numpy()
+    else:
+        raise TypeError(f"Cannot store object of type {type(node).__name__}.")
+
+    index = _save_index(node.index, arrays)
+    array_name = str(len(arrays))
+    arrays[array_name] = np.ascontiguousarray(values)
+    return {"kind": kind, "array": array_name, "index": index}
+
+
+def save_simulated_sample(sample, sidecar_path, content_key=None):
+    """Write a simulated sample as .npy arrays with a JSON sidecar.
+
+    Args:
+        sample (pd.DataFrame, pd.Series or dict): simulated returns or cumulative
+        changes as returned by the simulation functions.
+        sidecar_path (pathlib.Path): path of the JSON sidecar.
+        content_key (str): hash of everything the sample depends on, recorded in the
+        sidecar (see stored_content_key).
+    """
+    sidecar_path = Path(sidecar_path)
+    arrays = {}
+    layout = _save_node(sample, arrays)
+    for array_name, values in arrays.items():
+        np.save(_array_path(sidecar_path, array_name), values, allow_pickle=False)
+
+    # the sidecar is written last, so it only exists for complete stores
+    sidecar = {
+        "format_version": STORE_FORMAT_VERSION,
+        "arrays": {
+            array_name: {"dtype": str(values.dtype), "shape": list(values.shape)}
+            for array_name, values in arrays.items()
+        },
+        "layout": layout,
+        "content_key": content_key,
+    }
+    sidecar_path.write_text(json.dumps(sidecar, indent=2), encoding="utf-8")
+
+
+def stored_content_key(sidecar_path):
+    """Content key recorded by save_simulated_sample.
+
+    Args:
+        sidecar_path (pathlib.Path): path of the JSON sidecar.
+
+    Returns:
+        (str): the recorded key, None if there is no complete store of the current
+        format or no key was recorded.
+    """
+    sidecar_path = Path(sidecar_path)
+    if not sidecar_path.exists():
+        return None
+    sidecar = json.loads(sidecar_path.read_text(encoding="utf-8"))
+    if sidecar.get("format_version") != STORE_FORMAT_VERSION:
+        return None
+    return sidecar.get("content_key")
+
+
+def _load_index(index, sidecar_path, length):
+    if index["kind"] == "range":
+        return pd.RangeIndex(
+            index["start"], index["start"] + length * index["step"], index["step"]
+        )
+    return pd.Index(np.load(_array_path(sidecar_path, index["array"])))
+
+
+def _load_node(node, sidecar_path, mmap_mode):
+    if node["kind"] == "dict":
+        return {
+            key: _load_node(item, sidecar_path, mmap_mode)
+            for key, item in zip(node["keys"], node["items"])
+        }
+
+    values = np.load(_array_path(sidecar_path, node["array"]), mmap_mode=mmap_mode)
+    index = _load_index(node["index"], sidecar_path, len(values))
+    if node["kind"] == "frame":
+        return pd.DataFrame(values, index=index, copy=False)
+    return pd.Series(values, index=index, copy=False)
+
+
+def load_simulated_sample(sidecar_path, mmap_mode="r"):
+    """Open a simulated sample written by save_simulated_sample.
+
+    Args:
+        sidecar_path (pathlib.Path): path of the JSON sidecar.
+        mmap_mode (str or None): mode of np.load; "r" maps the arrays read-only
+        without reading them, None loads them into memory.
+
+    Returns:
+        (pd.DataFrame, pd.Series or dict): the stored sample, wrapping the (memory
+        mapped) arrays without copies.
+    """
+    sidecar_path = Path(sidecar_path)
+    sidecar = json.loads(sidecar_path.read_text(encoding="utf-8"))
+    assert (
+        sidecar["format_version"] == STORE_FORMAT_VERSION
+    ), "Unknown simulated sample store format"
+
+    return _load_node(sidecar["layout"], sidecar_path, mmap_mode)
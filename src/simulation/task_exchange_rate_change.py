@@ -1,25 +1,54 @@
 """ Plot the distribution of 1-Year EURO/USD returns
-"""
-import pickle
 
+Densities are cached under a hash of the exchange rate changes and the density
+code (see src.result_cache), so redrawing the figure of an unchanged sample
+skips the density estimate.
+"""
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
+import numpy as np
+import pandas as pd
 import pytask
-import seaborn as sns
 
 from src.config import BLD
-from src.simulation_analysis.utility import get_total_exchange_rate_change
+from src.result_cache import CACHE_DIR
+from src.result_cache import content_hash
+from src.result_cache import load_or_compute
+from src.result_cache import source_version
+from src.simulation_analysis import density
+from src.simulation_analysis.density import binned_density_1d
+from src.simulation_analysis.rendering import render_figures
+from src.simulation_analysis.utility import load_cumulative_change
 
 PLOT_ARGS = {"markersize": 4, "alpha": 0.6}
 
 
+def exchange_rate_density(total_change, cache_dir=CACHE_DIR):
+    """Binned kernel density of cumulated exchange rate movements (see
+    binned_density_1d), cached under a hash of the movements.
+
+    Args:
+        total_change (pd.Series or np.array): cumulated exchange rate movements.
+        cache_dir (pathlib.Path): cache directory.
+
+    Returns:
+        (dict): grid points "x" and density values "density".
+    """
+    values = np.asarray(total_change, dtype=np.float64)
+    key = content_hash(values, source_version(density))
+    return load_or_compute(
+        "exchange_rate_density", key, lambda: binned_density_1d(values), cache_dir
+    )
+
+
 def plot_total_change(data, path):
     """
     Plot the final exchange rate resulting from 1 year exchange rate
     returns
 
     Args:
-        data (pd.DataFrame): Pandas DataFrame cumulated exchange rate movements.
+        data (pd.DataFrame): Pandas DataFrame cumulated exchange rate movements
+        (dictionary keyed by trading_days for multi-horizon simulations).
         path (string): path of output file.
     """
 
@@ -27,19 +56,37 @@ def plot_total_change(data, path):
     fig, ax = plt.subplots()
     fig.suptitle("EURO/USD exchange rate")
 
-    data = data.to_frame(name="Final exchange rate")
+    if isinstance(data, dict):
+        # one density per horizon
+        hue = "Horizon (trading days)"
+        total_changes = data
+    else:
+        hue = None
+        total_changes = {None: data}
 
-    # plot EURO/USD price
+    # plot EURO/USD price (binned kernel density estimates)
     ax.tick_params(labelbottom="off", labelleft="off")
     ax.set_facecolor("azure")
-    sns.kdeplot(data=data, x="Final exchange rate", ax=ax)
-
-    # set limits
-    ax.set(xlim=(-0.4, 0.4))
-    ax.set(ylim=(0, 4.5))
+    for horizon, total_change in total_changes.items():
+        total_change_density = exchange_rate_density(total_change)
+        ax.plot(
+            total_change_density["x"], total_change_density["density"], label=horizon
+        )
+    ax.set(xlabel="Final exchange rate", ylabel="Density")
+    if hue is not None:
+        ax.legend(title=hue)
+
+    # set limits: +-40% for one horizon, widened to the data for several horizons
+    x_limit = 4
+    if hue is not None:
+        max_change = pd.concat(total_changes).abs().quantile(0.999)
+        x_limit = max(x_limit, int(np.ceil(max_change * 10)))
+    else:
+        ax.set(ylim=(0, 4.5))
+    ax.set(xlim=(-x_limit / 10, x_limit / 10))
 
     # format labels
-    xlabels = [i / 10 for i in range(-4, 5)]
+    xlabels = [i / 10 for i in range(-x_limit, x_limit + 1)]
     ax.xaxis.set_major_locator(mticker.FixedLocator(xlabels))
     ax.set_xticklabels([f"{x:,.2%}" for x in xlabels])  # format y axis
 
@@ -47,11 +94,12 @@ def plot_total_change(data, path):
 
     # save result to folder
     fig.savefig(path)
+    plt.close(fig)
 
 
 specifications = (
     (
-        BLD / "simulated_data" / f"simulated_data_{simulation_name}.pickle",
+        BLD / "simulated_data" / f"simulated_data_{simulation_name}.json",
         BLD / "figures" / f"euro_usd_{simulation_name}.png",
     )
     for simulation_name in ["historical", "bootstrapped"]
@@ -60,15 +108,13 @@ specifications = (
 
 @pytask.mark.parametrize("depends_on, produces", specifications)
 def task_final_exchange_rate(depends_on, produces):
-    with open(depends_on, "rb") as f:
-        raw_data = pickle.load(f)
-    total_change = get_total_exchange_rate_change(raw_data)
-    plot_total_change(total_change, produces)
+    total_change = load_cumulative_change(depends_on)
+    render_figures([(plot_total_change, (total_change, produces))])
 
 
 if __name__ == "__main__":
     # Evaluate production functions.
     simulation_name = "historical"
-    depends_on = BLD / "simulated_data" / f"simulated_data_{simulation_name}.pickle"
+    depends_on = BLD / "simulated_data" / f"simulated_data_{simulation_name}.json"
     produces = BLD / "figures" / f"euro_usd_{simulation_name}.png"
     task_final_exchange_rate(depends_on, produces)
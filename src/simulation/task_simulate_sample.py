@@ -1,7 +1,7 @@
 """
 Generates simulated EURO / USD returns for a period
 specified in simulate_config.json.
-Saves simulated samples as pickle.
+Saves simulated samples as memory-mappable .npy arrays.
 
 Implemented methods:|
 # historical (based on historical 1 year returns) |
@@ -9,6 +9,35 @@ Implemented methods:|
 
 Bootstrapping is done with the recombinator package.
 See: https://github.com/InvestmentSystems/recombinator
+Setting bootstrap_engine to "native" in simulate_config.json uses the vectorized
+index-based engine in src.simulation.bootstrap instead. It draws chunks of
+bootstrap_chunk_size paths from spawned seed streams and can spread them over
+bootstrap_workers processes with reproducible results. bootstrap_workers has
+no effect with recombinator, which always runs in the calling process.
+
+If summary_only is set in simulate_config.json only the cumulative log return
+of each path is saved instead of the full (paths x trading_days) matrix.
+
+Samples are saved as raw .npy arrays with a JSON sidecar (see
+src.simulation.sample_store) that consumers open memory mapped.
+
+The store also records a hash of the log returns, the configuration fields the
+simulation depends on and the simulation source code (see
+simulation_cache_key). If the existing store carries the same hash, it is kept
+as it is, so re-downloading identical data or changing unrelated fields of
+simulation_config.json does not resimulate. bootstrap_workers is not part of the
+key since it does not change the result.
+
+If antithetic is set in simulate_config.json, bootstrapped paths come in
+antithetic pairs (rows 2k and 2k + 1): only half of the paths are drawn, the
+other half mirrors them around the mean daily return (see antithetic_pairs).
+Averages over pairs have a lower variance than averages over independent paths.
+
+trading_days can also be a list of horizons. Summary-only simulations are then
+returned as a dictionary {trading_days: cumulative return}. Full-path
+simulations are returned as {"paths": {trading_days: paths},
+"total_returns": {trading_days: cumulative return}}, where the cumulative
+returns of all horizons are read off one shared cumulative sum.
 
 
 Further simulation function can be parsed as arguments to the iterator object
@@ -16,6 +45,8 @@ specifications.
 """
 import json
 import pickle
+import sys
+import warnings
 
 import numpy as np
 import pandas as pd
@@ -23,8 +54,41 @@ import pytask
 from recombinator.block_bootstrap import stationary_bootstrap
 from recombinator.optimal_block_length import optimal_block_length
 
+import src.simulation.bootstrap as bootstrap
 from src.config import BLD
 from src.config import SRC
+from src.result_cache import content_hash
+from src.result_cache import source_version
+from src.simulation.bootstrap import gather_returns
+from src.simulation.bootstrap import iter_stationary_bootstrap_indices
+from src.simulation.sample_store import save_simulated_sample
+from src.simulation.sample_store import stored_content_key
+
+# optional daily simple deposit returns in the raw data (see load_deposit_rates)
+DEPOSIT_RATE_COLUMNS = ["euro_deposit_rate", "usd_deposit_rate"]
+
+
+def historical_return_windows(data, trading_days, writable=False):
+    """
+    Strided view of all historical periods of length trading_days.
+    Row i is data[i : i + trading_days]; no data is copied.
+
+    Args:
+        data (pd.Series): Timeseries of logarithmic EURO/USD returns.
+        trading_days (int): Length of each period.
+        writable (bool): Materialize the windows as a writable dense array.
+
+    Returns:
+        np.array(K, trading_days): read-only view (or dense copy if writable) of
+        the K = len(data) - trading_days historical periods.
+    """
+    K = len(data) - trading_days
+    windows = np.lib.stride_tricks.sliding_window_view(
+        np.ascontiguousarray(data.to_numpy(dtype=np.float64)), trading_days
+    )[:K]
+    if writable:
+        windows = windows.copy()
+    return windows
 
 
 def generate_historical_returns(data, config):
@@ -39,22 +103,31 @@ def generate_historical_returns(data, config):
 
     Returns:
         pd.DataFrame(trading_days, K): DataFrame of K historical series of
-        1 year returns of length trading days.
+        1 year returns of length trading days. The DataFrame wraps a read-only
+        view on data. If trading_days is a list, a dictionary with the DataFrames
+        keyed by horizon ("paths") and their cumulative returns ("total_returns")
+        computed from one shared prefix sum (see generate_historical_total_returns).
     """
     # settings
     trading_days = config["trading_days"]
+    if isinstance(trading_days, list):
+        return {
+            "paths": {
+                horizon: generate_historical_returns(
+                    data, {**config, "trading_days": horizon}
+                )
+                for horizon in trading_days
+            },
+            "total_returns": generate_historical_total_returns(data, config),
+        }
     K = len(data) - trading_days
 
-    # initiate empty container
-    simulated_data = np.empty((K, trading_days))
-
     # generate sample
-    for i in range(K):
-        simulated_data[i, :] = data.iloc[i : i + trading_days]
+    simulated_data = historical_return_windows(data, trading_days)
 
     # export as pandas dataFrame
     simulated_historical_data = pd.DataFrame(
-        data=simulated_data, index=list(data.index[0:K])
+        data=simulated_data, index=list(data.index[0:K]), copy=False
     )
     assert simulated_historical_data.shape == (
         K,
@@ -63,6 +136,39 @@ def generate_historical_returns(data, config):
     return simulated_historical_data
 
 
+def _window_sums(prefix_sum, index, trading_days):
+    K = len(index) - trading_days
+    total_returns = prefix_sum[trading_days : trading_days + K] - prefix_sum[:K]
+    return pd.Series(data=total_returns, index=list(index[0:K]))
+
+
+def generate_historical_total_returns(data, config):
+    """
+    Cumulative log return of (all) historical periods of length
+    trading_days. Every window sum is the difference of two prefix sums,
+    so the path matrix is never built.
+
+    Args:
+        data (pd.Series): Timeseries of logarithmic EURO/USD returns.
+        config (dict): dictionary of simulation parameters.
+
+    Returns:
+        pd.Series(K): cumulative return of the K historical periods, indexed by
+        their start date. If trading_days is a list, a dictionary of such Series
+        keyed by horizon, all derived from the same prefix sums.
+    """
+    # window sums from prefix sums
+    prefix_sum = np.concatenate(([0.0], np.cumsum(data.to_numpy(dtype=np.float64))))
+
+    trading_days = config["trading_days"]
+    if isinstance(trading_days, list):
+        return {
+            horizon: _window_sums(prefix_sum, data.index, horizon)
+            for horizon in trading_days
+        }
+    return _window_sums(prefix_sum, data.index, trading_days)
+
+
 def _find_optimal_stationary_bootstrap_block_length(y):
     """The first number is the optimal block length for a stationary
     bootstrap, while the second number refers to the optimal block length
@@ -73,6 +179,86 @@ def _find_optimal_stationary_bootstrap_block_length(y):
     return b_star_sb
 
 
+def _warn_unused_workers(config):
+    if config.get("bootstrap_workers", 1) > 1:
+        warnings.warn(
+            "bootstrap_workers only has an effect with the native bootstrap engine",
+            stacklevel=3,
+        )
+
+
+def antithetic_pairs(paths, mean):
+    """Interleave paths with their antithetic counterparts: every path is
+    de-meaned, sign-flipped and re-meaned, so each pair averages to the mean daily
+    return on every day.
+
+    Args:
+        paths (np.array(N, trading_days)): bootstrapped returns.
+        mean (float): mean daily return of the bootstrapped data.
+
+    Returns:
+        np.array(2 * N, trading_days): each path followed by its antithetic path.
+    """
+    pairs = np.empty((2 * len(paths), paths.shape[1]), dtype=paths.dtype)
+    pairs[0::2] = paths
+    pairs[1::2] = 2 * mean - paths
+    return pairs
+
+
+def _antithetic_config(config):
+    # draw half of the paths (and chunks), the other half are antithetic
+    assert config["bootsstrap_sim_num"] % 2 == 0, "Antithetic paths need an even number"
+    return {
+        **config,
+        "antithetic": False,
+        "bootsstrap_sim_num": config["bootsstrap_sim_num"] // 2,
+        "bootstrap_chunk_size": max(config["bootstrap_chunk_size"] // 2, 1),
+    }
+
+
+def iter_bootstrapped_indices(data, config):
+    """Stream stationary bootstrapped paths as int32 indices into data, drawn
+    with the native engine in chunks of bootstrap_chunk_size replications by
+    bootstrap_workers processes. The result only depends on simulation_seed and
+    bootstrap_chunk_size, not on the number of workers. Paths cover the longest
+    horizon; shorter horizons use the leading columns of the same indices.
+
+    Args:
+        data (pd.Series): Timeseries of logarithmic EURO/USD returns.
+        config (dict): dictionary of simulation parameters.
+
+    Yields:
+        np.array(chunk_size, trading_days): int32 indices into data.
+    """
+    horizons = config["trading_days"]
+    trading_days = max(horizons) if isinstance(horizons, list) else horizons
+
+    optimal_block_length = _find_optimal_stationary_bootstrap_block_length(data.values)
+    yield from iter_stationary_bootstrap_indices(
+        n_obs=len(data),
+        block_length=optimal_block_length,
+        replications=config["bootsstrap_sim_num"],
+        sub_sample_length=trading_days,
+        seed=config["simulation_seed"],
+        chunk_size=config["bootstrap_chunk_size"],
+        n_workers=config["bootstrap_workers"],
+    )
+
+
+def generate_bootstrapped_indices(data, config):
+    """Stationary bootstrapped paths as int32 indices into data, drawn with the
+    native engine (see iter_bootstrapped_indices).
+
+    Args:
+        data (pd.Series): Timeseries of logarithmic EURO/USD returns.
+        config (dict): dictionary of simulation parameters.
+
+    Returns:
+        np.array(bootsstrap_sim_num, trading_days): int32 indices into data.
+    """
+    return np.concatenate(list(iter_bootstrapped_indices(data, config)))
+
+
 def generate_bootstrapped_returns(data, config):
     """Uses the stationary bootstrapp method
     to generate bootsstrap_sim_num many vectors
@@ -84,78 +270,303 @@ def generate_bootstrapped_returns(data, config):
         config (dict): dictionary of simulation parameters.
 
     Returns:
-        np.array(trading_days, bootsstrap_sim_num): Array of bootstrapped 1 year returns
+        np.array(trading_days, bootsstrap_sim_num): Array of bootstrapped 1 year returns.
+        If trading_days is a list, a dictionary with the leading trading_days of the
+        paths simulated for the longest horizon keyed by horizon ("paths") and their
+        cumulative returns ("total_returns") read off one shared cumulative sum.
     """
 
     # settings
-    trading_days = config["trading_days"]
+    horizons = config["trading_days"]
+    trading_days = max(horizons) if isinstance(horizons, list) else horizons
     bootsstrap_sim_num = config["bootsstrap_sim_num"]
-    np.random.seed(config["simulation_seed"])
-
-    # find optimal block length for stationary bootstrap
-    optimal_block_length = _find_optimal_stationary_bootstrap_block_length(data.values)
 
     # generate block_bootstrap data
-    simulated_bootstrapped_data = stationary_bootstrap(
-        data.values,
-        block_length=optimal_block_length,
-        replications=bootsstrap_sim_num,
-        sub_sample_length=trading_days,
-    )
+    if config.get("antithetic", False):
+        simulated_bootstrapped_data = np.concatenate(
+            list(iter_bootstrapped_returns(data, config))
+        )
+    elif config["bootstrap_engine"] == "native":
+        simulated_bootstrapped_data = gather_returns(
+            data.values, generate_bootstrapped_indices(data, config)
+        )
+    else:
+        _warn_unused_workers(config)
+        np.random.seed(config["simulation_seed"])
+        optimal_block_length = _find_optimal_stationary_bootstrap_block_length(
+            data.values
+        )
+        simulated_bootstrapped_data = stationary_bootstrap(
+            data.values,
+            block_length=optimal_block_length,
+            replications=bootsstrap_sim_num,
+            sub_sample_length=trading_days,
+        )
 
     simulated_bootstrapped_data = pd.DataFrame(data=simulated_bootstrapped_data)
     assert simulated_bootstrapped_data.shape == (
         bootsstrap_sim_num,
         trading_days,
     ), "Unexpected outgoing shape"
+    if isinstance(horizons, list):
+        cumulative_returns = np.cumsum(simulated_bootstrapped_data.to_numpy(), axis=1)
+        return {
+            "paths": {
+                horizon: simulated_bootstrapped_data.iloc[:, :horizon]
+                for horizon in horizons
+            },
+            "total_returns": {
+                horizon: pd.Series(data=cumulative_returns[:, horizon - 1])
+                for horizon in horizons
+            },
+        }
     return simulated_bootstrapped_data
 
 
+def iter_bootstrapped_returns(data, config):
+    """Stream bootsstrap_sim_num stationary bootstrapped paths in chunks of
+    bootstrap_chunk_size replications (the last chunk may be smaller). Only one
+    chunk is held in memory at a time.
+
+    Args:
+        data (pd.Series): Timeseries of logarithmic EURO/USD returns.
+        config (dict): dictionary of simulation parameters.
+
+    Yields:
+        np.array(chunk_size, trading_days): bootstrapped returns of the longest horizon,
+        in antithetic pairs if antithetic is set (see antithetic_pairs).
+    """
+    if config.get("antithetic", False):
+        mean = data.values.mean()
+        for paths in iter_bootstrapped_returns(data, _antithetic_config(config)):
+            yield antithetic_pairs(paths, mean)
+        return
+
+    # native engine: chunks drawn from spawned seed streams
+    if config["bootstrap_engine"] == "native":
+        for indices in iter_bootstrapped_indices(data, config):
+            yield gather_returns(data.values, indices)
+        return
+
+    _warn_unused_workers(config)
+
+    # settings
+    horizons = config["trading_days"]
+    trading_days = max(horizons) if isinstance(horizons, list) else horizons
+    bootsstrap_sim_num = config["bootsstrap_sim_num"]
+    chunk_size = config["bootstrap_chunk_size"]
+    np.random.seed(config["simulation_seed"])
+
+    # find optimal block length for stationary bootstrap
+    optimal_block_length = _find_optimal_stationary_bootstrap_block_length(data.values)
+
+    for start in range(0, bootsstrap_sim_num, chunk_size):
+        replications = min(chunk_size, bootsstrap_sim_num - start)
+        yield stationary_bootstrap(
+            data.values,
+            block_length=optimal_block_length,
+            replications=replications,
+            sub_sample_length=trading_days,
+        )
+
+
+def iter_bootstrapped_rate_paths(data, deposit_rates, config):
+    """Stream stationary bootstrapped return paths together with the deposit-rate
+    paths of the same days: all series are gathered with the same indices (native
+    engine, see iter_bootstrapped_indices), so rates stay aligned with the exchange
+    rate moves they were observed with.
+
+    Args:
+        data (pd.Series): Timeseries of logarithmic EURO/USD returns.
+        deposit_rates (pd.DataFrame): daily deposit returns (DEPOSIT_RATE_COLUMNS)
+        on the dates of data.
+        config (dict): dictionary of simulation parameters.
+
+    Yields:
+        returns (np.array(chunk_size, trading_days)): bootstrapped returns.
+        rates (dict): bootstrapped np.array(chunk_size, trading_days) per column of
+        deposit_rates.
+    """
+    assert (
+        config["bootstrap_engine"] == "native"
+    ), "Deposit-rate paths require the native bootstrap engine"
+    assert not config.get("antithetic", False), "Deposit-rate paths are not antithetic"
+    assert deposit_rates.index.equals(data.index), "Rates not aligned with returns"
+    for indices in iter_bootstrapped_indices(data, config):
+        rates = {
+            column: gather_returns(deposit_rates[column].values, indices)
+            for column in deposit_rates.columns
+        }
+        yield gather_returns(data.values, indices), rates
+
+
+def generate_bootstrapped_total_returns(data, config):
+    """Cumulative log return of bootsstrap_sim_num stationary bootstrapped
+    paths. Paths are streamed in chunks by iter_bootstrapped_returns and
+    reduced to their sum right away, so only one chunk is held in memory.
+    The native engine draws the same paths as generate_bootstrapped_returns.
+    With recombinator the random stream is consumed chunk by chunk, so the
+    individual paths differ from generate_bootstrapped_returns with the same seed.
+
+    Args:
+        data (pd.Series): Timeseries of logarithmic EURO/USD returns.
+        config (dict): dictionary of simulation parameters.
+
+    Returns:
+        pd.Series(bootsstrap_sim_num): cumulative return of each bootstrapped path.
+        If trading_days is a list, a dictionary of such Series keyed by horizon,
+        read off the running sum of the paths simulated for the longest horizon.
+    """
+    # settings
+    horizons = config["trading_days"]
+    is_multi_horizon = isinstance(horizons, list)
+    if not is_multi_horizon:
+        horizons = [horizons]
+
+    # reduce each chunk of paths on the fly
+    horizon_columns = np.asarray(horizons) - 1
+    total_returns = np.concatenate(
+        [
+            np.cumsum(chunk, axis=1)[:, horizon_columns]
+            for chunk in iter_bootstrapped_returns(data, config)
+        ]
+    )
+
+    if is_multi_horizon:
+        return {
+            horizon: pd.Series(data=total_returns[:, i])
+            for i, horizon in enumerate(horizons)
+        }
+    return pd.Series(data=total_returns[:, 0])
+
+
+def load_log_returns(raw_data_path):
+    """Load the daily logarithmic EURO/USD returns (first row dropped).
+
+    Args:
+        raw_data_path (pathlib.Path): path of the pickled raw data.
+
+    Returns:
+        pd.Series: Timeseries of logarithmic EURO/USD returns.
+    """
+    with open(raw_data_path, "rb") as f:
+        raw_data = pickle.load(f)
+
+    # drop first row
+    raw_data.dropna(axis="index", inplace=True)
+    log_return = raw_data["log_return"]  # .sub(raw_data["log_return"].mean()) #de-mean
+    return log_return
+
+
+SIMULATION_CONFIG_FIELDS = {
+    "historical": ["trading_days", "summary_only"],
+    "bootstrapped": [
+        "trading_days",
+        "summary_only",
+        "bootsstrap_sim_num",
+        "simulation_seed",
+        "bootstrap_engine",
+        "bootstrap_chunk_size",
+        "antithetic",
+    ],
+}
+
+
+def simulation_cache_key(simulation_function, log_return, sim_config):
+    """Content hash of everything a simulated sample depends on.
+
+    Args:
+        simulation_function (function): generate_{simulation_name}_returns.
+        log_return (pd.Series): Timeseries of logarithmic EURO/USD returns.
+        sim_config (dict): simulation configuration.
+
+    Returns:
+        (str): cache key.
+    """
+    simulation_name = simulation_function.__name__.split("_")[1]
+    relevant_config = {
+        field: sim_config.get(field)
+        for field in SIMULATION_CONFIG_FIELDS[simulation_name]
+    }
+    return content_hash(
+        simulation_name,
+        relevant_config,
+        log_return,
+        source_version(sys.modules[__name__], bootstrap),
+    )
+
+
+def load_deposit_rates(raw_data_path):
+    """Load the daily deposit returns stored next to the log returns, if any.
+
+    Args:
+        raw_data_path (pathlib.Path): path of the pickled raw data.
+
+    Returns:
+        pd.DataFrame: daily simple returns on euro and usd deposits
+        (DEPOSIT_RATE_COLUMNS) on the dates of load_log_returns, None if the raw data
+        holds no deposit rates.
+    """
+    with open(raw_data_path, "rb") as f:
+        raw_data = pickle.load(f)
+
+    if not set(DEPOSIT_RATE_COLUMNS).issubset(raw_data.columns):
+        return None
+    raw_data = raw_data.dropna(axis="index", subset=["log_return"])
+    return raw_data[DEPOSIT_RATE_COLUMNS].ffill().fillna(0.0)
+
+
 specifications = (
     (
         eval(f"generate_{simulation_name}_returns"),
-        BLD / "simulated_data" / f"simulated_data_{simulation_name}.pickle",
+        eval(f"generate_{simulation_name}_total_returns"),
+        BLD / "simulated_data" / f"simulated_data_{simulation_name}.json",
     )
     for simulation_name in ["historical", "bootstrapped"]
 )
 
 
-@pytask.mark.parametrize("simulation_function, produces", specifications)
+@pytask.mark.parametrize(
+    "simulation_function, summary_function, produces", specifications
+)
 @pytask.mark.depends_on(
     {
         "sim_config": SRC / "contract_specs" / "simulation_config.json",
         "raw_data": BLD / "historical_data" / "raw_data.pickle",
     }
 )
-def task_simulate_sample(depends_on, simulation_function, produces):
+def task_simulate_sample(depends_on, simulation_function, summary_function, produces):
 
     # Load locations after each round
-    with open(depends_on["raw_data"], "rb") as f:
-        raw_data = pickle.load(f)
-
-    # drop first row
-    raw_data.dropna(axis="index", inplace=True)
-    log_return = raw_data["log_return"]  # .sub(raw_data["log_return"].mean()) #de-mean
+    log_return = load_log_returns(depends_on["raw_data"])
 
     # load simulation configurations
     sim_config = json.loads(depends_on["sim_config"].read_text(encoding="utf-8"))
 
+    # keep the stored sample if it was simulated from identical inputs
+    content_key = simulation_cache_key(simulation_function, log_return, sim_config)
+    if stored_content_key(produces) == content_key:
+        return
+
     # run simulations
-    simulation_sample = simulation_function(log_return, sim_config)
+    if sim_config["summary_only"]:
+        simulation_sample = summary_function(log_return, sim_config)
+    else:
+        simulation_sample = simulation_function(log_return, sim_config)
 
-    with open(produces, "wb") as out_file:
-        pickle.dump(simulation_sample, out_file)
+    save_simulated_sample(simulation_sample, produces, content_key)
 
 
 if __name__ == "__main__":
     # Evaluate production functions.
     simulation_name = "bootstrapped"
-    produces = BLD / "simulated_data" / "simulated_data_historical.pickle"
+    produces = BLD / "simulated_data" / "simulated_data_historical.json"
     simulation_function = eval(f"generate_{simulation_name}_returns")
+    summary_function = eval(f"generate_{simulation_name}_total_returns")
 
     depends_on = {
         "sim_config": SRC / "contract_specs" / "simulation_config.json",
         "raw_data": BLD / "historical_data" / "raw_data.pickle",
     }
 
-    task_simulate_sample(depends_on, simulation_function, produces)
+    task_simulate_sample(depends_on, simulation_function, summary_function, produces)
@@ -0,0 +1,112 @@
+""" Testing the vectorized stationary bootstrap. """
+import numpy as np
+import pytest
+
+from src.simulation.bootstrap import gather_returns
+from src.simulation.bootstrap import iter_stationary_bootstrap_indices
+from src.simulation.bootstrap import stationary_bootstrap_indices
+
+
+@pytest.fixture
+def indices():
+    rng = np.random.default_rng(55)
+    return stationary_bootstrap_indices(
+        n_obs=100, block_length=10, replications=2000, sub_sample_length=50, rng=rng
+    )
+
+
+def test_bootstrap_indices_shape_and_range(indices):
+    assert indices.shape == (2000, 50)
+    assert indices.dtype == np.int32
+    assert indices.min() >= 0
+    assert indices.max() < 100
+
+
+def test_bootstrap_blocks_are_consecutive_and_wrap(indices):
+    step = np.diff(indices, axis=1) % 100
+    block_start_share = (step != 1).mean()
+
+    # a new block starts with probability 1 / block_length (minus chance repeats)
+    assert block_start_share == pytest.approx(0.1 * 0.99, abs=0.005)
+
+
+def test_bootstrap_indices_are_reproducible():
+    first = stationary_bootstrap_indices(50, 5, 10, 20, np.random.default_rng(1))
+    second = stationary_bootstrap_indices(50, 5, 10, 20, np.random.default_rng(1))
+
+    np.testing.assert_array_equal(first, second)
+
+
+def test_bootstrap_short_block_length_draws_every_day():
+    indices = stationary_bootstrap_indices(
+        10 ** 6, 0.8, 100, 20, np.random.default_rng(1)
+    )
+    step = np.diff(indices, axis=1) % 10 ** 6
+
+    assert indices.shape == (100, 20)
+    # every day starts a new block; continuing by chance has probability 1e-6
+    assert (step != 1).all()
+
+
+def test_bootstrap_sub_samples_start_new_blocks():
+    indices = stationary_bootstrap_indices(
+        10 ** 6, 10 ** 9, 200, 5, np.random.default_rng(1)
+    )
+    step = np.diff(indices, axis=1) % 10 ** 6
+
+    # blocks never end within a sub-sample, but each sub-sample starts afresh
+    assert (step == 1).all()
+    assert len(np.unique(indices[:, 0])) == 200
+
+
+def test_gather_returns():
+    values = np.arange(10) / 10
+    indices = np.array([[9, 0, 1]], dtype=np.int32)
+
+    np.testing.assert_allclose(gather_returns(values, indices), [[0.9, 0.0, 0.1]])
+
+
+""" test chunked and multi-process draws """
+
+
+def _draw_chunks(n_workers, chunk_size=30):
+    return list(
+        iter_stationary_bootstrap_indices(
+            n_obs=100,
+            block_length=10,
+            replications=100,
+            sub_sample_length=20,
+            seed=55,
+            chunk_size=chunk_size,
+            n_workers=n_workers,
+        )
+    )
+
+
+def test_bootstrap_chunk_layout():
+    chunks = _draw_chunks(n_workers=1)
+
+    assert [len(chunk) for chunk in chunks] == [30, 30, 30, 10]
+
+
+def test_bootstrap_independent_of_number_of_workers():
+    single_process = np.concatenate(_draw_chunks(n_workers=1))
+    multi_process = np.concatenate(_draw_chunks(n_workers=3))
+
+    np.testing.assert_array_equal(single_process, multi_process)
+
+
+def test_bootstrap_pool_after_parallel_numba():
+    numba = pytest.importorskip("numba")
+
+    @numba.njit(parallel=True)
+    def _parallel_sum(values):
+        total = 0.0
+        for i in numba.prange(len(values)):
+            total += values[i]
+        return total
+
+    assert _parallel_sum(np.ones(1000)) == 1000
+    chunks = _draw_chunks(n_workers=2)
+
+    assert sum(len(chunk) for chunk in chunks) == 100
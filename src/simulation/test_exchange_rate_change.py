@@ -0,0 +1,21 @@
+""" Testing the cached density of the exchange rate changes. """
+import numpy as np
+import pandas as pd
+
+from src.simulation.task_exchange_rate_change import exchange_rate_density
+from src.simulation_analysis.density import binned_density_1d
+
+
+def test_exchange_rate_density_is_cached(tmp_path):
+    total_change = pd.Series(np.random.default_rng(0).normal(0, 0.1, 1000))
+
+    density = exchange_rate_density(total_change, tmp_path)
+    cached_density = exchange_rate_density(total_change, tmp_path)
+
+    expected = binned_density_1d(total_change)
+    np.testing.assert_allclose(density["density"], expected["density"])
+    np.testing.assert_allclose(cached_density["x"], expected["x"])
+    assert len(list((tmp_path / "exchange_rate_density").rglob("*.pickle"))) == 1
+
+    exchange_rate_density(total_change * 2, tmp_path)
+    assert len(list((tmp_path / "exchange_rate_density").rglob("*.pickle"))) == 2
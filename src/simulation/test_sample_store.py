@@ -0,0 +1,74 @@
+""" Testing the memory-mapped store of simulated samples. """
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.simulation.sample_store import load_simulated_sample
+from src.simulation.sample_store import save_simulated_sample
+from src.simulation.sample_store import stored_content_key
+from src.simulation_analysis.utility import load_cumulative_change
+
+
+@pytest.fixture
+def simulated_paths():
+    dates = pd.date_range("1999-01-05", periods=6, freq="B")
+    return pd.DataFrame(np.random.default_rng(0).normal(0, 0.01, (6, 4)), index=dates)
+
+
+def _is_memory_mapped(values):
+    while values is not None and not isinstance(values, np.memmap):
+        values = values.base
+    return values is not None
+
+
+def test_store_round_trip_is_memory_mapped(simulated_paths, tmp_path):
+    save_simulated_sample(simulated_paths, tmp_path / "simulated_data_test.json")
+
+    loaded_paths = load_simulated_sample(tmp_path / "simulated_data_test.json")
+
+    pd.testing.assert_frame_equal(loaded_paths, simulated_paths, check_freq=False)
+    assert _is_memory_mapped(loaded_paths.to_numpy())
+    assert not loaded_paths.to_numpy().flags.writeable
+
+
+def test_store_round_trip_multi_horizon(simulated_paths, tmp_path):
+    sample = {
+        "paths": {2: simulated_paths.iloc[:, :2], 4: simulated_paths},
+        "total_returns": {
+            2: simulated_paths.iloc[:, :2].sum(axis=1).reset_index(drop=True),
+            4: simulated_paths.sum(axis=1).reset_index(drop=True),
+        },
+    }
+    save_simulated_sample(sample, tmp_path / "simulated_data_test.json")
+
+    loaded_sample = load_simulated_sample(tmp_path / "simulated_data_test.json")
+
+    assert list(loaded_sample["paths"]) == [2, 4]
+    for horizon in [2, 4]:
+        pd.testing.assert_frame_equal(
+            loaded_sample["paths"][horizon], sample["paths"][horizon], check_freq=False
+        )
+        pd.testing.assert_series_equal(
+            loaded_sample["total_returns"][horizon], sample["total_returns"][horizon]
+        )
+
+
+def test_cumulative_change_from_store(simulated_paths, tmp_path):
+    save_simulated_sample(simulated_paths, tmp_path / "simulated_data_test.json")
+
+    cumulative_change = load_cumulative_change(tmp_path / "simulated_data_test.json")
+
+    pd.testing.assert_series_equal(
+        cumulative_change, simulated_paths.sum(axis=1), check_freq=False
+    )
+
+
+def test_stored_content_key(simulated_paths, tmp_path):
+    sidecar_path = tmp_path / "simulated_data_test.json"
+    assert stored_content_key(sidecar_path) is None
+
+    save_simulated_sample(simulated_paths, sidecar_path)
+    assert stored_content_key(sidecar_path) is None
+
+    save_simulated_sample(simulated_paths, sidecar_path, content_key="abc")
+    assert stored_content_key(sidecar_path) == "abc"
@@ -0,0 +1,158 @@
+""" Testing the simulation of EURO/USD returns. """
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.simulation.task_simulate_sample import _warn_unused_workers
+from src.simulation.task_simulate_sample import generate_bootstrapped_returns
+from src.simulation.task_simulate_sample import generate_bootstrapped_total_returns
+from src.simulation.task_simulate_sample import generate_historical_returns
+from src.simulation.task_simulate_sample import generate_historical_total_returns
+from src.simulation.task_simulate_sample import historical_return_windows
+from src.simulation.task_simulate_sample import iter_bootstrapped_rate_paths
+from src.simulation.task_simulate_sample import iter_bootstrapped_returns
+
+
+@pytest.fixture
+def log_return():
+    dates = pd.date_range("1999-01-05", periods=30, freq="B")
+    return pd.Series(np.random.default_rng(0).normal(0, 0.01, 30), index=dates)
+
+
+@pytest.fixture
+def sim_config():
+    return {"trading_days": 5, "bootsstrap_sim_num": 50, "simulation_seed": 55}
+
+
+""" test historical windows """
+
+
+def test_historical_windows_match_loop(log_return):
+    windows = historical_return_windows(log_return, 5)
+
+    assert windows.shape == (25, 5)
+    for i in range(25):
+        np.testing.assert_array_equal(windows[i], log_return.iloc[i : i + 5])
+
+
+def test_historical_windows_are_read_only_views(log_return):
+    windows = historical_return_windows(log_return, 5)
+    dense = historical_return_windows(log_return, 5, writable=True)
+
+    assert not windows.flags.writeable
+    assert dense.flags.writeable
+    assert not np.shares_memory(windows, dense)
+
+
+def test_generate_historical_returns_index(log_return, sim_config):
+    simulated = generate_historical_returns(log_return, sim_config)
+
+    assert simulated.shape == (25, 5)
+    assert list(simulated.index) == list(log_return.index[:25])
+
+
+""" test summary-only simulation """
+
+
+def test_historical_total_returns_match_path_sums(log_return, sim_config):
+    paths = generate_historical_returns(log_return, sim_config)
+    total_returns = generate_historical_total_returns(log_return, sim_config)
+
+    pd.testing.assert_series_equal(total_returns, paths.sum(axis="columns"))
+
+
+""" test multi-horizon simulation """
+
+
+def test_historical_multi_horizon_totals(log_return, sim_config):
+    sim_config["trading_days"] = [3, 5, 10]
+    paths = generate_historical_returns(log_return, sim_config)
+    total_returns = generate_historical_total_returns(log_return, sim_config)
+
+    assert list(total_returns) == [3, 5, 10]
+    for horizon in [3, 5, 10]:
+        assert len(total_returns[horizon]) == 30 - horizon
+        pd.testing.assert_series_equal(
+            total_returns[horizon], paths["paths"][horizon].sum(axis="columns")
+        )
+        pd.testing.assert_series_equal(
+            paths["total_returns"][horizon], total_returns[horizon]
+        )
+
+
+""" test streamed bootstrap """
+
+
+@pytest.fixture
+def native_config(sim_config):
+    return {
+        **sim_config,
+        "bootstrap_engine": "native",
+        "bootstrap_chunk_size": 20,
+        "bootstrap_workers": 1,
+    }
+
+
+def test_streamed_chunks_have_chunk_size_and_remainder(log_return, native_config):
+    chunks = list(iter_bootstrapped_returns(log_return, native_config))
+
+    assert [chunk.shape for chunk in chunks] == [(20, 5), (20, 5), (10, 5)]
+    np.testing.assert_array_equal(
+        np.concatenate(chunks),
+        generate_bootstrapped_returns(log_return, native_config),
+    )
+
+
+def test_native_bootstrap_totals_match_path_sums(log_return, native_config):
+    paths = generate_bootstrapped_returns(log_return, native_config)
+    total_returns = generate_bootstrapped_total_returns(log_return, native_config)
+
+    np.testing.assert_allclose(total_returns, paths.sum(axis=1))
+
+
+def test_unused_workers_warning(native_config):
+    with pytest.warns(UserWarning, match="native bootstrap engine"):
+        _warn_unused_workers({**native_config, "bootstrap_workers": 2})
+
+
+def test_rate_paths_are_bootstrapped_jointly(log_return, native_config):
+    deposit_rates = pd.DataFrame(
+        {"euro_deposit_rate": log_return * 2, "usd_deposit_rate": log_return + 1},
+        index=log_return.index,
+    )
+
+    chunks = list(
+        iter_bootstrapped_rate_paths(log_return, deposit_rates, native_config)
+    )
+
+    np.testing.assert_array_equal(
+        np.concatenate([paths for paths, _ in chunks]),
+        generate_bootstrapped_returns(log_return, native_config),
+    )
+    for paths, rates in chunks:
+        np.testing.assert_array_equal(rates["euro_deposit_rate"], paths * 2)
+        np.testing.assert_array_equal(rates["usd_deposit_rate"], paths + 1)
+
+
+""" test antithetic paths """
+
+
+def test_antithetic_paths_mirror_drawn_paths(log_return, native_config):
+    antithetic_config = {**native_config, "antithetic": True}
+
+    paths = generate_bootstrapped_returns(log_return, antithetic_config)
+    total_returns = generate_bootstrapped_total_returns(log_return, antithetic_config)
+
+    assert paths.shape == (50, 5)
+    np.testing.assert_allclose(
+        paths.iloc[0::2].to_numpy() + paths.iloc[1::2].to_numpy(),
+        2 * log_return.mean(),
+    )
+    np.testing.assert_array_equal(
+        paths.iloc[0::2].to_numpy(),
+        generate_bootstrapped_returns(
+            log_return,
+            {**native_config, "bootsstrap_sim_num": 25, "bootstrap_chunk_size": 10},
+        ),
+    )
+    np.testing.assert_allclose(total_returns, paths.sum(axis=1))
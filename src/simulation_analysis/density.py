@@ -0,0 +1,134 @@
+"""
+Binned kernel density estimates for the payout and exchange rate figures.
+
+sns.kdeplot evaluates a Gaussian kernel for every data point at every grid
+point. Here the data is first counted on a regular grid (np.histogram /
+np.histogram2d) and the counts are smoothed with a Gaussian kernel by FFT
+convolution, so the cost is linear in the number of points plus
+O(grid log grid). The result is a small summary (grid and density values) that
+can be stored and rendered without the raw data.
+
+Bandwidths follow Scott's rule like sns.kdeplot, applied to every dimension
+separately (product kernel).
+"""
+import numpy as np
+import seaborn as sns
+
+KDE_CUT = 3
+
+
+def _scott_bandwidth(values, n_dims):
+    std = np.std(values)
+    if std == 0:
+        # constant data, keep the grid range non-empty
+        std = 1e-3 * max(1.0, abs(values[0]))
+    return std * len(values) ** (-1 / (n_dims + 4))
+
+
+def _grid_limits(values, bandwidth, limits):
+    if limits is not None:
+        return limits
+    return values.min() - KDE_CUT * bandwidth, values.max() + KDE_CUT * bandwidth
+
+
+def _gaussian_smooth(counts, sigma, axis):
+    # convolve along axis with a Gaussian of sigma bins (zero padded FFT)
+    if sigma <= 0:
+        return counts
+    n_bins = counts.shape[axis]
+    half_width = int(np.ceil(4 * sigma))
+    n_fft = n_bins + 2 * half_width
+    offsets = np.arange(-half_width, half_width + 1)
+    kernel = np.exp(-0.5 * (offsets / sigma) ** 2)
+    kernel /= kernel.sum()
+
+    kernel_fft = np.fft.rfft(kernel, n_fft)
+    shape = [1] * counts.ndim
+    shape[axis] = len(kernel_fft)
+    smoothed = np.fft.irfft(
+        np.fft.rfft(counts, n_fft, axis=axis) * kernel_fft.reshape(shape),
+        n_fft,
+        axis=axis,
+    )
+    smoothed = np.take(smoothed, np.arange(half_width, half_width + n_bins), axis=axis)
+    return np.maximum(smoothed, 0)
+
+
+def binned_density_1d(values, bins=256, limits=None, bandwidth=None):
+    """Binned Gaussian kernel density estimate of one variable.
+
+    Args:
+        values (np.array): data points.
+        bins (int): number of grid points.
+        limits (tuple): grid range (data range +- 3 bandwidths if None).
+        bandwidth (float): kernel standard deviation (Scott's rule if None).
+
+    Returns:
+        (dict): grid points "x" and density values "density".
+    """
+    values = np.asarray(values, dtype=np.float64).reshape(-1)
+    if bandwidth is None:
+        bandwidth = _scott_bandwidth(values, n_dims=1)
+    lower, upper = _grid_limits(values, bandwidth, limits)
+
+    counts, edges = np.histogram(values, bins=bins, range=(lower, upper))
+    bin_width = edges[1] - edges[0]
+    density = _gaussian_smooth(counts.astype(np.float64), bandwidth / bin_width, 0)
+    density /= len(values) * bin_width
+    return {"x": (edges[:-1] + edges[1:]) / 2, "density": density}
+
+
+def binned_density_2d(x, y, bins=(128, 128), limits=(None, None), bandwidth=None):
+    """Binned Gaussian kernel density estimate of two variables.
+
+    Args:
+        x (np.array): first coordinate of the data points.
+        y (np.array): second coordinate of the data points.
+        bins (tuple): number of grid points per dimension.
+        limits (tuple): grid range per dimension (data range +- 3 bandwidths if
+        None).
+        bandwidth (tuple): kernel standard deviation per dimension (Scott's rule if
+        None).
+
+    Returns:
+        (dict): grid points "x" and "y" and density values "density" (x, y).
+    """
+    x = np.asarray(x, dtype=np.float64).reshape(-1)
+    y = np.asarray(y, dtype=np.float64).reshape(-1)
+    if bandwidth is None:
+        bandwidth = (_scott_bandwidth(x, n_dims=2), _scott_bandwidth(y, n_dims=2))
+    x_limits = _grid_limits(x, bandwidth[0], limits[0])
+    y_limits = _grid_limits(y, bandwidth[1], limits[1])
+
+    counts, x_edges, y_edges = np.histogram2d(
+        x, y, bins=bins, range=(x_limits, y_limits)
+    )
+    x_width, y_width = x_edges[1] - x_edges[0], y_edges[1] - y_edges[0]
+    density = _gaussian_smooth(counts, bandwidth[0] / x_width, 0)
+    density = _gaussian_smooth(density, bandwidth[1] / y_width, 1)
+    density /= len(x) * x_width * y_width
+    return {
+        "x": (x_edges[:-1] + x_edges[1:]) / 2,
+        "y": (y_edges[:-1] + y_edges[1:]) / 2,
+        "density": density,
+    }
+
+
+def plot_binned_density_2d(ax, density, threshold=0.05, levels=10, color="C0"):
+    """Filled density contours like sns.kdeplot(fill=True).
+
+    Args:
+        ax (matplotlib.axes.Axes): axes to draw on.
+        density (dict): result of binned_density_2d.
+        threshold (float): lowest contour as share of the maximum density.
+        levels (int): number of contour levels.
+        color (str): base color of the fill.
+    """
+    max_density = density["density"].max()
+    ax.contourf(
+        density["x"],
+        density["y"],
+        density["density"].T,
+        levels=np.linspace(threshold * max_density, max_density, levels),
+        cmap=sns.light_palette(color, as_cmap=True),
+    )
@@ -0,0 +1,189 @@
+"""
+Sorted index (empirical CDF) of the cumulative EUR/USD exchange rate change of a
+simulation run.
+
+Both certificate payouts are affine in the final exchange rate (see
+payout_coefficients), so every configuration has closed-form break-even
+exchange rates. The share of runs with a negative payout and payout quantiles
+are answered by binary search of these thresholds in the sorted changes, i.e.
+in O(configurations * log paths) without computing any payout table.
+
+Exchange rates are assumed to stay positive, so a payout is negative in EURO
+exactly when it is negative in USD.
+"""
+import numpy as np
+import pandas as pd
+
+from src.financial_contracts.swap_contract import payout_coefficients
+from src.simulation_analysis.utility import SCENARIO_COLUMNS
+
+
+def build_change_index(cumulative_change):
+    """Sort the cumulative exchange rate changes of a simulation run.
+
+    Args:
+        cumulative_change (pd.Series or dict): cumulative EUR/USD exchange rate
+        change of each path ({trading_days: pd.Series} for multi-horizon simulations).
+
+    Returns:
+        (np.array or dict): sorted changes (dictionary of sorted changes keyed by
+        trading_days for multi-horizon simulations).
+    """
+    if isinstance(cumulative_change, dict):
+        return {
+            horizon: build_change_index(horizon_change)
+            for horizon, horizon_change in cumulative_change.items()
+        }
+    return np.sort(np.asarray(cumulative_change, dtype=np.float64).reshape(-1))
+
+
+def longest_horizon_index(change_index):
+    """Index of the longest simulated horizon (single-horizon indices are returned
+    unchanged)."""
+    if isinstance(change_index, dict):
+        return change_index[max(change_index)]
+    return change_index
+
+
+def _negative_interval(intercept, slope):
+    # open interval of exchange rates with intercept + slope * x < 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        break_even = -intercept / slope
+    lower = np.where(slope < 0, break_even, -np.inf)
+    upper = np.where(slope > 0, break_even, np.inf)
+    # constant payouts are either always or never negative
+    never_negative = (slope == 0) & (intercept >= 0)
+    lower = np.where(never_negative, np.inf, lower)
+    upper = np.where(never_negative, -np.inf, upper)
+    return lower, upper
+
+
+def _count_in_interval(sorted_rate, lower, upper):
+    count = np.searchsorted(sorted_rate, upper, side="left") - np.searchsorted(
+        sorted_rate, lower, side="right"
+    )
+    return np.maximum(count, 0)
+
+
+def negative_payout_share(
+    change_index,
+    leverage,
+    USD_asset_allocation,
+    return_on_euro_deposits,
+    return_on_usd_deposits,
+    start_exchange_rate=1,
+):
+    """Share of runs with a negative payout of any certificate.
+
+    Args:
+        change_index (np.array): sorted cumulative exchange rate changes.
+        leverage (float or np.array): Leverage factors of the currency swap.
+        USD_asset_allocation (float or np.array): Shares of assets invested in USD,
+        broadcast against leverage.
+        return_on_euro_deposits (float or np.array): Return on euro deposits.
+        return_on_usd_deposits (float or np.array): Return on usd deposits. Arrays are
+        broadcast against leverage.
+        start_exchange_rate (float): Initial EURO/USD exchange rate.
+
+    Returns:
+        (np.array): share of runs with negative payout per configuration.
+    """
+    sorted_rate = start_exchange_rate + np.asarray(change_index, dtype=np.float64)
+    eurlong, eurshort = payout_coefficients(
+        start_exchange_rate,
+        USD_asset_allocation,
+        leverage,
+        return_on_euro_deposits,
+        return_on_usd_deposits,
+    )
+    eurlong_lower, eurlong_upper = _negative_interval(*eurlong)
+    eurshort_lower, eurshort_upper = _negative_interval(*eurshort)
+
+    # inclusion-exclusion of the two negative intervals
+    n_negative = (
+        _count_in_interval(sorted_rate, eurlong_lower, eurlong_upper)
+        + _count_in_interval(sorted_rate, eurshort_lower, eurshort_upper)
+        - _count_in_interval(
+            sorted_rate,
+            np.maximum(eurlong_lower, eurshort_lower),
+            np.minimum(eurlong_upper, eurshort_upper),
+        )
+    )
+    return n_negative / len(sorted_rate)
+
+
+def _sorted_quantile(sorted_values, quantiles):
+    # linear interpolation as np.quantile, without partitioning the sorted data
+    position = np.asarray(quantiles, dtype=np.float64) * (len(sorted_values) - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, len(sorted_values) - 1)
+    weight = position - lower
+    return sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+
+
+def payout_quantiles(
+    change_index,
+    quantiles,
+    leverage,
+    USD_asset_allocation,
+    return_on_euro_deposits,
+    return_on_usd_deposits,
+    start_exchange_rate=1,
+):
+    """Quantiles of the EURlong and EURshort payout (in USD). An increasing payout
+    maps the q-quantile of the exchange rate to its q-quantile, a decreasing one
+    the (1 - q)-quantile.
+
+    Args:
+        change_index (np.array): sorted cumulative exchange rate changes.
+        quantiles (np.array(Q,)): probabilities in [0, 1].
+        leverage (float or np.array): Leverage factors of the currency swap.
+        USD_asset_allocation (float or np.array): Shares of assets invested in USD,
+        broadcast against leverage.
+        return_on_euro_deposits (float): Return on euro deposits.
+        return_on_usd_deposits (float): Return on usd deposits.
+        start_exchange_rate (float): Initial EURO/USD exchange rate.
+
+    Returns:
+        eurlong_quantiles (np.array(..., Q)): EURlong payout quantiles per configuration.
+        eurshort_quantiles (np.array(..., Q)): EURshort payout quantiles per configuration.
+    """
+    sorted_rate = start_exchange_rate + np.asarray(change_index, dtype=np.float64)
+    quantiles = np.asarray(quantiles, dtype=np.float64)
+    rate_quantile = _sorted_quantile(sorted_rate, quantiles)
+    rate_quantile_reversed = _sorted_quantile(sorted_rate, 1 - quantiles)
+
+    payout_quantile_list = []
+    for intercept, slope in payout_coefficients(
+        start_exchange_rate,
+        USD_asset_allocation,
+        leverage,
+        return_on_euro_deposits,
+        return_on_usd_deposits,
+    ):
+        intercept = np.asarray(intercept)[..., np.newaxis]
+        slope = np.asarray(slope)[..., np.newaxis]
+        rate = np.where(slope >= 0, rate_quantile, rate_quantile_reversed)
+        payout_quantile_list.append(intercept + slope * rate)
+    return tuple(payout_quantile_list)
+
+
+def negative_payout_by_config(change_index, metadata):
+    """Share of runs with negative payout of every configuration in metadata.
+
+    Args:
+        change_index (np.array): sorted cumulative exchange rate changes.
+        metadata (pd.DataFrame): leverage, USD_asset_allocation and deposit returns
+        per swap_config_id.
+
+    Returns:
+        (pd.DataFrame): negative_payout per swap_config_id.
+    """
+    share = negative_payout_share(
+        change_index,
+        **{
+            column: metadata[column].to_numpy(dtype=np.float64)
+            for column in ["leverage", "USD_asset_allocation"] + SCENARIO_COLUMNS
+        },
+    )
+    return pd.DataFrame({"negative_payout": share}, index=metadata.index)
@@ -0,0 +1,250 @@
+"""
+Indexed on-disk store of the payout cube.
+
+The long-format payout table repeats the exchange rate of every path for every
+configuration and derives the EURO payouts from the USD payouts. The store
+keeps, per block of configurations evaluated on the same paths (one block per
+simulated horizon):
+
+* the final exchange rate of each path once,
+* the EURlong and EURshort payout in USD as contiguous float64 arrays of shape
+  (configurations, paths), one .npy file per column,
+
+and a JSON sidecar with an offset index mapping every swap_config_id to its
+block and row. Readers open the arrays memory mapped, so one configuration or
+one column is read without loading the rest of the file. The EURO payouts and the
+exchange_rate column are derived on read.
+
+Every block records a content hash of its exchange rates (paths_key). Stores can
+be appended to: blocks evaluated on the same paths as the new blocks are kept,
+blocks of other (outdated) paths are removed.
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.result_cache import content_hash
+
+STORE_FORMAT_VERSION = 2
+
+STORED_COLUMNS = ["EURlong payout in USD", "EURshort payout in USD"]
+PAYOUT_COLUMNS = [
+    "EURlong payout in USD",
+    "EURshort payout in USD",
+    "exchange_rate",
+    "EURlong payout in EURO",
+    "EURshort payout in EURO",
+]
+
+
+def _array_path(sidecar_path, file_id, array_name):
+    array_name = array_name.replace(" ", "_")
+    return sidecar_path.with_name(f"{sidecar_path.stem}.{file_id}.{array_name}.npy")
+
+
+def paths_key(exchange_rate):
+    """Content hash of the final exchange rates a block of payouts is evaluated on.
+
+    Args:
+        exchange_rate (np.array(P,)): final exchange rate of each path.
+
+    Returns:
+        (str): hex digest.
+    """
+    return content_hash(np.asarray(exchange_rate, dtype=np.float64))
+
+
+def save_payout_store(blocks, sidecar_path, append=False):
+    """Write payout cubes with an offset index keyed by swap_config_id.
+
+    Args:
+        blocks (list): (exchange_rate, payout, swap_config_id) per block, where
+        exchange_rate (np.array(P,)) is the final exchange rate of each path,
+        payout (dict) maps STORED_COLUMNS to np.array(C, P) and swap_config_id
+        (np.array(C,)) labels the rows.
+        sidecar_path (pathlib.Path): path of the JSON sidecar.
+        append (bool): keep the blocks of an existing store that are evaluated on
+        the paths of one of the new blocks. Empty new blocks only mark their paths
+        as current.
+    """
+    sidecar_path = Path(sidecar_path)
+    new_keys = [paths_key(exchange_rate) for exchange_rate, _, _ in blocks]
+    stored_blocks = []
+    stored_ids = []
+    outdated_file_ids = set()
+    if stored_payout_index(sidecar_path) is not None:
+        sidecar = _read_sidecar(sidecar_path)
+        block_of_row = np.asarray(sidecar["offsets"]["block"], dtype=np.int64)
+        swap_config_ids = np.asarray(sidecar["offsets"]["swap_config_id"])
+        for block, block_info in enumerate(sidecar["blocks"]):
+            if append and block_info["paths_key"] in new_keys:
+                stored_blocks.append(block_info)
+                stored_ids.append(swap_config_ids[block_of_row == block])
+            else:
+                outdated_file_ids.add(block_info["file_id"])
+
+    # new files never overwrite files the current sidecar points to
+    next_file_id = max(
+        [info["file_id"] + 1 for info in stored_blocks]
+        + [file_id + 1 for file_id in outdated_file_ids],
+        default=0,
+    )
+    new_blocks = []
+    new_ids = []
+    for (exchange_rate, payout, swap_config_id), key in zip(blocks, new_keys):
+        if len(swap_config_id) == 0:
+            continue
+        exchange_rate = np.asarray(exchange_rate, dtype=np.float64)
+        np.save(_array_path(sidecar_path, next_file_id, "exchange_rate"), exchange_rate)
+        for column in STORED_COLUMNS:
+            values = np.ascontiguousarray(payout[column], dtype=np.float64)
+            assert values.shape == (len(swap_config_id), len(exchange_rate))
+            np.save(_array_path(sidecar_path, next_file_id, column), values)
+        new_blocks.append(
+            {
+                "file_id": next_file_id,
+                "shape": [len(swap_config_id), len(exchange_rate)],
+                "paths_key": key,
+            }
+        )
+        new_ids.append(np.asarray(swap_config_id))
+        next_file_id += 1
+
+    offsets = {"swap_config_id": [], "block": [], "row": []}
+    for block, swap_config_id in enumerate(stored_ids + new_ids):
+        offsets["swap_config_id"].extend(int(i) for i in swap_config_id)
+        offsets["block"].extend([block] * len(swap_config_id))
+        offsets["row"].extend(range(len(swap_config_id)))
+    assert len(set(offsets["swap_config_id"])) == len(
+        offsets["swap_config_id"]
+    ), "swap_config_id stored twice"
+
+    # the sidecar is replaced last, so it only ever describes complete blocks
+    sidecar = {
+        "format_version": STORE_FORMAT_VERSION,
+        "columns": STORED_COLUMNS,
+        "blocks": stored_blocks + new_blocks,
+        "offsets": offsets,
+    }
+    temporary_path = sidecar_path.with_name(f"{sidecar_path.name}.tmp")
+    temporary_path.write_text(json.dumps(sidecar), encoding="utf-8")
+    os.replace(temporary_path, sidecar_path)
+
+    for file_id in outdated_file_ids:
+        for array_name in ["exchange_rate"] + STORED_COLUMNS:
+            _array_path(sidecar_path, file_id, array_name).unlink(missing_ok=True)
+
+
+def _read_sidecar(sidecar_path):
+    sidecar = json.loads(Path(sidecar_path).read_text(encoding="utf-8"))
+    assert (
+        sidecar["format_version"] == STORE_FORMAT_VERSION
+    ), "Unknown payout store format"
+    return sidecar
+
+
+def load_payout_index(sidecar_path):
+    """Offset index of a payout store.
+
+    Args:
+        sidecar_path (pathlib.Path): path of the JSON sidecar.
+
+    Returns:
+        (pd.DataFrame): block, row and paths_key of each swap_config_id.
+    """
+    sidecar = _read_sidecar(sidecar_path)
+    offsets = sidecar["offsets"]
+    block_keys = np.array(
+        [block_info["paths_key"] for block_info in sidecar["blocks"]], dtype=object
+    )
+    return pd.DataFrame(
+        {
+            "block": offsets["block"],
+            "row": offsets["row"],
+            "paths_key": block_keys[np.asarray(offsets["block"], dtype=np.int64)],
+        },
+        index=pd.Index(
+            np.asarray(offsets["swap_config_id"], dtype=np.int64),
+            name="swap_config_id",
+        ),
+    )
+
+
+def stored_payout_index(sidecar_path):
+    """Offset index of an existing store that can be appended to.
+
+    Args:
+        sidecar_path (pathlib.Path): path of the JSON sidecar.
+
+    Returns:
+        (pd.DataFrame): see load_payout_index, None if there is no store of the
+        current format.
+    """
+    sidecar_path = Path(sidecar_path)
+    if not sidecar_path.exists():
+        return None
+    sidecar = json.loads(sidecar_path.read_text(encoding="utf-8"))
+    if sidecar.get("format_version") != STORE_FORMAT_VERSION:
+        return None
+    return load_payout_index(sidecar_path)
+
+
+def _load_block_column(sidecar_path, file_id, column, rows):
+    exchange_rate = np.load(
+        _array_path(sidecar_path, file_id, "exchange_rate"), mmap_mode="r"
+    )
+    if column == "exchange_rate":
+        return np.tile(exchange_rate, len(rows))
+    currency = "EURO" if column.endswith("in EURO") else "USD"
+    stored_column = column.replace("in EURO", "in USD")
+    values = np.load(_array_path(sidecar_path, file_id, stored_column), mmap_mode="r")
+    values = values[rows]
+    if currency == "EURO":
+        values = values / exchange_rate
+    return values.reshape(-1)
+
+
+def load_payout_data(sidecar_path, swap_config_id=None, columns=None):
+    """Read selected configurations and columns of a payout store as the long-format
+    payout table of calc_final_payout_grid.
+
+    Args:
+        sidecar_path (pathlib.Path): path of the JSON sidecar.
+        swap_config_id (list): configurations to read (all if None).
+        columns (list): columns of PAYOUT_COLUMNS to read (all if None).
+
+    Returns:
+        (pd.DataFrame): payout of every path of the selected configurations, indexed
+        by swap_config_id.
+    """
+    sidecar_path = Path(sidecar_path)
+    block_infos = _read_sidecar(sidecar_path)["blocks"]
+    payout_index = load_payout_index(sidecar_path)
+    if swap_config_id is not None:
+        payout_index = payout_index.loc[list(swap_config_id)]
+    columns = PAYOUT_COLUMNS if columns is None else list(columns)
+
+    # contiguous reads of the selected rows, block by block
+    payout_data_list = []
+    for block, block_index in payout_index.groupby("block", sort=False):
+        rows = block_index["row"].to_numpy()
+        file_id = block_infos[block]["file_id"]
+        block_data = {
+            column: _load_block_column(sidecar_path, file_id, column, rows)
+            for column in columns
+        }
+        n_paths = block_infos[block]["shape"][1]
+        payout_data_list.append(
+            pd.DataFrame(
+                block_data,
+                index=pd.Index(
+                    np.repeat(block_index.index.to_numpy(), n_paths),
+                    name="swap_config_id",
+                ),
+                columns=columns,
+            )
+        )
+    return pd.concat(payout_data_list)
@@ -0,0 +1,261 @@
+"""
+Monte Carlo estimators of the payout statistics with their standard errors.
+
+calc_payout_summary averages over the simulated paths as if they were
+independent. Two variance-reduction techniques reach the same precision with
+fewer paths:
+
+* antithetic pairs (see antithetic_pairs in task_simulate_sample): the
+  statistics are averaged per pair first and the standard error is computed
+  from the pair averages, which vary less than single paths.
+* control variate: the cumulative exchange rate change of a bootstrapped path
+  has a known mean, trading_days times the mean daily log return of the data
+  (every bootstrapped day is drawn uniformly from the data). The sample mean of
+  a statistic is corrected by its regression coefficient on the cumulative
+  change times the deviation of the sample mean change from the known mean.
+
+Only running sums are kept per chunk of paths, so memory does not grow with the
+number of paths. Antithetic pairs and the control variate apply to bootstrapped
+simulations (antithetic and control_variate in simulation_config.json);
+historical windows are estimated with plain sample means.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+import pytask
+
+from src.config import BLD
+from src.config import SRC
+from src.financial_contracts.swap_contract import PAYOUT_SUM_COLUMNS
+from src.financial_contracts.swap_contract import payout_currency_swap_grid
+from src.simulation.task_simulate_sample import load_log_returns
+from src.simulation_analysis.task_swap_payout import grid_metadata
+from src.simulation_analysis.utility import SCENARIO_COLUMNS
+from src.simulation_analysis.utility import extract_simulation_name
+from src.simulation_analysis.utility import generate_missing_directories
+from src.simulation_analysis.utility import load_cumulative_change
+from src.simulation_analysis.utility import scenario_grid
+
+ESTIMATOR_CHUNK_SIZE = 10_000
+
+
+def _path_statistics(final_exchange_rate, leverage, USD_asset_allocation, scenarios):
+    # per configuration and path: negative payout flag and payouts (C, P, K)
+    eurlong_payout, eurshort_payout = payout_currency_swap_grid(
+        final_exchange_rate,
+        1,
+        leverage,
+        USD_asset_allocation,
+        **{column: scenarios[column].to_numpy() for column in SCENARIO_COLUMNS},
+    )
+    eurlong_payout_euro = eurlong_payout / final_exchange_rate
+    eurshort_payout_euro = eurshort_payout / final_exchange_rate
+    statistics = np.stack(
+        [
+            (eurlong_payout_euro < 0) | (eurshort_payout_euro < 0),
+            eurlong_payout,
+            eurshort_payout,
+            eurlong_payout_euro,
+            eurshort_payout_euro,
+        ],
+        axis=-1,
+    )
+    return statistics.reshape(-1, len(final_exchange_rate), len(PAYOUT_SUM_COLUMNS))
+
+
+def estimate_payout_statistics(
+    cumulative_forex_change,
+    leverage,
+    USD_asset_allocation,
+    scenario_config,
+    expected_change=None,
+    antithetic=False,
+    chunk_size=ESTIMATOR_CHUNK_SIZE,
+):
+    """Estimates and standard errors of the payout statistics of
+    aggregate_final_payout_chunks for every (leverage, USD_asset_allocation,
+    scenario) configuration.
+
+    Args:
+        cumulative_forex_change (pd.Series or np.array): cumulative EUR/USD exchange
+        rate change of each path.
+        leverage (list): Leverage factors of the currency swap. Must be larger than 1.
+        USD_asset_allocation (list): Shares of assets invested in USD. Must be between 0 and 1.
+        scenario_config (dict): assumed macroeconomic conditions.
+        expected_change (float): known mean of the cumulative change, used as control
+        variate (plain sample means if None).
+        antithetic (bool): paths are antithetic pairs (rows 2k and 2k + 1).
+        chunk_size (int): number of paths evaluated at once.
+
+    Returns:
+        (pd.DataFrame): number of paths, estimate and standard error ("std_error"
+        suffix) of every statistic of PAYOUT_SUM_COLUMNS per swap_config_id.
+    """
+    change = np.asarray(cumulative_forex_change, dtype=np.float64)
+    scenarios = scenario_grid(scenario_config)
+    pair_size = 2 if antithetic else 1
+    assert len(change) % pair_size == 0, "Antithetic paths must come in pairs"
+    chunk_size = max(chunk_size - chunk_size % pair_size, pair_size)
+
+    # running sums over the sampling units (paths or antithetic pairs)
+    n_configurations = len(scenarios) * len(leverage) * len(USD_asset_allocation)
+    shape = (n_configurations, len(PAYOUT_SUM_COLUMNS))
+    sum_x, sum_xx = 0.0, 0.0
+    sum_y, sum_yy, sum_xy = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+    for start in range(0, len(change), chunk_size):
+        chunk = change[start : start + chunk_size]
+        y = _path_statistics(1 + chunk, leverage, USD_asset_allocation, scenarios)
+        # average antithetic pairs into one unit
+        x = chunk.reshape(-1, pair_size).mean(axis=1)
+        y = y.reshape(n_configurations, -1, pair_size, shape[1]).mean(axis=2)
+        sum_x += x.sum()
+        sum_xx += x @ x
+        sum_y += y.sum(axis=1)
+        sum_yy += np.einsum("cuk,cuk->ck", y, y)
+        sum_xy += np.einsum("u,cuk->ck", x, y)
+
+    n_units = len(change) // pair_size
+    assert n_units > 1, "Standard errors need at least two sampling units"
+    mean_x, mean_y = sum_x / n_units, sum_y / n_units
+    s_xx = sum_xx - n_units * mean_x**2
+    s_xy = sum_xy - n_units * mean_x * mean_y
+    s_yy = np.maximum(sum_yy - n_units * mean_y**2, 0)
+
+    if expected_change is not None and s_xx > 1e-12 * n_units:
+        beta = s_xy / s_xx
+        estimate = mean_y - beta * (mean_x - expected_change)
+        residual_variance = np.maximum(s_yy - beta * s_xy, 0) / (n_units - 2)
+    else:
+        # no control variate, or the pairs already match its mean exactly
+        estimate = mean_y
+        residual_variance = s_yy / (n_units - 1)
+    std_error = np.sqrt(residual_variance / n_units)
+
+    estimates = pd.DataFrame(
+        np.column_stack([estimate, std_error]),
+        columns=PAYOUT_SUM_COLUMNS
+        + [f"{column} std_error" for column in PAYOUT_SUM_COLUMNS],
+        index=grid_metadata(leverage, USD_asset_allocation, scenario_config).index,
+    )
+    estimates.insert(0, "n_paths", len(change))
+    return estimates
+
+
+def calc_payout_estimates(
+    cumulative_forex_change,
+    leverage,
+    USD_asset_allocation,
+    scenario_config,
+    trading_days,
+    mean_return=None,
+    antithetic=False,
+):
+    """Payout estimates (see estimate_payout_statistics) with the same
+    swap_config_id as calc_payout_summary.
+
+    Args:
+        cumulative_forex_change (pd.Series or dict): cumulative EUR/USD exchange rate
+        change of each path ({trading_days: pd.Series} for multi-horizon simulations).
+        leverage (list): Leverage factors of the currency swap. Must be larger than 1.
+        USD_asset_allocation (list): Shares of assets invested in USD. Must be between 0 and 1.
+        scenario_config (dict): assumed macroeconomic conditions.
+        trading_days (int): simulated horizon (ignored for multi-horizon simulations,
+        which are keyed by horizon).
+        mean_return (float): mean daily log return; the horizon times mean_return is
+        the known mean of the control variate (no control variate if None).
+        antithetic (bool): paths are antithetic pairs.
+
+    Returns:
+        (pd.DataFrame): estimates and standard errors per swap_config_id.
+    """
+    if not isinstance(cumulative_forex_change, dict):
+        return estimate_payout_statistics(
+            cumulative_forex_change,
+            leverage,
+            USD_asset_allocation,
+            scenario_config,
+            expected_change=None if mean_return is None else trading_days * mean_return,
+            antithetic=antithetic,
+        )
+
+    estimates_list = []
+    for horizon, horizon_change in cumulative_forex_change.items():
+        estimates = estimate_payout_statistics(
+            horizon_change,
+            leverage,
+            USD_asset_allocation,
+            scenario_config,
+            expected_change=None if mean_return is None else horizon * mean_return,
+            antithetic=antithetic,
+        )
+        estimates.index = grid_metadata(
+            leverage, USD_asset_allocation, scenario_config, trading_days=horizon
+        ).index
+        estimates_list.append(estimates)
+    return pd.concat(estimates_list)
+
+
+# varying specifications
+specifications = (
+    (
+        {
+            "simulated_data": BLD / "simulated_data" / f"simulated_data_{simulation_name}.json",
+            "raw_data": BLD / "historical_data" / "raw_data.pickle",
+            "sim_config": SRC / "contract_specs" / "simulation_config.json",
+            "scenario_config": SRC / "contract_specs" / "scenario_config.json",
+            "swap_config": SRC / "contract_specs" / "swap_config.json",
+        },
+        {
+            "payout_estimates": BLD / "simulated_payout" / f"payout_estimates_{simulation_name}.pickle",
+        },
+    )
+    for simulation_name in ["historical", "bootstrapped"]
+)
+
+
+@pytask.mark.parametrize("depends_on, produces", specifications)
+def task_payout_estimates(depends_on, produces):
+    # parse json data
+    sim_config = json.loads(depends_on["sim_config"].read_text(encoding="utf-8"))
+    swap_config = json.loads(depends_on["swap_config"].read_text(encoding="utf-8"))
+    scenario_config = json.loads(
+        depends_on["scenario_config"].read_text(encoding="utf-8")
+    )
+
+    # variance reduction only applies to bootstrapped paths
+    is_bootstrapped = extract_simulation_name(depends_on["simulated_data"]) == (
+        "bootstrapped"
+    )
+    mean_return = None
+    if is_bootstrapped and sim_config["control_variate"]:
+        mean_return = load_log_returns(depends_on["raw_data"]).mean()
+
+    payout_estimates = calc_payout_estimates(
+        load_cumulative_change(depends_on["simulated_data"]),
+        swap_config["leverage"],
+        swap_config["USD_asset_allocation"],
+        scenario_config,
+        sim_config["trading_days"],
+        mean_return=mean_return,
+        antithetic=is_bootstrapped and sim_config["antithetic"],
+    )
+
+    generate_missing_directories(produces)
+    payout_estimates.to_pickle(produces["payout_estimates"])
+
+
+if __name__ == "__main__":
+    simulation_name = "bootstrapped"
+    depends_on = {
+        "simulated_data": BLD / "simulated_data" / f"simulated_data_{simulation_name}.json",
+        "raw_data": BLD / "historical_data" / "raw_data.pickle",
+        "sim_config": SRC / "contract_specs" / "simulation_config.json",
+        "scenario_config": SRC / "contract_specs" / "scenario_config.json",
+        "swap_config": SRC / "contract_specs" / "swap_config.json",
+    }
+    produces = {
+        "payout_estimates": BLD / "simulated_payout" / f"payout_estimates_{simulation_name}.pickle",
+    }
+
+    task_payout_estimates(depends_on, produces)
@@ -0,0 +1,265 @@
+"""
+Marks both certificates to market after every day of every simulated path.
+
+The payout stage only looks at the final exchange rate. Here the stored log
+return paths of task_simulate_sample are valued day by day (see
+mark_to_market_array: a cumulative sum over the days gives the exchange rate
+path, a cumulative product the accrued deposit returns) and reduced to
+intra-horizon risk statistics per swap configuration. Paths are read from the
+memory-mapped sample store in chunks of valuation_chunk_size paths, so memory is
+bounded by chunk size x trading days and the valuation runs at the same scale
+as the terminal payouts.
+
+Certificates are knock-out certificates: the first day a certificate's value
+touches knock_out_barrier (swap_config.json) it is terminated and keeps its
+value of that day (see apply_knock_out). All statistics are computed on these
+terminated paths. Per configuration the knock-out probability of each
+certificate and the distribution of the knock-out day are reported as well.
+
+Multi-horizon simulations are valued over the longest horizon. Summaries are
+indexed by the same swap_config_id as the payout metadata of that horizon.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+import pytask
+
+from src.config import BLD
+from src.config import SRC
+from src.financial_contracts.swap_contract import apply_knock_out
+from src.financial_contracts.swap_contract import knock_out_day
+from src.financial_contracts.swap_contract import mark_to_market_array
+from src.simulation.sample_store import load_simulated_sample
+from src.simulation_analysis.task_swap_payout import grid_metadata
+from src.simulation_analysis.utility import SCENARIO_COLUMNS
+from src.simulation_analysis.utility import generate_missing_directories
+
+MARK_TO_MARKET_SUM_COLUMNS = [
+    "negative_value",
+    "min EURlong value in USD",
+    "min EURshort value in USD",
+    "days with negative value",
+    "knock_out EURlong",
+    "knock_out EURshort",
+]
+CERTIFICATES = ["EURlong", "EURshort"]
+
+
+def simulated_paths(sample):
+    """Daily log return paths of a simulated sample (longest horizon of
+    multi-horizon simulations).
+
+    Args:
+        sample (pd.DataFrame or dict): simulated sample (see load_simulated_sample).
+
+    Returns:
+        (pd.DataFrame): log returns, one path per row and one day per column.
+    """
+    if isinstance(sample, dict) and "paths" in sample:
+        return sample["paths"][max(sample["paths"])]
+    assert isinstance(
+        sample, pd.DataFrame
+    ), "Mark-to-market valuation needs full paths, rerun the simulation without summary_only"
+    return sample
+
+
+def iter_path_chunks(paths, chunk_size):
+    """Yield consecutive chunks of paths.
+
+    Args:
+        paths (pd.DataFrame): log return paths (possibly memory mapped).
+        chunk_size (int): number of paths per chunk.
+
+    Yields:
+        (np.array(chunk_size, T)): log returns of the paths of one chunk.
+    """
+    values = paths.to_numpy()
+    for start in range(0, len(values), chunk_size):
+        yield np.asarray(values[start : start + chunk_size], dtype=np.float64)
+
+
+def aggregate_mark_to_market_chunks(
+    path_chunks, leverage, USD_asset_allocation, scenario_config, knock_out_barrier=0.0
+):
+    """Aggregate intra-horizon risk statistics of all (leverage,
+    USD_asset_allocation, scenario) configurations over chunks of log return paths.
+    Only running sums are kept, so the result does not depend on the chunking.
+
+    Args:
+        path_chunks (iterable): chunks (np.array(P, T)) of daily EUR/USD log returns.
+        leverage (list): Leverage factors of the currency swap. Must be larger than 1.
+        USD_asset_allocation (list): Shares of assets invested in USD. Must be between 0 and 1.
+        scenario_config (dict): assumed macroeconomic conditions (deposit returns over
+        the whole horizon).
+        knock_out_barrier (float): knock-out level of the certificate values (see
+        knock_out_day).
+
+    Returns:
+        summary (pd.DataFrame): statistics of the knocked-out value paths: number of
+        paths, share of paths on which one of the certificates has a negative value
+        on some day, mean of the lowest value of
+        each certificate (in USD), mean number of days with a negative value and
+        knock-out probability of each certificate per swap_config_id (see
+        grid_metadata).
+        knock_out_distribution (pd.DataFrame): share of paths knocked out on each
+        day (columns, 1 is the first simulated day) per swap_config_id and
+        certificate.
+    """
+    start_exchange_rate = 1
+    meta_data = grid_metadata(leverage, USD_asset_allocation, scenario_config)
+    configurations = meta_data[
+        ["leverage", "USD_asset_allocation"] + SCENARIO_COLUMNS
+    ].to_numpy()
+    n_paths = 0
+    sums = np.zeros((len(meta_data), len(MARK_TO_MARKET_SUM_COLUMNS)))
+    knock_out_counts = None
+
+    for return_paths in path_chunks:
+        n_paths += len(return_paths)
+        n_days = return_paths.shape[1]
+        if knock_out_counts is None:
+            knock_out_counts = np.zeros((len(meta_data), len(CERTIFICATES), n_days))
+        for i, (lev, allocation, euro_return, usd_return) in enumerate(configurations):
+            value_paths = mark_to_market_array(
+                return_paths,
+                start_exchange_rate,
+                allocation,
+                lev,
+                euro_return,
+                usd_return,
+            )
+            # terminate every certificate on its knock-out day
+            knocked_out_paths = []
+            for j, certificate_value in enumerate(value_paths):
+                day = knock_out_day(certificate_value, knock_out_barrier)
+                knock_out_counts[i, j] += np.bincount(
+                    day[day >= 0], minlength=n_days
+                )
+                knocked_out_paths.append(apply_knock_out(certificate_value, day))
+            eurlong_value, eurshort_value = knocked_out_paths
+
+            # the exchange rate is positive, so the sign is the same in EURO
+            is_negative = (eurlong_value < 0) | (eurshort_value < 0)
+            sums[i, 0] += is_negative.any(axis=1).sum()
+            sums[i, 1] += eurlong_value.min(axis=1).sum()
+            sums[i, 2] += eurshort_value.min(axis=1).sum()
+            sums[i, 3] += is_negative.sum()
+
+    assert n_paths > 0, "No paths to aggregate"
+    sums[:, 4:6] = knock_out_counts.sum(axis=-1)
+    summary = pd.DataFrame(
+        sums / n_paths, columns=MARK_TO_MARKET_SUM_COLUMNS, index=meta_data.index
+    )
+    summary.insert(0, "n_paths", n_paths)
+    knock_out_distribution = pd.DataFrame(
+        knock_out_counts.reshape(-1, knock_out_counts.shape[-1]) / n_paths,
+        index=pd.MultiIndex.from_product(
+            [meta_data.index, CERTIFICATES], names=["swap_config_id", "certificate"]
+        ),
+        columns=pd.RangeIndex(1, knock_out_counts.shape[-1] + 1, name="day"),
+    )
+    return summary, knock_out_distribution
+
+
+def knock_out_day_quantiles(knock_out_distribution, quantiles=(0.1, 0.5, 0.9)):
+    """Quantiles of the knock-out day among the knocked out paths.
+
+    Args:
+        knock_out_distribution (pd.DataFrame): share of paths knocked out on each day
+        (see aggregate_mark_to_market_chunks).
+        quantiles (tuple): probabilities of the quantiles.
+
+    Returns:
+        (pd.DataFrame): knock-out day quantiles (columns) per swap_config_id and
+        certificate, NaN if no path is knocked out.
+    """
+    cumulative = knock_out_distribution.to_numpy().cumsum(axis=1)
+    total = cumulative[:, -1:]
+    days = knock_out_distribution.columns.to_numpy()
+    out = {}
+    for quantile in quantiles:
+        # first day on which the share of knocked out paths reaches the quantile
+        reached = cumulative >= quantile * total
+        out[quantile] = np.where(
+            total[:, 0] > 0, days[np.argmax(reached, axis=1)], np.nan
+        )
+    return pd.DataFrame(out, index=knock_out_distribution.index)
+
+
+# varying specifications
+specifications = (
+    (
+        {
+            "simulated_data": BLD / "simulated_data" / f"simulated_data_{simulation_name}.json",
+            "sim_config": SRC / "contract_specs" / "simulation_config.json",
+            "scenario_config": SRC / "contract_specs" / "scenario_config.json",
+            "swap_config": SRC / "contract_specs" / "swap_config.json",
+        },
+        {
+            "mark_to_market_summary": BLD
+            / "simulated_payout"
+            / f"mark_to_market_summary_{simulation_name}.pickle",
+            "knock_out_distribution": BLD
+            / "simulated_payout"
+            / f"knock_out_distribution_{simulation_name}.pickle",
+        },
+    )
+    for simulation_name in ["historical", "bootstrapped"]
+)
+
+
+@pytask.mark.parametrize("depends_on, produces", specifications)
+def task_swap_mark_to_market(depends_on, produces):
+    # parse json data
+    sim_config = json.loads(depends_on["sim_config"].read_text(encoding="utf-8"))
+    swap_config = json.loads(depends_on["swap_config"].read_text(encoding="utf-8"))
+    scenario_config = json.loads(
+        depends_on["scenario_config"].read_text(encoding="utf-8")
+    )
+
+    # value the memory mapped paths chunk by chunk
+    sample = load_simulated_sample(depends_on["simulated_data"])
+    summary, knock_out_distribution = aggregate_mark_to_market_chunks(
+        iter_path_chunks(simulated_paths(sample), sim_config["valuation_chunk_size"]),
+        swap_config["leverage"],
+        swap_config["USD_asset_allocation"],
+        scenario_config,
+        swap_config["knock_out_barrier"],
+    )
+    if isinstance(sample, dict):
+        # same swap_config_id as the payout metadata of the longest horizon
+        swap_config_id = grid_metadata(
+            swap_config["leverage"],
+            swap_config["USD_asset_allocation"],
+            scenario_config,
+            trading_days=max(sample["paths"]),
+        ).index
+        summary.index = swap_config_id
+        knock_out_distribution.index = pd.MultiIndex.from_product(
+            [swap_config_id, CERTIFICATES], names=["swap_config_id", "certificate"]
+        )
+
+    generate_missing_directories(produces)
+    summary.to_pickle(produces["mark_to_market_summary"])
+    knock_out_distribution.to_pickle(produces["knock_out_distribution"])
+
+
+if __name__ == "__main__":
+    simulation_name = "bootstrapped"
+    depends_on = {
+        "simulated_data": BLD / "simulated_data" / f"simulated_data_{simulation_name}.json",
+        "sim_config": SRC / "contract_specs" / "simulation_config.json",
+        "scenario_config": SRC / "contract_specs" / "scenario_config.json",
+        "swap_config": SRC / "contract_specs" / "swap_config.json",
+    }
+    produces = {
+        "mark_to_market_summary": BLD
+        / "simulated_payout"
+        / f"mark_to_market_summary_{simulation_name}.pickle",
+        "knock_out_distribution": BLD
+        / "simulated_payout"
+        / f"knock_out_distribution_{simulation_name}.pickle",
+    }
+
+    task_swap_mark_to_market(depends_on, produces)
@@ -1,12 +1,55 @@
+"""
+Payout of the currency swap contract for every configuration of swap_config.json
+and every deposit-return scenario of scenario_config.json on the simulated
+exchange rate changes.
+
+scenario_config.json holds one value or a list of values per deposit return, or a
+list of rate pairs under "scenarios" (see scenario_grid). Scenarios are one more
+axis of the configuration grid: all of them are evaluated in the same
+broadcasted pass over the paths.
+
+Payouts of every (leverage, USD_asset_allocation, scenario) cell are also cached
+under a hash of the exchange rate changes, the cell and the contract source code
+(see src.result_cache).
+
+swap_config_id is derived from the parameters of a configuration, so it does not
+change when the grid grows. The payout store is extended in place: configurations
+it already holds for the current paths are kept and only new configurations are
+evaluated and appended (see src.simulation_analysis.payout_store). The store may
+therefore hold configurations that were removed from the configuration files;
+the metadata lists the current ones.
+"""
 import json
+import logging
+import time
 
+import numpy as np
 import pandas as pd
 import pytask
+import src.financial_contracts.swap_contract as swap_contract
 from src.config import BLD
 from src.config import SRC
+from src.financial_contracts.swap_contract import PAYOUT_SUM_COLUMNS
 from src.financial_contracts.swap_contract import payout_currency_swap
-from src.simulation_analysis.utility import get_total_exchange_rate_change
+from src.financial_contracts.swap_contract import payout_currency_swap_array
+from src.financial_contracts.swap_contract import sum_payout_grid
+from src.result_cache import CACHE_DIR
+from src.result_cache import content_hash
+from src.result_cache import is_cached
+from src.result_cache import load_or_compute
+from src.result_cache import source_version
+from src.simulation_analysis.payout_index import build_change_index
+from src.simulation_analysis.payout_store import paths_key
+from src.simulation_analysis.payout_store import save_payout_store
+from src.simulation_analysis.payout_store import stored_payout_index
+from src.simulation_analysis.utility import SCENARIO_COLUMNS
+from src.simulation_analysis.utility import load_cumulative_change
+from src.simulation_analysis.utility import scenario_grid
 from src.simulation_analysis.utility import generate_missing_directories
+
+logger = logging.getLogger(__name__)
+
+
 def calc_final_payout(
     cumulative_forex_change, leverage, USD_asset_allocation, scenario_config
 ):
@@ -56,39 +99,441 @@ def calc_final_payout(
     return payout_data
 
 
-def filename_to_metadata(run_id, leverage, USD_asset_allocation):
-    """Write information about simulation configurations to a pd.DataFrame
+def _configuration_columns(meta_data):
+    # contract parameters of each configuration as np.array(C, 1)
+    return {
+        column: meta_data[column].to_numpy(np.float64)[:, np.newaxis]
+        for column in ["leverage", "USD_asset_allocation"] + SCENARIO_COLUMNS
+    }
+
+
+def _payout_cube(cumulative_forex_change, meta_data, cache_dir=None):
+    # final exchange rate of each path and (configuration, path) payouts in USD;
+    # leverage, allocation and deposit returns of the configurations are broadcast
+    # against the paths, so every scenario is evaluated in the same pass
+    start_exchange_rate = 1
+    final_exchange_rate = start_exchange_rate + np.asarray(
+        cumulative_forex_change, dtype=np.float64
+    )
+    if cache_dir is not None:
+        return final_exchange_rate, cached_payout_cells(
+            final_exchange_rate, meta_data, cache_dir
+        )
+
+    eurlong_payout, eurshort_payout = payout_currency_swap_array(
+        final_exchange_rate.reshape(1, -1),
+        start_exchange_rate,
+        **_configuration_columns(meta_data),
+    )
+    payout = {
+        "EURlong payout in USD": eurlong_payout,
+        "EURshort payout in USD": eurshort_payout,
+    }
+    return final_exchange_rate, payout
+
+
+def cached_payout_cells(final_exchange_rate, meta_data, cache_dir=CACHE_DIR):
+    """(configuration, path) payouts in USD assembled from one cache entry per
+    (leverage, USD_asset_allocation, scenario) cell. Cells that are not cached are
+    evaluated together in one broadcasted computation and cached.
 
     Args:
-        run_id (id): Id of simulation configuration.
-        leverage (float): Leverage factor of the currency swap
-        USD_asset_allocation (float): Share of assets invested in USD. Must be between 0 and 1.
+        final_exchange_rate (np.array(P,)): Final EURO/USD exchange rate of each path.
+        meta_data (pd.DataFrame): leverage, USD_asset_allocation and deposit returns
+        of each configuration (see grid_metadata).
+        cache_dir (pathlib.Path): cache directory.
 
     Returns:
-        (pd.DataFrame): background information of the simulation run.
+        (dict): EURlong and EURshort payout in USD as np.array(C, P), with the
+        configurations in the order of meta_data.
     """
-    metadata = pd.DataFrame(
+    start_exchange_rate = 1
+    if meta_data.empty:
+        empty = np.empty((0, len(final_exchange_rate)))
+        return {"EURlong payout in USD": empty, "EURshort payout in USD": empty}
+    exchange_rate_key = paths_key(final_exchange_rate)
+    contract_version = source_version(swap_contract)
+    configuration_columns = _configuration_columns(meta_data)
+    cell_keys = [
+        content_hash(exchange_rate_key, parameters.tolist(), contract_version)
+        for parameters in np.hstack(list(configuration_columns.values()))
+    ]
+
+    # evaluate all missing cells at once, shape (missing, P)
+    missing = [
+        i
+        for i, key in enumerate(cell_keys)
+        if not is_cached("payout_cells", key, cache_dir)
+    ]
+    computed = {}
+    if missing:
+        eurlong_payout, eurshort_payout = payout_currency_swap_array(
+            final_exchange_rate.reshape(1, -1),
+            start_exchange_rate,
+            **{
+                column: values[missing]
+                for column, values in configuration_columns.items()
+            },
+        )
+        computed = {
+            i: np.stack([eurlong_payout[row], eurshort_payout[row]])
+            for row, i in enumerate(missing)
+        }
+
+    cells = [
+        load_or_compute("payout_cells", key, lambda i=i: computed[i], cache_dir)
+        for i, key in enumerate(cell_keys)
+    ]
+    cells = np.stack(cells, axis=1)
+    return {"EURlong payout in USD": cells[0], "EURshort payout in USD": cells[1]}
+
+
+def _long_format(final_exchange_rate, payout, swap_config_id):
+    # one block of paths per configuration
+    n_configs, n_paths = payout["EURlong payout in USD"].shape
+    eurlong_payout = payout["EURlong payout in USD"].reshape(-1)
+    eurshort_payout = payout["EURshort payout in USD"].reshape(-1)
+    exchange_rate = np.tile(final_exchange_rate, n_configs)
+    return pd.DataFrame(
         {
-            "swap_config_id": run_id,
-            "leverage": leverage,
-            "USD_asset_allocation": USD_asset_allocation,
+            "EURlong payout in USD": eurlong_payout,
+            "EURshort payout in USD": eurshort_payout,
+            "exchange_rate": exchange_rate,
+            "EURlong payout in EURO": eurlong_payout / exchange_rate,
+            "EURshort payout in EURO": eurshort_payout / exchange_rate,
         },
-        index=[0],
+        index=pd.Index(np.repeat(swap_config_id, n_paths), name="swap_config_id"),
+    )
+
+
+def calc_final_payout_grid(
+    cumulative_forex_change, leverage, USD_asset_allocation, scenario_config
+):
+    """Calculate the finale payout of the currency swap contract for all combinations
+    of leverage, USD_asset_allocation and deposit-return scenario in one broadcasted
+    computation.
+
+    Args:
+        cumulative_forex_change (pd.Series): cumulative EUR/USD exchange rate change over 1
+        year.
+        leverage (list): Leverage factors of the currency swap. Must be larger than 1.
+        USD_asset_allocation (list): Shares of assets invested in USD. Must be between 0 and 1.
+        scenario_config (dict): assumed macroeconomic conditions (see scenario_grid).
+
+    Returns:
+        payout_data (pd.DataFrame): Payout of swap contract (in EURO & USD), indexed by
+        swap_config_id.
+        meta_data (pd.DataFrame): leverage, USD_asset_allocation and deposit returns of
+        each swap_config_id.
+    """
+    meta_data = grid_metadata(leverage, USD_asset_allocation, scenario_config)
+    final_exchange_rate, payout = _payout_cube(cumulative_forex_change, meta_data)
+    payout_data = _long_format(final_exchange_rate, payout, meta_data.index)
+    return payout_data, meta_data
+
+
+def configuration_ids(meta_data):
+    """Stable swap_config_id of every configuration, derived from its parameters
+    (a 60 bit prefix of their content hash). A configuration keeps its id when
+    other configurations are added to or removed from swap_config.json or
+    scenario_config.json.
+
+    Args:
+        meta_data (pd.DataFrame): parameters of each configuration.
+
+    Returns:
+        (np.array): int64 swap_config_id of each row of meta_data.
+    """
+    return np.array(
+        [
+            int(
+                content_hash({key: float(value) for key, value in row.items()})[:15],
+                16,
+            )
+            for row in meta_data.to_dict("records")
+        ],
+        dtype=np.int64,
     )
-    return metadata
+
+
+def grid_metadata(
+    leverage, USD_asset_allocation, scenario_config=None, trading_days=None
+):
+    """(trading_days,) leverage, USD_asset_allocation and deposit returns of each
+    configuration of the grid, indexed by swap_config_id (see configuration_ids).
+    Scenarios vary slowest, USD_asset_allocation fastest.
+
+    Args:
+        leverage (list): Leverage factors of the currency swap.
+        USD_asset_allocation (list): Shares of assets invested in USD.
+        scenario_config (dict): assumed macroeconomic conditions (see scenario_grid).
+        No deposit-return columns if None, e.g. when deposit returns follow
+        simulated rate paths.
+        trading_days (int): simulated horizon (no trading_days column if None).
+
+    Returns:
+        (pd.DataFrame): background information of the simulation runs.
+    """
+    if scenario_config is None:
+        scenarios = pd.DataFrame(index=[0])
+    else:
+        scenarios = scenario_grid(scenario_config)
+    n_scenarios = len(scenarios)
+    n_leverage, n_allocation = len(leverage), len(USD_asset_allocation)
+    meta_data = pd.DataFrame(
+        {
+            "leverage": np.tile(np.repeat(leverage, n_allocation), n_scenarios),
+            "USD_asset_allocation": np.tile(
+                USD_asset_allocation, n_leverage * n_scenarios
+            ),
+            **{
+                column: np.repeat(scenarios[column], n_leverage * n_allocation)
+                for column in scenarios.columns
+            },
+        }
+    )
+    if trading_days is not None:
+        meta_data.insert(0, "trading_days", trading_days)
+    meta_data.index = pd.Index(configuration_ids(meta_data), name="swap_config_id")
+    return meta_data
+
+
+def aggregate_final_payout_chunks(
+    cumulative_forex_changes, leverage, USD_asset_allocation, scenario_config
+):
+    """Aggregate the payout of all (leverage, USD_asset_allocation, scenario)
+    configurations over chunks of cumulative exchange rate changes without building
+    the payout table (see sum_payout_grid).
+
+    Args:
+        cumulative_forex_changes (iterable): chunks (np.array) of cumulative EUR/USD
+        exchange rate changes.
+        leverage (list): Leverage factors of the currency swap. Must be larger than 1.
+        USD_asset_allocation (list): Shares of assets invested in USD. Must be between 0 and 1.
+        scenario_config (dict): assumed macroeconomic conditions.
+
+    Returns:
+        (pd.DataFrame): number of paths, share of runs with negative payout and mean
+        payouts (in EURO & USD) per swap_config_id.
+    """
+    start_exchange_rate = 1
+    scenarios = scenario_grid(scenario_config)
+    shape = (len(scenarios), len(leverage), len(USD_asset_allocation))
+    n_paths = 0
+    payout_sums = np.zeros(shape + (len(PAYOUT_SUM_COLUMNS),))
+
+    for cumulative_forex_change in cumulative_forex_changes:
+        final_exchange_rate = start_exchange_rate + np.asarray(
+            cumulative_forex_change, dtype=np.float64
+        )
+        n_paths += len(final_exchange_rate)
+        payout_sums += sum_payout_grid(
+            final_exchange_rate=final_exchange_rate,
+            start_exchange_rate=start_exchange_rate,
+            leverage=leverage,
+            USD_asset_allocation=USD_asset_allocation,
+            **{column: scenarios[column].to_numpy() for column in SCENARIO_COLUMNS},
+        )
+
+    assert n_paths > 0, "No paths to aggregate"
+    summary = pd.DataFrame(
+        payout_sums.reshape(-1, len(PAYOUT_SUM_COLUMNS)) / n_paths,
+        columns=PAYOUT_SUM_COLUMNS,
+        index=grid_metadata(leverage, USD_asset_allocation, scenario_config).index,
+    )
+    summary.insert(0, "n_paths", n_paths)
+    return summary
+
+
+def aggregate_final_payout_rate_paths(rate_path_chunks, leverage, USD_asset_allocation):
+    """Aggregate the payout of all (leverage, USD_asset_allocation) configurations
+    when deposit returns follow daily rate paths aligned with every simulated path
+    (see iter_bootstrapped_rate_paths). The deposit return of each path is the
+    product of its daily growth factors (the last day of deposit_growth, without
+    the intermediate days), so memory is proportional to the chunk size, never to
+    paths x days x configurations.
+
+    Args:
+        rate_path_chunks (iterable): chunks of (cumulative_forex_change (np.array(P,)),
+        euro_deposit_rate (np.array(P, T)), usd_deposit_rate (np.array(P, T))) with
+        daily simple deposit returns of each path.
+        leverage (list): Leverage factors of the currency swap. Must be larger than 1.
+        USD_asset_allocation (list): Shares of assets invested in USD. Must be between 0 and 1.
+
+    Returns:
+        (pd.DataFrame): number of paths, share of runs with negative payout and mean
+        payouts (in EURO & USD) per swap_config_id (see grid_metadata without
+        scenario).
+    """
+    start_exchange_rate = 1
+    USD_asset_allocation_column = np.asarray(USD_asset_allocation, dtype=np.float64)
+    USD_asset_allocation_column = USD_asset_allocation_column[:, np.newaxis]
+    n_paths = 0
+    payout_sums = np.zeros(
+        (len(leverage), len(USD_asset_allocation), len(PAYOUT_SUM_COLUMNS))
+    )
+
+    for cumulative_forex_change, euro_rates, usd_rates in rate_path_chunks:
+        final_exchange_rate = start_exchange_rate + np.asarray(
+            cumulative_forex_change, dtype=np.float64
+        )
+        n_paths += len(final_exchange_rate)
+        # accrued deposit return of each path, shape (1, P)
+        return_on_euro_deposits = np.prod(1 + euro_rates, axis=-1)[np.newaxis, :] - 1
+        return_on_usd_deposits = np.prod(1 + usd_rates, axis=-1)[np.newaxis, :] - 1
+
+        # one (allocation, path) slice at a time keeps memory at A x P
+        for i, lev in enumerate(leverage):
+            eurlong_payout, eurshort_payout = payout_currency_swap_array(
+                final_exchange_rate[np.newaxis, :],
+                start_exchange_rate,
+                USD_asset_allocation_column,
+                lev,
+                return_on_euro_deposits,
+                return_on_usd_deposits,
+            )
+            eurlong_payout_euro = eurlong_payout / final_exchange_rate
+            eurshort_payout_euro = eurshort_payout / final_exchange_rate
+            is_negative = (eurlong_payout_euro < 0) | (eurshort_payout_euro < 0)
+            payout_sums[i, :, 0] += is_negative.sum(axis=-1)
+            payout_sums[i, :, 1] += eurlong_payout.sum(axis=-1)
+            payout_sums[i, :, 2] += eurshort_payout.sum(axis=-1)
+            payout_sums[i, :, 3] += eurlong_payout_euro.sum(axis=-1)
+            payout_sums[i, :, 4] += eurshort_payout_euro.sum(axis=-1)
+
+    assert n_paths > 0, "No paths to aggregate"
+    summary = pd.DataFrame(
+        payout_sums.reshape(-1, len(PAYOUT_SUM_COLUMNS)) / n_paths,
+        columns=PAYOUT_SUM_COLUMNS,
+        index=grid_metadata(leverage, USD_asset_allocation).index,
+    )
+    summary.insert(0, "n_paths", n_paths)
+    return summary
+
+
+def calc_payout_summary(
+    cumulative_forex_change, leverage, USD_asset_allocation, scenario_config
+):
+    """Per-configuration payout statistics (see aggregate_final_payout_chunks) with
+    the same swap_config_id as calc_final_payout_grid / calc_final_payout_by_horizon.
+
+    Args:
+        cumulative_forex_change (pd.Series or dict): cumulative EUR/USD exchange rate
+        change of each path ({trading_days: pd.Series} for multi-horizon simulations).
+        leverage (list): Leverage factors of the currency swap. Must be larger than 1.
+        USD_asset_allocation (list): Shares of assets invested in USD. Must be between 0 and 1.
+        scenario_config (dict): assumed macroeconomic conditions.
+
+    Returns:
+        (pd.DataFrame): payout statistics per swap_config_id.
+    """
+    if not isinstance(cumulative_forex_change, dict):
+        return aggregate_final_payout_chunks(
+            [cumulative_forex_change], leverage, USD_asset_allocation, scenario_config
+        )
+
+    summary_list = []
+    for horizon, horizon_change in cumulative_forex_change.items():
+        summary = aggregate_final_payout_chunks(
+            [horizon_change], leverage, USD_asset_allocation, scenario_config
+        )
+        summary.index = grid_metadata(
+            leverage, USD_asset_allocation, scenario_config, trading_days=horizon
+        ).index
+        summary_list.append(summary)
+    return pd.concat(summary_list)
+
+
+def calc_final_payout_by_horizon(
+    cumulative_forex_changes, leverage, USD_asset_allocation, scenario_config
+):
+    """Calculate the payout grid for every simulated horizon. swap_config_id is
+    derived from (trading_days, leverage, USD_asset_allocation).
+
+    Args:
+        cumulative_forex_changes (dict): {trading_days: pd.Series} cumulative EUR/USD
+        exchange rate change of each path per horizon.
+        leverage (list): Leverage factors of the currency swap. Must be larger than 1.
+        USD_asset_allocation (list): Shares of assets invested in USD. Must be between 0 and 1.
+        scenario_config (dict): assumed macroeconomic conditions.
+
+    Returns:
+        payout_data (pd.DataFrame): Payout of swap contract (in EURO & USD), indexed by
+        swap_config_id.
+        meta_data (pd.DataFrame): trading_days, leverage and USD_asset_allocation of
+        each swap_config_id.
+    """
+    blocks, meta_data = calc_payout_blocks(
+        cumulative_forex_changes, leverage, USD_asset_allocation, scenario_config
+    )
+    payout_data = pd.concat([_long_format(*block) for block in blocks])
+    return payout_data, meta_data
+
+
+def calc_payout_blocks(
+    cumulative_forex_change,
+    leverage,
+    USD_asset_allocation,
+    scenario_config,
+    cache_dir=None,
+    stored_index=None,
+):
+    """Payout cubes for save_payout_store with the swap_config_id of
+    calc_final_payout_grid (calc_final_payout_by_horizon for multi-horizon
+    simulations).
+
+    Args:
+        cumulative_forex_change (pd.Series or dict): cumulative EUR/USD exchange rate
+        change of each path ({trading_days: pd.Series} for multi-horizon simulations).
+        leverage (list): Leverage factors of the currency swap. Must be larger than 1.
+        USD_asset_allocation (list): Shares of assets invested in USD. Must be between 0 and 1.
+        scenario_config (dict): assumed macroeconomic conditions.
+        cache_dir (pathlib.Path): cache directory of the payout cells (not cached if
+        None, see cached_payout_cells).
+        stored_index (pd.DataFrame): offset index of an existing payout store (see
+        stored_payout_index). Configurations it holds for the same paths are not
+        evaluated again.
+
+    Returns:
+        blocks (list): (exchange_rate, payout, swap_config_id) per horizon, only
+        holding the configurations missing from stored_index.
+        meta_data (pd.DataFrame): (trading_days,) leverage and USD_asset_allocation of
+        all configurations.
+    """
+    if isinstance(cumulative_forex_change, dict):
+        horizon_changes = cumulative_forex_change.items()
+    else:
+        horizon_changes = [(None, cumulative_forex_change)]
+
+    blocks = []
+    meta_data_list = []
+    for horizon, horizon_change in horizon_changes:
+        meta = grid_metadata(
+            leverage, USD_asset_allocation, scenario_config, trading_days=horizon
+        )
+        meta_data_list.append(meta)
+        if stored_index is not None:
+            final_exchange_rate = 1 + np.asarray(horizon_change, dtype=np.float64)
+            stored = stored_index["paths_key"] == paths_key(final_exchange_rate)
+            meta = meta[~meta.index.isin(stored_index.index[stored])]
+        final_exchange_rate, payout = _payout_cube(horizon_change, meta, cache_dir)
+        blocks.append((final_exchange_rate, payout, meta.index.to_numpy()))
+    return blocks, pd.concat(meta_data_list)
 
 
 # varying specifications
 specifications = (
     (
         {
-            "simulated_data": BLD / "simulated_data" / f"simulated_data_{simulation_name}.pickle",
+            "simulated_data": BLD / "simulated_data" / f"simulated_data_{simulation_name}.json",
             "scenario_config": SRC / "contract_specs" / "scenario_config.json",
             "swap_config": SRC / "contract_specs" / "swap_config.json",
         },
         {
-            "payout_data": BLD / "simulated_payout" / f"simulated_payout_{simulation_name}.pickle",
+            "payout_data": BLD / "simulated_payout" / f"simulated_payout_{simulation_name}.json",
             "meta_data":BLD / "metadata" / f"metadata_payout_{simulation_name}.pickle",
+            "payout_summary": BLD / "simulated_payout" / f"payout_summary_{simulation_name}.pickle",
+            "change_index": BLD / "simulated_payout" / f"change_index_{simulation_name}.pickle",
         }
     
     )
@@ -101,11 +546,6 @@ specifications = (
     specifications,
 )
 def task_swap_payout(depends_on, produces):
-    # initialize
-    swap_config_id = 0
-    payout_data_list = []
-    meta_data_list = []
-
     # parse json data
     swap_config = json.loads(
         depends_on["swap_config"].read_text(encoding="utf-8")
@@ -114,51 +554,58 @@ def task_swap_payout(depends_on, produces):
         depends_on["scenario_config"].read_text(encoding="utf-8")
     )
 
-    # calculate payout for all configurations
-    for leverage in swap_config["leverage"]:
-        for USD_asset_allocation in swap_config["USD_asset_allocation"]:
+    # load simulated paths once and reduce them to cumulative changes
+    start = time.perf_counter()
+    cumulative_change = load_cumulative_change(depends_on["simulated_data"])
+    load_time = time.perf_counter() - start
 
-            # load files
-            raw_data = pd.read_pickle(depends_on['simulated_data'])
-
-            # simulate payout given parameterization
-            cumulative_change = get_total_exchange_rate_change(raw_data)
-            payout = calc_final_payout(
-                cumulative_change, leverage, USD_asset_allocation, scenario_config
-            )
-            payout["swap_config_id"] = swap_config_id
-            payout_data_list.append(payout)
-
-            # save metadata
-            meta = filename_to_metadata(
-                swap_config_id, leverage, USD_asset_allocation
-            )
-            meta_data_list.append(meta)
-
-            swap_config_id += 1
-
-    # append datafiles
-    payout_data = pd.concat(payout_data_list).set_index("swap_config_id")
-    meta_data = pd.concat(meta_data_list).set_index("swap_config_id")
+    # calculate payout of the configurations missing from the existing store
+    start = time.perf_counter()
+    payout_blocks, meta_data = calc_payout_blocks(
+        cumulative_change,
+        swap_config["leverage"],
+        swap_config["USD_asset_allocation"],
+        scenario_config,
+        cache_dir=CACHE_DIR,
+        stored_index=stored_payout_index(produces["payout_data"]),
+    )
+    payout_summary = calc_payout_summary(
+        cumulative_change,
+        swap_config["leverage"],
+        swap_config["USD_asset_allocation"],
+        scenario_config,
+    )
+    compute_time = time.perf_counter() - start
+    logger.info(
+        "Loaded simulated paths in %.3fs, computed %d of %d configurations in %.3fs",
+        load_time,
+        sum(len(swap_config_id) for _, _, swap_config_id in payout_blocks),
+        len(meta_data),
+        compute_time,
+    )
 
     # save files
     generate_missing_directories(produces)
-    payout_data.to_pickle(produces['payout_data'])
+    save_payout_store(payout_blocks, produces['payout_data'], append=True)
     meta_data.to_pickle(produces['meta_data'])
+    payout_summary.to_pickle(produces['payout_summary'])
+    pd.to_pickle(build_change_index(cumulative_change), produces['change_index'])
 
 
 if __name__ == "__main__":
     simulation_name = "bootstrapped"
     depends_on =         {
-            "simulated_data": BLD / "simulated_data" / f"simulated_data_{simulation_name}.pickle",
+            "simulated_data": BLD / "simulated_data" / f"simulated_data_{simulation_name}.json",
             "simulation_name": simulation_name,
             "scenario_config": SRC / "contract_specs" / "scenario_config.json",
             "swap_config": SRC / "contract_specs" / "swap_config.json",
         }
 
     produces =   {
-            "payout_data": BLD / "simulated_payout" / f"simulated_payout_{simulation_name}.pickle",
+            "payout_data": BLD / "simulated_payout" / f"simulated_payout_{simulation_name}.json",
             "meta_data":BLD / "metadata" / f"metadata_payout_{simulation_name}.pickle",
+            "payout_summary": BLD / "simulated_payout" / f"payout_summary_{simulation_name}.pickle",
+            "change_index": BLD / "simulated_payout" / f"change_index_{simulation_name}.pickle",
         }
 
 
@@ -14,7 +14,10 @@ See: https://github.com/InvestmentSystems/recombinator
 Further simulation function can be parsed as arguments to the iterator object
 specifications.
 """
+import json
+
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import pytask
 import seaborn as sns
@@ -22,62 +25,94 @@ import seaborn as sns
 PLOT_ARGS = {"markersize": 4, "alpha": 0.6}
 
 from src.config import BLD
+from src.config import SRC
+from src.simulation_analysis.density import binned_density_2d
+from src.simulation_analysis.density import plot_binned_density_2d
+from src.simulation_analysis.payout_index import longest_horizon_index
+from src.simulation_analysis.payout_index import negative_payout_by_config
+from src.simulation_analysis.payout_store import load_payout_data
+from src.simulation_analysis.rendering import render_figures
+from src.simulation_analysis.task_swap_mark_to_market import CERTIFICATES
+from src.simulation_analysis.task_swap_mark_to_market import knock_out_day_quantiles
 from src.simulation_analysis.utility import (
-    merge_many_to_one_metadata,
-    merge_one_to_one_metadata,
-    extract_simulation_name
+    join_metadata,
+    extract_simulation_name,
+    select_baseline_scenario,
+    select_longest_horizon,
 )
 
 
-def _aggregate_runs_with_negative_payout(data):
-    negative_payout_data = (
-        (data[["EURlong payout in EURO", "EURshort payout in EURO"]] < 0)
-        .any(axis="columns")
-        .to_frame(name="negative_payout")
-    )
-    negative_payout_data_aggregated = negative_payout_data.groupby(
-        "swap_config_id"
-    ).mean()
-    return negative_payout_data_aggregated
+def aggregate_payout_statistics(
+    payout_summary, negative_payout, payout_data, payout_metadata
+):
+    """Compute every statistic the payout figures need in one pass and attach
+    leverage and USD_asset_allocation by position (see join_metadata).
 
+    Args:
+        payout_summary (pd.DataFrame): mean payouts per swap_config_id
+        negative_payout (pd.DataFrame): share of runs with negative payout per
+        swap_config_id
+        payout_data (pd.DataFrame): payout of each path (EURlong/EURshort in USD and
+        EURO), indexed by swap_config_id
+        payout_metadata  (pd.DataFrame): dataset with metainformation about run
+        (leverage, asset allocation)
 
-def _get_runs_with_negative_payout(data, metadata):
-    _runs_with_negative_payout = _aggregate_runs_with_negative_payout(data)
-    _runs_with_negative_payout_merged = merge_one_to_one_metadata(
-        _runs_with_negative_payout, metadata
+    Returns:
+        config_statistics (pd.DataFrame): negative-payout share, mean EURlong/EURshort
+        payouts and mean total payout in EURO and USD per swap_config_id.
+        path_statistics (pd.DataFrame): total payout in EURO and USD of each path.
+    """
+    config_statistics = pd.DataFrame(
+        {
+            "negative_payout": negative_payout["negative_payout"],
+            "EURlong payout in EURO": payout_summary["EURlong payout in EURO"],
+            "EURshort payout in EURO": payout_summary["EURshort payout in EURO"],
+            "total payout in EURO": payout_summary["EURlong payout in EURO"]
+            + payout_summary["EURshort payout in EURO"],
+            "total payout in USD": payout_summary["EURlong payout in USD"]
+            + payout_summary["EURshort payout in USD"],
+        }
+    )
+    path_statistics = pd.DataFrame(
+        {
+            "total payout in EURO": payout_data["EURlong payout in EURO"].to_numpy()
+            + payout_data["EURshort payout in EURO"].to_numpy(),
+            "total payout in USD": payout_data["EURlong payout in USD"].to_numpy()
+            + payout_data["EURshort payout in USD"].to_numpy(),
+        },
+        index=payout_data.index,
     )
-    assert not _runs_with_negative_payout_merged.empty, "Dataframe is empty"
-    return _runs_with_negative_payout_merged
+    config_statistics = join_metadata(config_statistics, payout_metadata)
+    path_statistics = join_metadata(path_statistics, payout_metadata)
+    assert not config_statistics.empty, "Dataframe is empty"
+    return config_statistics, path_statistics
 
 
-def plot_negative_payout(payout_data, payout_metadata, figure_path, simulation_name):
+def plot_negative_payout(config_statistics, figure_path, simulation_name):
     """Plot share of runs with negative payout
 
     Args:
-        payout_data (pd.DataFrame): dataset with payout data
-        payout_metadata  (pd.DataFrame): dataset with metainformation about run
-        (leverage, asset allocation)
+        config_statistics (pd.DataFrame): payout statistics per run (see
+        aggregate_payout_statistics)
         figure_path (str): output path
         simulation_name (str): Type of simulation (bootstrapp or historical)
     """
-    runs_with_negative_payout = _get_runs_with_negative_payout(
-        payout_data, payout_metadata
-    )
-
     sns.set_theme()
     # Initialize graph
     fig, ax = plt.subplots()
     fig.suptitle("Share of runs with negative payout of any asset")
 
     # Plot ratio of runs with a negative payout
-    plot_runs_with_negative_payout = runs_with_negative_payout.rename(
+    plot_runs_with_negative_payout = config_statistics.rename(
         columns={
             "leverage": "Leverage factor",
             "USD_asset_allocation": "Share of assets invested in USD",
         }
     )
     plot_runs_with_negative_payout_pivot = plot_runs_with_negative_payout.pivot(
-        "Leverage factor", "Share of assets invested in USD", "negative_payout"
+        index="Leverage factor",
+        columns="Share of assets invested in USD",
+        values="negative_payout",
     )
     sns.heatmap(
         plot_runs_with_negative_payout_pivot,
@@ -88,233 +123,268 @@ def plot_negative_payout(payout_data, payout_metadata, figure_path, simulation_n
         cmap="Reds",
     )
     fig.savefig(figure_path)
+    plt.close(fig)
 
 
-def _calculate_total_payout_EUR(data):
-    total_payout = (
-        data["EURlong payout in EURO"]
-        .add(data["EURshort payout in EURO"])
-        .to_frame(name="total_payout")
-    )
-    return total_payout
-
-
-def _keep_columns_total_payout(payout_data):
-    keep_payout_data = payout_data.query("leverage==2")[
-        ["total_payout", "USD_asset_allocation"]
+def _keep_columns_total_payout(path_statistics, currency):
+    keep_payout_data = path_statistics.query("leverage==2")[
+        [f"total payout in {currency}", "USD_asset_allocation"]
     ].reset_index(drop=True)
+    assert not keep_payout_data.empty, "Dataframe is empty"
     return keep_payout_data
 
 
-def _get_run_total_payout_EUR(data, metadata):
-    total_payout_data = _calculate_total_payout_EUR(data)
-    total_payout_data = merge_many_to_one_metadata(total_payout_data, metadata)
-    total_payout_aggregated = _keep_columns_total_payout(total_payout_data)
-    assert not total_payout_aggregated.empty, "Dataframe is empty"
-    return total_payout_aggregated
-
-
-def plot_expected_payout_EUR(
-    payout_data, payout_metadata, figure_path, simulation_name
-):
-    """Plot total (EURlong + EURshort) expected payout in EURO
+def compute_payout_densities(config_statistics, path_statistics):
+    """Binned kernel density estimates of the payout figures (see
+    src.simulation_analysis.density).
 
     Args:
-        payout_data (pd.DataFrame): dataset with payout data
-        payout_metadata  (pd.DataFrame): dataset with metainformation about run
-        (leverage, asset allocation)
-        figure_path (str): output path
-        simulation_name (str): Type of simulation (bootstrapp or historical)
-    """
-    runs_total_payout = _get_run_total_payout_EUR(payout_data, payout_metadata)
+        config_statistics (pd.DataFrame): payout statistics per run (see
+        aggregate_payout_statistics)
+        path_statistics (pd.DataFrame): total payout of each path (see
+        aggregate_payout_statistics)
 
+    Returns:
+        (dict): density summaries keyed by figure.
+    """
+    densities = {}
+    for currency in ["EURO", "USD"]:
+        runs_total_payout = _keep_columns_total_payout(path_statistics, currency)
+        densities[f"total_payout_{currency}"] = binned_density_2d(
+            runs_total_payout["USD_asset_allocation"],
+            runs_total_payout[f"total payout in {currency}"],
+        )
+    for certificate in ["EURlong", "EURshort"]:
+        densities[f"{certificate.lower()}_payout"] = binned_density_2d(
+            config_statistics["USD_asset_allocation"],
+            config_statistics[f"{certificate} payout in EURO"],
+        )
+    return densities
+
+
+def _plot_payout_density(density, title, ylabel, figure_path, ylim=None):
     sns.set_theme()
     # Initialize graph
     fig, ax = plt.subplots()
-    fig.suptitle("Expected total payout in Euro")
+    fig.suptitle(title)
 
-    # Plot average payout
-    plot_total_payout_data = runs_total_payout.rename(
-        columns={
-            "total_payout": "Total payout",
-            "USD_asset_allocation": "Share of assets invested in USD",
-        }
-    )
-    plt.xlim(0, 1)
-    plt.ylim(1.5, 2.5)
-    sns.kdeplot(
-        data=plot_total_payout_data,
-        ax=ax,
-        x="Share of assets invested in USD",
-        y="Total payout",
-        fill=True,
-    )
+    # Plot density of the payout
+    plot_binned_density_2d(ax, density)
+    ax.set(xlim=(0, 1), xlabel="Share of assets invested in USD", ylabel=ylabel)
+    if ylim is not None:
+        ax.set(ylim=ylim)
     fig.savefig(figure_path)
+    plt.close(fig)
 
 
-def _calculate_total_payout_USD(data):
-    total_payout = (
-        data["EURlong payout in USD"]
-        .add(data["EURshort payout in USD"])
-        .to_frame(name="total_payout")
-    )
-    return total_payout
-
+def plot_expected_payout_EUR(payout_densities, figure_path, simulation_name):
+    """Plot total (EURlong + EURshort) expected payout in EURO
 
-def _get_run_total_payout_USD(data, metadata):
-    total_payout_data = _calculate_total_payout_USD(data)
-    total_payout_data = merge_many_to_one_metadata(total_payout_data, metadata)
-    total_payout_aggregated = _keep_columns_total_payout(total_payout_data)
-    assert not total_payout_aggregated.empty, "Dataframe is empty"
-    return total_payout_aggregated
+    Args:
+        payout_densities (dict): density summaries (see compute_payout_densities)
+        figure_path (str): output path
+        simulation_name (str): Type of simulation (bootstrapp or historical)
+    """
+    _plot_payout_density(
+        payout_densities["total_payout_EURO"],
+        "Expected total payout in Euro",
+        "Total payout",
+        figure_path,
+        ylim=(1.5, 2.5),
+    )
 
 
-def plot_expected_payout_USD(
-    payout_data, payout_metadata, figure_path, simulation_name
-):
+def plot_expected_payout_USD(payout_densities, figure_path, simulation_name):
     """Plot total (EURlong + EURshort) expected payout in USD
 
     Args:
-        payout_data (pd.DataFrame): dataset with payout data
-        payout_metadata  (pd.DataFrame): dataset with metainformation about run
-        (leverage, asset allocation)
+        payout_densities (dict): density summaries (see compute_payout_densities)
         figure_path (str): output path
         simulation_name (str): Type of simulation (bootstrapp or historical)
     """
-    runs_total_payout = _get_run_total_payout_USD(payout_data, payout_metadata)
-    sns.set_theme()
-    # Initialize graph
-    fig, ax = plt.subplots()
-    fig.suptitle("Expected total payout in  USD")
-
-    # Plot average payout
-    plot_total_payout_data = runs_total_payout.rename(
-        columns={
-            "total_payout": "Total payout",
-            "USD_asset_allocation": "Share of assets invested in USD",
-        }
-    )
-    plt.xlim(0, 1)
-    plt.ylim(1.5, 2.5)
-    sns.kdeplot(
-        data=plot_total_payout_data,
-        ax=ax,
-        x="Share of assets invested in USD",
-        y="Total payout",
-        fill=True,
+    _plot_payout_density(
+        payout_densities["total_payout_USD"],
+        "Expected total payout in  USD",
+        "Total payout",
+        figure_path,
+        ylim=(1.5, 2.5),
     )
-    fig.savefig(figure_path)
-
 
-def _aggregate_run_eurlong_payout(data):
-    aggregated_eurlong_payout_data = (
-        data[["EURlong payout in EURO"]].groupby("swap_config_id").mean()
-    )
-    return aggregated_eurlong_payout_data
 
+def plot_eurlong_payout(payout_densities, figure_path, simulation_name):
+    """Plot the expected payout of the EURlong certificate
 
-def _get_run_eurlong_payout(data, metadata):
-    run_eurlong_payout = _aggregate_run_eurlong_payout(data)
-    run_eurlong_payout_merged = merge_many_to_one_metadata(
-        run_eurlong_payout, metadata
+    Args:
+        payout_densities (dict): density summaries (see compute_payout_densities)
+        figure_path (str): output path
+        simulation_name (str): Type of simulation (bootstrapp or historical)
+    """
+    _plot_payout_density(
+        payout_densities["eurlong_payout"],
+        "Eurlong payout depending on certificate payout of certificate",
+        "EURlong payout in EURO",
+        figure_path,
     )
-    run_eurlong_payout_merged = run_eurlong_payout_merged[
-        ["EURlong payout in EURO", "USD_asset_allocation"]
-    ]
-    assert not run_eurlong_payout_merged.empty, "Dataframe is empty"
-    return run_eurlong_payout_merged
 
 
-def plot_eurlong_payout(payout_data, payout_metadata, figure_path, simulation_name):
-    """Plot the expected payout of the EURlong certificate
+def plot_eurshort_payout(payout_densities, figure_path, simulation_name):
+    """Plot the expected payout of the EURshort certificate
 
     Args:
-        payout_data (pd.DataFrame): dataset with payout data
-        payout_metadata  (pd.DataFrame): dataset with metainformation about run
-        (leverage, asset allocation)
+        payout_densities (dict): density summaries (see compute_payout_densities)
         figure_path (str): output path
         simulation_name (str): Type of simulation (bootstrapp or historical)
     """
-    runs_eurlong_payout = _get_run_eurlong_payout(payout_data, payout_metadata)
-
-    sns.set_theme()
-    # Initialize graph
-    fig, ax = plt.subplots()
-    fig.suptitle("Eurlong payout depending on certificate payout of certificate")
-
-    # Plot average payout
-    plot_runs_eurlong_payout = runs_eurlong_payout.rename(
-        columns={"USD_asset_allocation": "Share of assets invested in USD"}
-    )
-    plt.xlim(0, 1)
-    sns.kdeplot(
-        data=plot_runs_eurlong_payout,
-        ax=ax,
-        x="Share of assets invested in USD",
-        y="EURlong payout in EURO",
-        fill=True,
+    _plot_payout_density(
+        payout_densities["eurshort_payout"],
+        "Eurshort payout depending on certificate payout of certificate",
+        "EURshort payout in EURO",
+        figure_path,
     )
 
-    fig.savefig(figure_path)
+def aggregate_knock_out_statistics(
+    mark_to_market_summary, knock_out_distribution, payout_metadata
+):
+    """Knock-out probability and knock-out day quantiles of each certificate for the
+    configurations of the figures (longest horizon, baseline scenario).
 
+    Args:
+        mark_to_market_summary (pd.DataFrame): intra-horizon statistics per
+        swap_config_id (see aggregate_mark_to_market_chunks)
+        knock_out_distribution (pd.DataFrame): share of paths knocked out on each day
+        per swap_config_id and certificate
+        payout_metadata  (pd.DataFrame): dataset with metainformation about run
+        (leverage, asset allocation)
 
-def _aggregate_run_eurshort_payout(data):
-    aggregated_eurshort_payout_data = (
-        data[["EURshort payout in EURO"]].groupby("swap_config_id").mean()
+    Returns:
+        config_statistics (pd.DataFrame): knock-out probability and 10%, 50% and 90%
+        quantile of the knock-out day of each certificate per swap_config_id.
+        cumulative_knock_out (pd.DataFrame): share of paths knocked out until each
+        day per swap_config_id and certificate.
+    """
+    mark_to_market_summary, payout_metadata = select_longest_horizon(
+        mark_to_market_summary, payout_metadata
+    )
+    mark_to_market_summary, payout_metadata = select_baseline_scenario(
+        mark_to_market_summary, payout_metadata
     )
-    return aggregated_eurshort_payout_data
+    knock_out_distribution = knock_out_distribution[
+        knock_out_distribution.index.get_level_values("swap_config_id").isin(
+            payout_metadata.index
+        )
+    ]
+
+    quantiles = knock_out_day_quantiles(knock_out_distribution)
+    config_statistics = pd.DataFrame(index=mark_to_market_summary.index)
+    for certificate in CERTIFICATES:
+        config_statistics[f"knock_out {certificate}"] = mark_to_market_summary[
+            f"knock_out {certificate}"
+        ]
+        certificate_quantiles = quantiles.xs(certificate, level="certificate")
+        for quantile in certificate_quantiles.columns:
+            config_statistics[
+                f"knock_out day q{quantile * 100:.0f} {certificate}"
+            ] = certificate_quantiles[quantile]
+    config_statistics = join_metadata(config_statistics, payout_metadata)
+    assert not config_statistics.empty, "Dataframe is empty"
+    return config_statistics, knock_out_distribution.cumsum(axis=1)
+
+
+def plot_knock_out_probability(knock_out_statistics, figure_path, simulation_name):
+    """Plot the knock-out probability of both certificates
 
+    Args:
+        knock_out_statistics (dict): knock-out statistics (see
+        aggregate_knock_out_statistics)
+        figure_path (str): output path
+        simulation_name (str): Type of simulation (bootstrapp or historical)
+    """
+    sns.set_theme()
+    # Initialize graph
+    fig, axes = plt.subplots(1, 2, figsize=(12, 5))
+    fig.suptitle("Share of runs in which the certificate is knocked out")
 
-def _get_run_eurshort_payout(data, metadata):
-    run_eurshort_payout = _aggregate_run_eurshort_payout(data)
-    run_eurshort_payout_merged = merge_many_to_one_metadata(
-        run_eurshort_payout, metadata
+    config_statistics = knock_out_statistics["config_statistics"].rename(
+        columns={
+            "leverage": "Leverage factor",
+            "USD_asset_allocation": "Share of assets invested in USD",
+        }
     )
-    run_eurshort_payout_merged = run_eurshort_payout_merged[
-        ["EURshort payout in EURO", "USD_asset_allocation"]
-    ]
-    assert not run_eurshort_payout_merged.empty, "Dataframe is empty"
-    return run_eurshort_payout_merged
+    for ax, certificate in zip(axes, CERTIFICATES):
+        sns.heatmap(
+            config_statistics.pivot(
+                index="Leverage factor",
+                columns="Share of assets invested in USD",
+                values=f"knock_out {certificate}",
+            ),
+            ax=ax,
+            fmt=".1%",
+            vmin=0,
+            vmax=0.10,
+            cmap="Reds",
+        )
+        ax.set_title(certificate)
+    fig.savefig(figure_path)
+    plt.close(fig)
 
 
-def plot_eurshort_payout(payout_data, payout_metadata, figure_path, simulation_name):
-    """Plot the expected payout of the EURshort certificate
+def plot_time_to_knock_out(knock_out_statistics, figure_path, simulation_name):
+    """Plot the share of runs knocked out until each day for every leverage factor
+    (at the allocation closest to 50% in USD)
 
     Args:
-        payout_data (pd.DataFrame): dataset with payout data
-        payout_metadata  (pd.DataFrame): dataset with metainformation about run
-        (leverage, asset allocation)
+        knock_out_statistics (dict): knock-out statistics (see
+        aggregate_knock_out_statistics)
         figure_path (str): output path
         simulation_name (str): Type of simulation (bootstrapp or historical)
     """
-    runs_eurshort_payout = _get_run_eurshort_payout(payout_data, payout_metadata)
+    config_statistics = knock_out_statistics["config_statistics"]
+    cumulative_knock_out = knock_out_statistics["cumulative_knock_out"]
+    allocations = config_statistics["USD_asset_allocation"].unique()
+    allocation = allocations[np.argmin(np.abs(allocations - 0.5))]
+    configurations = config_statistics[
+        config_statistics["USD_asset_allocation"] == allocation
+    ]
 
     sns.set_theme()
     # Initialize graph
-    fig, ax = plt.subplots()
-    fig.suptitle("Eurshort payout depending on certificate payout of certificate")
-
-    # Plot average payout
-    plot_runs_eurshort_payout = runs_eurshort_payout.rename(
-        columns={"USD_asset_allocation": "Share of assets invested in USD"}
-    )
-    plt.xlim(0, 1)
-    sns.kdeplot(
-        data=plot_runs_eurshort_payout,
-        ax=ax,
-        x="Share of assets invested in USD",
-        y="EURshort payout in EURO",
-        fill=True,
+    fig, axes = plt.subplots(1, 2, figsize=(12, 5), sharey=True)
+    fig.suptitle(
+        f"Share of runs knocked out until each day ({allocation:.0%} invested in USD)"
     )
-
+    for ax, certificate in zip(axes, CERTIFICATES):
+        for swap_config_id, leverage in configurations["leverage"].items():
+            ax.plot(
+                cumulative_knock_out.loc[(swap_config_id, certificate)],
+                label=f"Leverage {leverage:g}",
+            )
+        ax.set(title=certificate, xlabel="Trading day")
+    axes[0].set(ylabel="Share of runs knocked out")
+    axes[1].legend()
     fig.savefig(figure_path)
+    plt.close(fig)
+
 
 # varying specifications
-specifications = (
+statistics_specifications = (
     (
         {
-            "payout_data": BLD / "simulated_payout" / f"simulated_payout_{simulation_name}.pickle",
+            "payout_data": BLD / "simulated_payout" / f"simulated_payout_{simulation_name}.json",
             "meta_data": BLD / "metadata" / f"metadata_payout_{simulation_name}.pickle",
+            "payout_summary": BLD / "simulated_payout" / f"payout_summary_{simulation_name}.pickle",
+            "change_index": BLD / "simulated_payout" / f"change_index_{simulation_name}.pickle",
+            "payout_estimates": BLD / "simulated_payout" / f"payout_estimates_{simulation_name}.pickle",
+        },
+        BLD / "simulated_payout" / f"payout_statistics_{simulation_name}.pickle",
+    )
+    for simulation_name in ["historical", "bootstrapped"]
+)
+
+specifications = (
+    (
+        {
+            "payout_statistics": BLD / "simulated_payout" / f"payout_statistics_{simulation_name}.pickle",
+            "sim_config": SRC / "contract_specs" / "simulation_config.json",
         },
         {
             "negative_payout":  BLD / "figures" / f"{simulation_name}_negative_payout.png",
@@ -328,42 +398,147 @@ specifications = (
     for simulation_name in ["historical", "bootstrapped"]
 )
 
+
+knock_out_specifications = (
+    (
+        {
+            "mark_to_market_summary": BLD / "simulated_payout" / f"mark_to_market_summary_{simulation_name}.pickle",
+            "knock_out_distribution": BLD / "simulated_payout" / f"knock_out_distribution_{simulation_name}.pickle",
+            "meta_data": BLD / "metadata" / f"metadata_payout_{simulation_name}.pickle",
+            "sim_config": SRC / "contract_specs" / "simulation_config.json",
+        },
+        {
+            "knock_out_statistics": BLD / "simulated_payout" / f"knock_out_statistics_{simulation_name}.pickle",
+            "knock_out_probability": BLD / "figures" / f"{simulation_name}_knock_out_probability.png",
+            "time_to_knock_out": BLD / "figures" / f"{simulation_name}_time_to_knock_out.png",
+        }
+    )
+    for simulation_name in ["historical", "bootstrapped"]
+)
+
+
 @pytask.mark.parametrize(
     "depends_on, produces",
-    specifications,
+    statistics_specifications,
 )
-
-def task_swap_payout_analysis(depends_on, produces):
+def task_payout_statistics(depends_on, produces):
 
     # load files
-    payout_data = pd.read_pickle(depends_on["payout_data"])
     payout_metadata = pd.read_pickle(depends_on["meta_data"]) 
-    simulation_name = extract_simulation_name(depends_on["payout_data"])
+    payout_summary = pd.read_pickle(depends_on["payout_summary"])
+    payout_summary, payout_metadata = select_longest_horizon(
+        payout_summary, payout_metadata
+    )
+    # the figures show the first deposit-return scenario
+    payout_summary, payout_metadata = select_baseline_scenario(
+        payout_summary, payout_metadata
+    )
 
-    # plot negative payout
-    plot_negative_payout(payout_data, payout_metadata, produces['negative_payout'], simulation_name)
+    # the total payout figures only show leverage 2, read just these configurations
+    payout_data = load_payout_data(
+        depends_on["payout_data"],
+        swap_config_id=payout_metadata.index[payout_metadata["leverage"] == 2],
+        columns=[
+            "EURlong payout in USD",
+            "EURshort payout in USD",
+            "EURlong payout in EURO",
+            "EURshort payout in EURO",
+        ],
+    )
 
-    # plot total payout (EUR)
-    plot_expected_payout_EUR(payout_data, payout_metadata, produces['total_payout_EUR'], simulation_name)
+    # share of runs with negative payout from the break-even thresholds
+    change_index = longest_horizon_index(pd.read_pickle(depends_on["change_index"]))
+    negative_payout = negative_payout_by_config(change_index, payout_metadata)
 
-    # plot total payout (USD)
-    plot_expected_payout_USD(payout_data, payout_metadata, produces['total_payout_USD'], simulation_name)
+    # all statistics of the figures in one pass, densities as binned summaries
+    config_statistics, path_statistics = aggregate_payout_statistics(
+        payout_summary, negative_payout, payout_data, payout_metadata
+    )
+    # variance-reduced estimates with standard errors of the same configurations
+    payout_estimates = pd.read_pickle(depends_on["payout_estimates"])
+    payout_estimates = join_metadata(
+        payout_estimates.loc[payout_metadata.index], payout_metadata
+    )
+    payout_statistics = {
+        "config_statistics": config_statistics,
+        "payout_estimates": payout_estimates,
+        "densities": compute_payout_densities(config_statistics, path_statistics),
+    }
+    pd.to_pickle(payout_statistics, produces)
 
-    # plot EURlong payout
-    plot_eurlong_payout(payout_data, payout_metadata, produces['eurlong_payout'], simulation_name)
 
-    # plot EURshort payout
-    plot_eurshort_payout(payout_data, payout_metadata, produces['eurshort_payout'], simulation_name)
+@pytask.mark.parametrize(
+    "depends_on, produces",
+    specifications,
+)
+
+def task_swap_payout_analysis(depends_on, produces):
+
+    # load the cached statistics, the figures never touch the raw payouts
+    payout_statistics = pd.read_pickle(depends_on["payout_statistics"])
+    config_statistics = payout_statistics["config_statistics"]
+    payout_densities = payout_statistics["densities"]
+    simulation_name = extract_simulation_name(depends_on["payout_statistics"])
+    sim_config = json.loads(depends_on["sim_config"].read_text(encoding="utf-8"))
+
+    # the five figures are independent, draw them in figure_workers processes
+    # (null: one per figure, at most min(5, number of CPUs))
+    render_figures(
+        [
+            # plot negative payout
+            (plot_negative_payout, (config_statistics, produces['negative_payout'], simulation_name)),
+            # plot total payout (EUR)
+            (plot_expected_payout_EUR, (payout_densities, produces['total_payout_EUR'], simulation_name)),
+            # plot total payout (USD)
+            (plot_expected_payout_USD, (payout_densities, produces['total_payout_USD'], simulation_name)),
+            # plot EURlong payout
+            (plot_eurlong_payout, (payout_densities, produces['eurlong_payout'], simulation_name)),
+            # plot EURshort payout
+            (plot_eurshort_payout, (payout_densities, produces['eurshort_payout'], simulation_name)),
+        ],
+        n_workers=sim_config["figure_workers"],
+    )
+
+@pytask.mark.parametrize(
+    "depends_on, produces",
+    knock_out_specifications,
+)
+def task_knock_out_analysis(depends_on, produces):
+
+    # knock-out statistics of the figure configurations
+    config_statistics, cumulative_knock_out = aggregate_knock_out_statistics(
+        pd.read_pickle(depends_on["mark_to_market_summary"]),
+        pd.read_pickle(depends_on["knock_out_distribution"]),
+        pd.read_pickle(depends_on["meta_data"]),
+    )
+    knock_out_statistics = {
+        "config_statistics": config_statistics,
+        "cumulative_knock_out": cumulative_knock_out,
+    }
+    pd.to_pickle(knock_out_statistics, produces["knock_out_statistics"])
+
+    simulation_name = extract_simulation_name(depends_on["knock_out_distribution"])
+    sim_config = json.loads(depends_on["sim_config"].read_text(encoding="utf-8"))
+    render_figures(
+        [
+            (plot_knock_out_probability, (knock_out_statistics, produces["knock_out_probability"], simulation_name)),
+            (plot_time_to_knock_out, (knock_out_statistics, produces["time_to_knock_out"], simulation_name)),
+        ],
+        n_workers=sim_config["figure_workers"],
+    )
 
 
 if __name__ == "__main__":
     simulation_name = "bootstrapped"
 
     depends_on =          {
-            "payout_data": BLD / "simulated_payout" / f"simulated_payout_{simulation_name}.pickle",
+            "payout_data": BLD / "simulated_payout" / f"simulated_payout_{simulation_name}.json",
             "meta_data": BLD / "metadata" / f"metadata_payout_{simulation_name}.pickle",
+            "payout_summary": BLD / "simulated_payout" / f"payout_summary_{simulation_name}.pickle",
+            "change_index": BLD / "simulated_payout" / f"change_index_{simulation_name}.pickle",
+            "payout_estimates": BLD / "simulated_payout" / f"payout_estimates_{simulation_name}.pickle",
         }
-    
+    payout_statistics = BLD / "simulated_payout" / f"payout_statistics_{simulation_name}.pickle"
     
     produces =       {
             "negative_payout":  BLD / "figures" / f"{simulation_name}_negative_payout.png",
@@ -373,7 +548,11 @@ if __name__ == "__main__":
             "eurshort_payout":  BLD / "figures" / f"{simulation_name}_eurshort_payout.png",
         }
 
-    task_swap_payout_analysis(depends_on, produces)
-
-
-
+    task_payout_statistics(depends_on, payout_statistics)
+    task_swap_payout_analysis(
+        {
+            "payout_statistics": payout_statistics,
+            "sim_config": SRC / "contract_specs" / "simulation_config.json",
+        },
+        produces,
+    )
@@ -0,0 +1,110 @@
+"""
+Computes per-configuration payout statistics of the currency swap from a
+stream of bootstrapped paths.
+
+Paths are generated chunk by chunk (bootstrap_chunk_size replications) and
+every chunk is reduced to running sums right away. Peak memory is bounded by
+the chunk size, so streaming_sim_num can be raised to 10^6 - 10^7 replications
+for tail-probability estimates. The default in simulation_config.json is kept
+small so that a plain pytask run stays fast.
+
+Deposit rate paths are opt-in. The downloaded raw data holds no deposit rates,
+so by default every path earns the constant returns of scenario_config.json. To
+enable them, add daily simple deposit returns as columns euro_deposit_rate and
+usd_deposit_rate (DEPOSIT_RATE_COLUMNS) to BLD / "historical_data" /
+"raw_data.pickle". They are then bootstrapped jointly with the log returns and
+every path earns the deposit return accrued along its own rate path. This
+requires the native bootstrap engine.
+"""
+import json
+
+import pytask
+
+from src.config import BLD
+from src.config import SRC
+from src.simulation.task_simulate_sample import iter_bootstrapped_rate_paths
+from src.simulation.task_simulate_sample import iter_bootstrapped_returns
+from src.simulation.task_simulate_sample import load_deposit_rates
+from src.simulation.task_simulate_sample import load_log_returns
+from src.simulation_analysis.task_swap_payout import aggregate_final_payout_chunks
+from src.simulation_analysis.task_swap_payout import aggregate_final_payout_rate_paths
+from src.simulation_analysis.task_swap_payout import grid_metadata
+from src.simulation_analysis.utility import generate_missing_directories
+
+
+@pytask.mark.depends_on(
+    {
+        "sim_config": SRC / "contract_specs" / "simulation_config.json",
+        "raw_data": BLD / "historical_data" / "raw_data.pickle",
+        "scenario_config": SRC / "contract_specs" / "scenario_config.json",
+        "swap_config": SRC / "contract_specs" / "swap_config.json",
+    }
+)
+@pytask.mark.produces(
+    {
+        "payout_summary": BLD
+        / "simulated_payout"
+        / "payout_summary_streamed_bootstrapped.pickle",
+        "meta_data": BLD / "metadata" / "metadata_payout_streamed_bootstrapped.pickle",
+    }
+)
+def task_swap_payout_streaming(depends_on, produces):
+    # parse json data
+    sim_config = json.loads(depends_on["sim_config"].read_text(encoding="utf-8"))
+    swap_config = json.loads(depends_on["swap_config"].read_text(encoding="utf-8"))
+    scenario_config = json.loads(
+        depends_on["scenario_config"].read_text(encoding="utf-8")
+    )
+    sim_config["bootsstrap_sim_num"] = sim_config["streaming_sim_num"]
+
+    # stream bootstrapped paths and reduce them to cumulative changes
+    log_return = load_log_returns(depends_on["raw_data"])
+    deposit_rates = load_deposit_rates(depends_on["raw_data"])
+    if deposit_rates is None:
+        cumulative_changes = (
+            paths.sum(axis=1)
+            for paths in iter_bootstrapped_returns(log_return, sim_config)
+        )
+        payout_summary = aggregate_final_payout_chunks(
+            cumulative_changes,
+            swap_config["leverage"],
+            swap_config["USD_asset_allocation"],
+            scenario_config,
+        )
+    else:
+        # deposit returns follow the bootstrapped rate paths
+        scenario_config = None
+        rate_path_chunks = (
+            (paths.sum(axis=1), rates["euro_deposit_rate"], rates["usd_deposit_rate"])
+            for paths, rates in iter_bootstrapped_rate_paths(
+                log_return, deposit_rates, sim_config
+            )
+        )
+        payout_summary = aggregate_final_payout_rate_paths(
+            rate_path_chunks,
+            swap_config["leverage"],
+            swap_config["USD_asset_allocation"],
+        )
+
+    generate_missing_directories(produces)
+    payout_summary.to_pickle(produces["payout_summary"])
+    grid_metadata(
+        swap_config["leverage"], swap_config["USD_asset_allocation"], scenario_config
+    ).to_pickle(produces["meta_data"])
+
+
+if __name__ == "__main__":
+    depends_on = {
+        "sim_config": SRC / "contract_specs" / "simulation_config.json",
+        "raw_data": BLD / "historical_data" / "raw_data.pickle",
+        "scenario_config": SRC / "contract_specs" / "scenario_config.json",
+        "swap_config": SRC / "contract_specs" / "swap_config.json",
+    }
+    produces = {
+        "payout_summary": BLD
+        / "simulated_payout"
+        / "payout_summary_streamed_bootstrapped.pickle",
+        "meta_data": BLD / "metadata" / "metadata_payout_streamed_bootstrapped.pickle",
+    }
+
+    task_swap_payout_streaming(depends_on, produces)
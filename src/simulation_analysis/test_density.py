@@ -0,0 +1,32 @@
+""" Testing the binned kernel density estimates. """
+import numpy as np
+
+from src.simulation_analysis.density import binned_density_1d
+from src.simulation_analysis.density import binned_density_2d
+
+
+def test_binned_density_1d_matches_direct_kde():
+    values = np.random.default_rng(0).normal(0, 0.1, 2000)
+
+    density = binned_density_1d(values, bins=512)
+
+    bandwidth = values.std() * len(values) ** (-1 / 5)
+    distance = (density["x"][:, np.newaxis] - values) / bandwidth
+    direct_density = np.exp(-0.5 * distance**2).sum(axis=1) / (
+        len(values) * bandwidth * np.sqrt(2 * np.pi)
+    )
+    np.testing.assert_allclose(
+        density["density"], direct_density, atol=0.01 * direct_density.max()
+    )
+
+
+def test_binned_density_2d_integrates_to_one():
+    rng = np.random.default_rng(1)
+    x = rng.choice(np.linspace(0, 1, 11), 5000)
+    y = 2 + x * rng.normal(0, 0.1, 5000)
+
+    density = binned_density_2d(x, y)
+
+    cell_area = np.diff(density["x"])[0] * np.diff(density["y"])[0]
+    assert density["density"].shape == (128, 128)
+    np.testing.assert_allclose(density["density"].sum() * cell_area, 1, atol=1e-3)
@@ -0,0 +1,104 @@
+""" Testing break-even queries against the sorted exchange rate changes. """
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.financial_contracts.swap_contract import payout_currency_swap_grid
+from src.financial_contracts.swap_contract import sum_payout_grid
+from src.simulation_analysis.payout_index import build_change_index
+from src.simulation_analysis.payout_index import longest_horizon_index
+from src.simulation_analysis.payout_index import negative_payout_by_config
+from src.simulation_analysis.payout_index import negative_payout_share
+from src.simulation_analysis.payout_index import payout_quantiles
+from src.simulation_analysis.task_swap_payout import grid_metadata
+
+
+@pytest.fixture
+def index_inputs():
+    out = {}
+    out["cumulative_change"] = pd.Series(np.random.default_rng(1).normal(0, 0.15, 500))
+    out["leverage"] = np.array([1.5, 2, 5, 10])
+    out["USD_asset_allocation"] = np.array([0, 0.3, 0.5, 1])
+    out["scenario_config"] = {
+        "return_on_euro_deposits": 0.01,
+        "return_on_usd_deposits": 0.02,
+    }
+    return out
+
+
+def test_negative_share_matches_payout_grid(index_inputs):
+    payout_sums = sum_payout_grid(
+        1 + index_inputs["cumulative_change"].to_numpy(),
+        1,
+        index_inputs["leverage"],
+        index_inputs["USD_asset_allocation"],
+        backend="numpy",
+        **index_inputs["scenario_config"],
+    )
+
+    share = negative_payout_share(
+        build_change_index(index_inputs["cumulative_change"]),
+        index_inputs["leverage"][:, np.newaxis],
+        index_inputs["USD_asset_allocation"][np.newaxis, :],
+        **index_inputs["scenario_config"],
+    )
+
+    np.testing.assert_allclose(share, payout_sums[..., 0] / 500)
+    assert share.max() > 0
+
+
+def test_payout_quantiles_match_payout_grid(index_inputs):
+    quantiles = np.array([0, 0.01, 0.25, 0.5, 0.99, 1])
+    eurlong_cube, eurshort_cube = payout_currency_swap_grid(
+        1 + index_inputs["cumulative_change"].to_numpy(),
+        1,
+        index_inputs["leverage"],
+        index_inputs["USD_asset_allocation"],
+        **index_inputs["scenario_config"],
+    )
+
+    eurlong_quantiles, eurshort_quantiles = payout_quantiles(
+        build_change_index(index_inputs["cumulative_change"]),
+        quantiles,
+        index_inputs["leverage"][:, np.newaxis],
+        index_inputs["USD_asset_allocation"][np.newaxis, :],
+        **index_inputs["scenario_config"],
+    )
+
+    np.testing.assert_allclose(
+        eurlong_quantiles,
+        np.moveaxis(np.quantile(eurlong_cube, quantiles, axis=-1), 0, -1),
+    )
+    np.testing.assert_allclose(
+        eurshort_quantiles,
+        np.moveaxis(np.quantile(eurshort_cube, quantiles, axis=-1), 0, -1),
+    )
+
+
+def test_negative_payout_by_config_follows_metadata(index_inputs):
+    metadata = grid_metadata(
+        index_inputs["leverage"],
+        index_inputs["USD_asset_allocation"],
+        index_inputs["scenario_config"],
+    )
+    change_index = build_change_index(
+        {
+            21: index_inputs["cumulative_change"] / 4,
+            262: index_inputs["cumulative_change"],
+        }
+    )
+
+    negative_payout = negative_payout_by_config(
+        longest_horizon_index(change_index), metadata
+    )
+
+    expected_share = negative_payout_share(
+        change_index[262],
+        index_inputs["leverage"][:, np.newaxis],
+        index_inputs["USD_asset_allocation"][np.newaxis, :],
+        **index_inputs["scenario_config"],
+    )
+    assert negative_payout.index.equals(metadata.index)
+    np.testing.assert_allclose(
+        negative_payout["negative_payout"], expected_share.reshape(-1)
+    )
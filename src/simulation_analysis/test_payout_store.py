@@ -0,0 +1,122 @@
+""" Testing the indexed payout cube store. """
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.simulation_analysis.payout_store import load_payout_data
+from src.simulation_analysis.payout_store import load_payout_index
+from src.simulation_analysis.payout_store import save_payout_store
+from src.simulation_analysis.payout_store import stored_payout_index
+from src.simulation_analysis.task_swap_payout import calc_final_payout_by_horizon
+from src.simulation_analysis.task_swap_payout import calc_final_payout_grid
+from src.simulation_analysis.task_swap_payout import calc_payout_blocks
+
+
+@pytest.fixture
+def payout_inputs():
+    out = {}
+    out["leverage"] = [2, 5, 10]
+    out["USD_asset_allocation"] = [0, 0.3, 1]
+    out["scenario_config"] = {
+        "return_on_euro_deposits": 0.01,
+        "return_on_usd_deposits": 0.02,
+    }
+    return out
+
+
+@pytest.fixture
+def cumulative_forex_change():
+    return pd.Series(np.random.default_rng(0).normal(0, 0.1, 40))
+
+
+def test_store_matches_payout_grid(payout_inputs, cumulative_forex_change, tmp_path):
+    blocks, meta_data = calc_payout_blocks(cumulative_forex_change, **payout_inputs)
+    save_payout_store(blocks, tmp_path / "simulated_payout_test.json")
+
+    payout_data = load_payout_data(tmp_path / "simulated_payout_test.json")
+
+    expected_payout, expected_meta = calc_final_payout_grid(
+        cumulative_forex_change, **payout_inputs
+    )
+    pd.testing.assert_frame_equal(payout_data, expected_payout)
+    pd.testing.assert_frame_equal(meta_data, expected_meta)
+
+
+def test_store_reads_selected_configurations_and_columns(
+    payout_inputs, cumulative_forex_change, tmp_path
+):
+    cumulative_forex_changes = {
+        21: cumulative_forex_change.iloc[:30] / 4,
+        262: cumulative_forex_change,
+    }
+    blocks, meta_data = calc_payout_blocks(cumulative_forex_changes, **payout_inputs)
+    save_payout_store(blocks, tmp_path / "simulated_payout_test.json")
+
+    swap_config_id = list(meta_data.index[[12, 3]])
+    payout_data = load_payout_data(
+        tmp_path / "simulated_payout_test.json",
+        swap_config_id=swap_config_id,
+        columns=["EURshort payout in EURO"],
+    )
+
+    expected_payout, expected_meta = calc_final_payout_by_horizon(
+        cumulative_forex_changes, **payout_inputs
+    )
+    pd.testing.assert_frame_equal(meta_data, expected_meta)
+    assert list(load_payout_index(tmp_path / "simulated_payout_test.json").index) == (
+        list(meta_data.index)
+    )
+    assert list(payout_data.columns) == ["EURshort payout in EURO"]
+    pd.testing.assert_frame_equal(
+        payout_data,
+        expected_payout.loc[swap_config_id, ["EURshort payout in EURO"]],
+        check_index_type=False,
+    )
+
+
+def test_store_appends_new_configurations(
+    payout_inputs, cumulative_forex_change, tmp_path
+):
+    sidecar_path = tmp_path / "simulated_payout_test.json"
+    blocks, _ = calc_payout_blocks(cumulative_forex_change, **payout_inputs)
+    save_payout_store(blocks, sidecar_path)
+    stored_files = {path: path.stat().st_mtime_ns for path in tmp_path.glob("*.npy")}
+
+    grown_inputs = {**payout_inputs, "leverage": payout_inputs["leverage"] + [20]}
+    blocks, meta_data = calc_payout_blocks(
+        cumulative_forex_change,
+        **grown_inputs,
+        stored_index=stored_payout_index(sidecar_path),
+    )
+    save_payout_store(blocks, sidecar_path, append=True)
+
+    expected_payout, _ = calc_final_payout_grid(cumulative_forex_change, **grown_inputs)
+    assert len(blocks[0][2]) == 3
+    assert all(
+        path.stat().st_mtime_ns == mtime for path, mtime in stored_files.items()
+    )
+    pd.testing.assert_frame_equal(
+        load_payout_data(sidecar_path, swap_config_id=meta_data.index),
+        expected_payout,
+        check_index_type=False,
+    )
+
+
+def test_store_drops_configurations_of_outdated_paths(
+    payout_inputs, cumulative_forex_change, tmp_path
+):
+    sidecar_path = tmp_path / "simulated_payout_test.json"
+    blocks, _ = calc_payout_blocks(cumulative_forex_change, **payout_inputs)
+    save_payout_store(blocks, sidecar_path)
+
+    new_change = cumulative_forex_change * 2
+    blocks, meta_data = calc_payout_blocks(
+        new_change, **payout_inputs, stored_index=stored_payout_index(sidecar_path)
+    )
+    save_payout_store(blocks, sidecar_path, append=True)
+
+    expected_payout, _ = calc_final_payout_grid(new_change, **payout_inputs)
+    assert len(list(tmp_path.glob("*.npy"))) == 3
+    pd.testing.assert_frame_equal(
+        load_payout_data(sidecar_path), expected_payout, check_index_type=False
+    )
@@ -0,0 +1,66 @@
+""" Testing the parallel figure rendering. """
+from concurrent.futures import Future
+
+import matplotlib.pyplot as plt
+import pytest
+
+from src.simulation_analysis import rendering
+from src.simulation_analysis.rendering import render_figures
+
+
+def _plot_line(value, figure_path):
+    fig, ax = plt.subplots()
+    ax.plot([0, 1], [0, value])
+    fig.savefig(figure_path)
+
+
+def _plot_failing(figure_path):
+    plt.subplots()
+    raise ValueError("cannot plot")
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_render_figures_saves_and_closes_figures(n_workers, tmp_path):
+    figure_paths = [tmp_path / f"figure_{i}.png" for i in range(3)]
+
+    render_figures(
+        [(_plot_line, (i, figure_path)) for i, figure_path in enumerate(figure_paths)],
+        n_workers=n_workers,
+    )
+
+    assert all(figure_path.exists() for figure_path in figure_paths)
+    assert plt.get_fignums() == []
+
+
+def test_render_figures_reraises_and_closes_on_error(tmp_path):
+    with pytest.raises(ValueError, match="cannot plot"):
+        render_figures([(_plot_failing, (tmp_path / "figure.png",))], n_workers=1)
+    assert plt.get_fignums() == []
+
+
+class _InlineExecutor:
+    # runs the jobs in this process and records the requested number of workers
+    max_workers = []
+
+    def __init__(self, max_workers, **kwargs):
+        self.max_workers.append(max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, function, *args):
+        future = Future()
+        future.set_result(function(*args))
+        return future
+
+
+def test_default_workers_are_capped(monkeypatch, tmp_path):
+    monkeypatch.setattr(rendering, "ProcessPoolExecutor", _InlineExecutor)
+    monkeypatch.setattr(rendering.os, "cpu_count", lambda: 64)
+
+    render_figures([(_plot_line, (i, tmp_path / f"figure_{i}.png")) for i in range(8)])
+
+    assert _InlineExecutor.max_workers == [rendering.MAX_DEFAULT_WORKERS]
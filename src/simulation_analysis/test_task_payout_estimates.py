@@ -0,0 +1,96 @@
+""" Testing the variance-reduced payout estimators. """
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.simulation_analysis.task_payout_estimates import calc_payout_estimates
+from src.simulation_analysis.task_payout_estimates import estimate_payout_statistics
+from src.simulation_analysis.task_swap_payout import calc_payout_summary
+from src.financial_contracts.swap_contract import PAYOUT_SUM_COLUMNS
+
+
+@pytest.fixture
+def payout_inputs():
+    out = {}
+    out["leverage"] = [2, 10]
+    out["USD_asset_allocation"] = [0, 0.5]
+    out["scenario_config"] = {
+        "return_on_euro_deposits": [0.0, 0.01],
+        "return_on_usd_deposits": 0.02,
+    }
+    return out
+
+
+@pytest.fixture
+def cumulative_forex_change():
+    return pd.Series(np.random.default_rng(0).normal(0.01, 0.1, 400))
+
+
+def test_plain_estimates_are_sample_means(cumulative_forex_change, payout_inputs):
+    estimates = estimate_payout_statistics(
+        cumulative_forex_change, **payout_inputs, chunk_size=70
+    )
+
+    summary = calc_payout_summary(cumulative_forex_change, **payout_inputs)
+    pd.testing.assert_frame_equal(
+        estimates[summary.columns], summary, check_dtype=False
+    )
+    # standard error of the mean payout of one configuration
+    eurlong_payout = 1 + 2 * cumulative_forex_change  # leverage 2, no USD assets
+    assert estimates["EURlong payout in USD std_error"].iloc[0] == pytest.approx(
+        eurlong_payout.std() / np.sqrt(400)
+    )
+
+
+def test_control_variate_reduces_standard_error(
+    cumulative_forex_change, payout_inputs
+):
+    plain = estimate_payout_statistics(cumulative_forex_change, **payout_inputs)
+    controlled = estimate_payout_statistics(
+        cumulative_forex_change, **payout_inputs, expected_change=0.01
+    )
+
+    columns = [f"{column} std_error" for column in PAYOUT_SUM_COLUMNS[1:]]
+    assert (controlled[columns] <= plain[columns] + 1e-8).all(axis=None)
+    assert (
+        controlled["EURlong payout in EURO std_error"]
+        < 0.2 * plain["EURlong payout in EURO std_error"]
+    ).all()
+    # the estimate moves towards the known mean of the cumulative change
+    shift = cumulative_forex_change.mean() - 0.01
+    assert np.sign(
+        plain["EURlong payout in USD"] - controlled["EURlong payout in USD"]
+    ).iloc[0] == np.sign(shift)
+
+
+def test_antithetic_standard_error_uses_pair_means(payout_inputs):
+    drawn = np.random.default_rng(1).normal(0.01, 0.1, 200)
+    pairs = np.empty(400)
+    pairs[0::2], pairs[1::2] = drawn, 0.02 - drawn
+
+    estimates = estimate_payout_statistics(
+        pairs, **payout_inputs, expected_change=0.01, antithetic=True, chunk_size=51
+    )
+
+    plain = estimate_payout_statistics(pairs, **payout_inputs)
+    np.testing.assert_allclose(
+        estimates[PAYOUT_SUM_COLUMNS], plain[PAYOUT_SUM_COLUMNS], atol=1e-12
+    )
+    # payouts are affine in the exchange rate, so antithetic pairs remove most noise
+    assert (
+        estimates["EURlong payout in USD std_error"]
+        < 0.1 * plain["EURlong payout in USD std_error"]
+    ).all()
+
+
+def test_multi_horizon_estimates_match_summary_ids(
+    cumulative_forex_change, payout_inputs
+):
+    changes = {5: cumulative_forex_change / 2, 10: cumulative_forex_change}
+
+    estimates = calc_payout_estimates(
+        changes, **payout_inputs, trading_days=[5, 10], mean_return=0.001
+    )
+
+    summary = calc_payout_summary(changes, **payout_inputs)
+    pd.testing.assert_index_equal(estimates.index, summary.index)
@@ -0,0 +1,117 @@
+""" Testing the daily mark-to-market valuation along simulated paths. """
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.financial_contracts.swap_contract import apply_knock_out
+from src.financial_contracts.swap_contract import knock_out_day
+from src.financial_contracts.swap_contract import mark_to_market_array
+from src.simulation_analysis.task_swap_mark_to_market import (
+    aggregate_mark_to_market_chunks,
+)
+from src.simulation_analysis.task_swap_mark_to_market import iter_path_chunks
+from src.simulation_analysis.task_swap_mark_to_market import knock_out_day_quantiles
+from src.simulation_analysis.task_swap_mark_to_market import simulated_paths
+from src.simulation_analysis.task_swap_payout import grid_metadata
+
+
+@pytest.fixture
+def valuation_inputs():
+    out = {}
+    out["leverage"] = [2, 10]
+    out["USD_asset_allocation"] = [0, 0.5]
+    out["scenario_config"] = {
+        "return_on_euro_deposits": [0.0, 0.01],
+        "return_on_usd_deposits": 0.02,
+    }
+    return out
+
+
+@pytest.fixture
+def paths():
+    return pd.DataFrame(np.random.default_rng(0).normal(0, 0.02, (50, 30)))
+
+
+def test_aggregation_does_not_depend_on_chunking(paths, valuation_inputs):
+    results = [
+        aggregate_mark_to_market_chunks(
+            iter_path_chunks(paths, chunk_size), **valuation_inputs
+        )
+        for chunk_size in [7, 50]
+    ]
+
+    for chunked, unchunked in zip(*results):
+        pd.testing.assert_frame_equal(chunked, unchunked)
+    assert (results[0][0]["n_paths"] == 50).all()
+
+
+def test_aggregation_matches_per_configuration_values(paths, valuation_inputs):
+    summary, knock_out_distribution = aggregate_mark_to_market_chunks(
+        iter_path_chunks(paths, 20), **valuation_inputs, knock_out_barrier=0.5
+    )
+
+    meta_data = grid_metadata(**valuation_inputs)
+    pd.testing.assert_index_equal(summary.index, meta_data.index)
+    for swap_config_id, configuration in meta_data.iterrows():
+        value_paths = mark_to_market_array(
+            paths.to_numpy(),
+            1,
+            configuration["USD_asset_allocation"],
+            configuration["leverage"],
+            configuration["return_on_euro_deposits"],
+            configuration["return_on_usd_deposits"],
+        )
+        eurlong_value, eurshort_value = (
+            apply_knock_out(value, knock_out_day(value, 0.5)) for value in value_paths
+        )
+        # knocked-out certificates stop losing value
+        assert (eurlong_value.min(axis=1) >= value_paths[0].min(axis=1)).all()
+        is_negative = (eurlong_value < 0) | (eurshort_value < 0)
+        row = summary.loc[swap_config_id]
+        assert row["negative_value"] == pytest.approx(is_negative.any(axis=1).mean())
+        assert row["min EURlong value in USD"] == pytest.approx(
+            eurlong_value.min(axis=1).mean()
+        )
+        assert row["days with negative value"] == pytest.approx(
+            is_negative.sum(axis=1).mean()
+        )
+        day = knock_out_day(value_paths[1], 0.5)
+        assert row["knock_out EURshort"] == pytest.approx((day >= 0).mean())
+        np.testing.assert_allclose(
+            knock_out_distribution.loc[(swap_config_id, "EURshort")].to_numpy(),
+            np.bincount(day[day >= 0], minlength=paths.shape[1]) / len(paths),
+        )
+
+
+def test_simulated_paths_uses_longest_horizon(paths):
+    sample = {"paths": {10: paths.iloc[:, :10], 30: paths}, "total_returns": {}}
+
+    assert simulated_paths(sample) is paths
+    with pytest.raises(AssertionError):
+        simulated_paths(paths.sum(axis=1))
+
+
+def test_knock_out_day_quantiles():
+    knock_out_distribution = pd.DataFrame(
+        [[0.1, 0.0, 0.3, 0.0], [0.0, 0.0, 0.0, 0.0]],
+        columns=pd.RangeIndex(1, 5, name="day"),
+    )
+
+    quantiles = knock_out_day_quantiles(knock_out_distribution, quantiles=(0.2, 0.5))
+
+    np.testing.assert_array_equal(quantiles.iloc[0], [1, 3])
+    assert quantiles.iloc[1].isna().all()
+
+
+def test_knocked_out_paths_are_terminated(valuation_inputs):
+    # the exchange rate falls far enough to knock out EURlong, then recovers
+    paths = pd.DataFrame([[-0.3, 0.0, 0.6]])
+
+    summary, _ = aggregate_mark_to_market_chunks(
+        iter_path_chunks(paths, 1), **valuation_inputs
+    )
+
+    row = summary.iloc[-1]  # leverage 10
+    assert row["knock_out EURlong"] == 1
+    # without knock-out EURlong would be positive again on the last day
+    assert row["days with negative value"] == 3
@@ -0,0 +1,277 @@
+""" Testing the payout stage on a grid of swap configurations. """
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.financial_contracts.swap_contract import payout_currency_swap_array
+from src.simulation_analysis.task_swap_payout import aggregate_final_payout_chunks
+from src.simulation_analysis.task_swap_payout import aggregate_final_payout_rate_paths
+from src.simulation_analysis.task_swap_payout import calc_final_payout
+from src.simulation_analysis.task_swap_payout import calc_final_payout_by_horizon
+from src.simulation_analysis.task_swap_payout import calc_final_payout_grid
+from src.simulation_analysis.task_swap_payout import calc_payout_summary
+from src.simulation_analysis.task_swap_payout import grid_metadata
+from src.simulation_analysis.utility import join_metadata
+from src.simulation_analysis.utility import load_cumulative_change
+from src.simulation_analysis.utility import scenario_grid
+from src.simulation_analysis.utility import select_longest_horizon
+
+
+@pytest.fixture
+def payout_inputs():
+    out = {}
+    out["cumulative_forex_change"] = pd.Series(
+        np.random.default_rng(0).normal(0, 0.1, 40)
+    )
+    out["leverage"] = [2, 5, 10]
+    out["USD_asset_allocation"] = [0, 0.3, 1]
+    out["scenario_config"] = {
+        "return_on_euro_deposits": 0.01,
+        "return_on_usd_deposits": 0.02,
+    }
+    return out
+
+
+def test_payout_grid_matches_per_configuration_loop(payout_inputs):
+    payout_data, meta_data = calc_final_payout_grid(**payout_inputs)
+
+    swap_config_ids = iter(meta_data.index)
+    for leverage in payout_inputs["leverage"]:
+        for USD_asset_allocation in payout_inputs["USD_asset_allocation"]:
+            swap_config_id = next(swap_config_ids)
+            expected_payout = calc_final_payout(
+                payout_inputs["cumulative_forex_change"],
+                leverage,
+                USD_asset_allocation,
+                payout_inputs["scenario_config"],
+            )
+            realized_payout = payout_data.loc[swap_config_id]
+            np.testing.assert_allclose(
+                realized_payout[expected_payout.columns].to_numpy(),
+                expected_payout.to_numpy(),
+            )
+            assert meta_data.loc[swap_config_id, "leverage"] == leverage
+            assert (
+                meta_data.loc[swap_config_id, "USD_asset_allocation"]
+                == USD_asset_allocation
+            )
+
+
+def test_chunked_aggregation_matches_mean_of_payout_grid(payout_inputs):
+    cumulative_forex_change = payout_inputs.pop("cumulative_forex_change")
+    payout_data, _ = calc_final_payout_grid(cumulative_forex_change, **payout_inputs)
+    payout_data["negative_payout"] = (
+        payout_data[["EURlong payout in EURO", "EURshort payout in EURO"]] < 0
+    ).any(axis=1)
+    expected_summary = payout_data.groupby("swap_config_id", sort=False).mean()
+
+    chunks = [cumulative_forex_change.iloc[i : i + 15] for i in range(0, 40, 15)]
+    summary = aggregate_final_payout_chunks(chunks, **payout_inputs)
+
+    assert (summary["n_paths"] == 40).all()
+    pd.testing.assert_frame_equal(
+        summary.drop(columns="n_paths"),
+        expected_summary[summary.columns.drop("n_paths")],
+        check_dtype=False,
+    )
+
+
+def test_rate_path_aggregation_matches_accrued_returns(payout_inputs):
+    cumulative_forex_change = payout_inputs["cumulative_forex_change"].to_numpy()
+    rng = np.random.default_rng(1)
+    euro_rates = rng.normal(0.0001, 0.00005, (40, 10))
+    usd_rates = rng.normal(0.0002, 0.00005, (40, 10))
+    chunks = [
+        (
+            cumulative_forex_change[i : i + 15],
+            euro_rates[i : i + 15],
+            usd_rates[i : i + 15],
+        )
+        for i in range(0, 40, 15)
+    ]
+
+    summary = aggregate_final_payout_rate_paths(
+        chunks, payout_inputs["leverage"], payout_inputs["USD_asset_allocation"]
+    )
+
+    # payout of every path with its own accrued deposit returns
+    eurlong_payout, eurshort_payout = payout_currency_swap_array(
+        1 + cumulative_forex_change[np.newaxis, np.newaxis, :],
+        1,
+        np.array(payout_inputs["USD_asset_allocation"])[np.newaxis, :, np.newaxis],
+        np.array(payout_inputs["leverage"])[:, np.newaxis, np.newaxis],
+        np.prod(1 + euro_rates, axis=1) - 1,
+        np.prod(1 + usd_rates, axis=1) - 1,
+    )
+    assert (summary["n_paths"] == 40).all()
+    np.testing.assert_allclose(
+        summary["EURlong payout in USD"], eurlong_payout.mean(axis=-1).reshape(-1)
+    )
+    np.testing.assert_allclose(
+        summary["EURshort payout in USD"], eurshort_payout.mean(axis=-1).reshape(-1)
+    )
+    assert list(grid_metadata([2], [0.5]).columns) == [
+        "leverage",
+        "USD_asset_allocation",
+    ]
+
+
+def test_join_metadata_matches_merge(payout_inputs):
+    payout_data, meta_data = calc_final_payout_grid(**payout_inputs)
+    shuffled_meta_data = meta_data.sample(frac=1, random_state=0)
+
+    joined = join_metadata(payout_data, shuffled_meta_data)
+
+    expected = payout_data.merge(
+        meta_data, left_index=True, right_index=True, validate="many_to_one"
+    )
+    pd.testing.assert_frame_equal(joined, expected)
+
+
+def test_join_metadata_raises_on_missing_configuration(payout_inputs):
+    payout_data, meta_data = calc_final_payout_grid(**payout_inputs)
+
+    with pytest.raises(AssertionError, match="Rows can not be merged"):
+        join_metadata(payout_data, meta_data.drop(index=meta_data.index[4]))
+
+
+def test_load_cumulative_change_returns_copies(tmp_path):
+    data_path = tmp_path / "simulated_data_test.pickle"
+    pd.DataFrame(np.ones((3, 4))).to_pickle(data_path)
+
+    cumulative_change = load_cumulative_change(data_path)
+    cumulative_change[:] = 0
+
+    pd.testing.assert_series_equal(
+        load_cumulative_change(data_path), pd.Series(np.full(3, 4.0))
+    )
+
+
+""" test multi-horizon payout """
+
+
+def test_payout_by_horizon_stacks_horizon_grids(payout_inputs):
+    cumulative_forex_change = payout_inputs.pop("cumulative_forex_change")
+    cumulative_forex_changes = {
+        21: cumulative_forex_change,
+        262: cumulative_forex_change.iloc[:30] * 2,
+    }
+
+    payout_data, meta_data = calc_final_payout_by_horizon(
+        cumulative_forex_changes, **payout_inputs
+    )
+
+    assert meta_data.index.is_unique
+    assert list(meta_data["trading_days"]) == [21] * 9 + [262] * 9
+    for i, horizon in enumerate([21, 262]):
+        expected_payout, expected_meta = calc_final_payout_grid(
+            cumulative_forex_changes[horizon], **payout_inputs
+        )
+        horizon_ids = meta_data.index[9 * i : 9 * i + 9]
+        realized_payout = payout_data.loc[horizon_ids]
+        np.testing.assert_allclose(realized_payout, expected_payout)
+        np.testing.assert_array_equal(
+            meta_data.loc[horizon_ids].drop(columns="trading_days"), expected_meta
+        )
+
+
+def test_select_longest_horizon(payout_inputs):
+    cumulative_forex_change = payout_inputs.pop("cumulative_forex_change")
+    payout_data, meta_data = calc_final_payout_by_horizon(
+        {21: cumulative_forex_change, 262: cumulative_forex_change * 2},
+        **payout_inputs,
+    )
+
+    longest_payout, longest_meta = select_longest_horizon(payout_data, meta_data)
+
+    assert list(longest_meta.columns) == [
+        "leverage",
+        "USD_asset_allocation",
+        "return_on_euro_deposits",
+        "return_on_usd_deposits",
+    ]
+    assert list(longest_meta.index) == list(meta_data.index[9:])
+    assert set(longest_payout.index) == set(meta_data.index[9:])
+    assert len(longest_payout) == 9 * 40
+
+
+def test_configuration_ids_are_stable_when_the_grid_grows(payout_inputs):
+    _, meta_data = calc_final_payout_grid(**payout_inputs)
+    _, grown_meta_data = calc_final_payout_grid(
+        payout_inputs["cumulative_forex_change"],
+        payout_inputs["leverage"] + [20],
+        [0.5] + payout_inputs["USD_asset_allocation"],
+        payout_inputs["scenario_config"],
+    )
+    _, horizon_meta_data = calc_final_payout_by_horizon(
+        {262: payout_inputs["cumulative_forex_change"]},
+        payout_inputs["leverage"],
+        payout_inputs["USD_asset_allocation"],
+        payout_inputs["scenario_config"],
+    )
+
+    pd.testing.assert_frame_equal(
+        grown_meta_data.loc[meta_data.index].astype(float), meta_data.astype(float)
+    )
+    assert len(grown_meta_data) == 16 and grown_meta_data.index.is_unique
+    assert not horizon_meta_data.index.isin(meta_data.index).any()
+
+
+def test_scenario_grid_is_one_broadcast_axis(payout_inputs):
+    scenario_config = {
+        "return_on_euro_deposits": [0.0, 0.01],
+        "return_on_usd_deposits": [0.0, 0.02, 0.05],
+    }
+
+    payout_data, meta_data = calc_final_payout_grid(
+        payout_inputs["cumulative_forex_change"],
+        payout_inputs["leverage"],
+        payout_inputs["USD_asset_allocation"],
+        scenario_config,
+    )
+    summary = calc_payout_summary(
+        payout_inputs["cumulative_forex_change"],
+        payout_inputs["leverage"],
+        payout_inputs["USD_asset_allocation"],
+        scenario_config,
+    )
+
+    assert len(meta_data) == 6 * 9 and meta_data.index.is_unique
+    assert summary.index.equals(meta_data.index)
+    for scenario in scenario_grid(scenario_config).to_dict("records"):
+        expected_payout, expected_meta = calc_final_payout_grid(
+            payout_inputs["cumulative_forex_change"],
+            payout_inputs["leverage"],
+            payout_inputs["USD_asset_allocation"],
+            scenario,
+        )
+        pd.testing.assert_frame_equal(
+            payout_data.loc[expected_meta.index], expected_payout
+        )
+        pd.testing.assert_frame_equal(meta_data.loc[expected_meta.index], expected_meta)
+
+
+def test_scenario_grid_reads_rate_pairs():
+    scenarios = scenario_grid(
+        {
+            "scenarios": [
+                {"return_on_euro_deposits": 0.01, "return_on_usd_deposits": 0.02},
+                {"return_on_euro_deposits": -0.005, "return_on_usd_deposits": 0.05},
+            ]
+        }
+    )
+
+    single_scenario = scenario_grid(
+        {"return_on_euro_deposits": 0, "return_on_usd_deposits": 0}
+    )
+    np.testing.assert_array_equal(scenarios, [[0.01, 0.02], [-0.005, 0.05]])
+    np.testing.assert_array_equal(single_scenario, [[0.0, 0.0]])
+
+
+def test_select_longest_horizon_keeps_single_horizon(payout_inputs):
+    payout_data, meta_data = calc_final_payout_grid(**payout_inputs)
+
+    selected_payout, selected_meta = select_longest_horizon(payout_data, meta_data)
+
+    assert selected_payout is payout_data
+    assert selected_meta is meta_data
@@ -0,0 +1,85 @@
+""" Testing the aggregation of the payout figures. """
+import numpy as np
+import pandas as pd
+
+from src.simulation_analysis.task_swap_mark_to_market import (
+    aggregate_mark_to_market_chunks,
+)
+from src.simulation_analysis.task_swap_payout import calc_final_payout_grid
+from src.simulation_analysis.task_swap_payout import calc_payout_summary
+from src.simulation_analysis.task_swap_payout import grid_metadata
+from src.simulation_analysis.task_swap_payout_analysis import (
+    aggregate_knock_out_statistics,
+)
+from src.simulation_analysis.task_swap_payout_analysis import (
+    aggregate_payout_statistics,
+)
+
+
+def test_aggregate_payout_statistics_matches_groupby():
+    cumulative_forex_change = pd.Series(np.random.default_rng(0).normal(0, 0.1, 40))
+    payout_inputs = {
+        "leverage": [2, 5, 10],
+        "USD_asset_allocation": [0, 0.3, 1],
+        "scenario_config": {
+            "return_on_euro_deposits": 0.01,
+            "return_on_usd_deposits": 0.02,
+        },
+    }
+    payout_data, meta_data = calc_final_payout_grid(
+        cumulative_forex_change, **payout_inputs
+    )
+    payout_summary = calc_payout_summary(cumulative_forex_change, **payout_inputs)
+
+    config_statistics, path_statistics = aggregate_payout_statistics(
+        payout_summary, payout_summary[["negative_payout"]], payout_data, meta_data
+    )
+
+    total_payout_EUR = (
+        payout_data["EURlong payout in EURO"] + payout_data["EURshort payout in EURO"]
+    )
+    np.testing.assert_allclose(
+        config_statistics["total payout in EURO"],
+        total_payout_EUR.groupby("swap_config_id", sort=False).mean(),
+    )
+    np.testing.assert_allclose(
+        path_statistics["total payout in EURO"], total_payout_EUR
+    )
+    pd.testing.assert_frame_equal(config_statistics[meta_data.columns], meta_data)
+    assert (
+        path_statistics["leverage"].to_numpy() == np.repeat(meta_data["leverage"], 40)
+    ).all()
+
+
+def test_knock_out_statistics_of_baseline_scenario():
+    paths = np.random.default_rng(0).normal(0, 0.02, (40, 25))
+    valuation_inputs = {
+        "leverage": [2, 10],
+        "USD_asset_allocation": [0, 0.5],
+        "scenario_config": {
+            "return_on_euro_deposits": [0.0, 0.05],
+            "return_on_usd_deposits": 0.0,
+        },
+    }
+    summary, knock_out_distribution = aggregate_mark_to_market_chunks(
+        [paths], **valuation_inputs
+    )
+
+    config_statistics, cumulative_knock_out = aggregate_knock_out_statistics(
+        summary, knock_out_distribution, grid_metadata(**valuation_inputs)
+    )
+
+    assert len(config_statistics) == 4
+    assert (config_statistics["return_on_euro_deposits"] == 0).all()
+    np.testing.assert_allclose(
+        config_statistics["knock_out EURlong"],
+        cumulative_knock_out.xs("EURlong", level="certificate").iloc[:, -1],
+    )
+    is_knocked_out = config_statistics["knock_out EURshort"] > 0
+    assert is_knocked_out.any()
+    assert (
+        config_statistics.loc[is_knocked_out, "knock_out day q10 EURshort"]
+        <= config_statistics.loc[is_knocked_out, "knock_out day q90 EURshort"]
+    ).all()
+    assert config_statistics.loc[~is_knocked_out, "knock_out day q50 EURshort"].isna().all()
+
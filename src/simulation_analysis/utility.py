@@ -1,12 +1,71 @@
 """ includes utility functions
 used in the analysis task_swap_payout.py/task_swap_payout_analysis.py"""
+import functools
 import os
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+
+from src.simulation.sample_store import load_simulated_sample
+
+SCENARIO_COLUMNS = ["return_on_euro_deposits", "return_on_usd_deposits"]
+
+
 def get_total_exchange_rate_change(raw_data):
+    if isinstance(raw_data, dict) and "total_returns" in raw_data:
+        # multi-horizon full-path simulations carry their cumulative returns
+        return raw_data["total_returns"]
+    if isinstance(raw_data, dict):
+        # multi-horizon summary-only simulations are keyed by trading_days
+        return {
+            horizon: get_total_exchange_rate_change(horizon_data)
+            for horizon, horizon_data in raw_data.items()
+        }
+    if raw_data.ndim == 1:
+        # summary-only simulations already hold the cumulative change
+        return raw_data
     total_change = raw_data.sum(axis="columns")
     return total_change
 
+
+def load_cumulative_change(data_path):
+    """Load simulated returns and reduce them to the cumulative change of each
+    path. The reduction is cached per file (and modification time), so all tasks
+    and configurations working on the same simulation load and sum it once.
+    Callers get a copy of the cached result.
+
+    Args:
+        data_path (pathlib.Path): sidecar of the simulated sample store (memory
+        mapped, see src.simulation.sample_store) or path of pickled simulated
+        returns.
+
+    Returns:
+        (pd.Series): cumulative EUR/USD exchange rate change of each path
+        (dictionary of pd.Series keyed by trading_days for multi-horizon simulations).
+    """
+    data_path = Path(data_path)
+    cumulative_change = _load_cumulative_change(
+        data_path, data_path.stat().st_mtime_ns
+    )
+    # hand out copies, the cached reduction is shared by all callers
+    if isinstance(cumulative_change, dict):
+        return {
+            horizon: horizon_change.copy()
+            for horizon, horizon_change in cumulative_change.items()
+        }
+    return cumulative_change.copy()
+
+
+@functools.lru_cache(maxsize=8)
+def _load_cumulative_change(data_path, mtime):
+    if data_path.suffix == ".json":
+        raw_data = load_simulated_sample(data_path)
+    else:
+        raw_data = pd.read_pickle(data_path)
+    return get_total_exchange_rate_change(raw_data)
+
+
 def generate_missing_directories(out_paths):
     """Generate directories if they do not exist
 
@@ -20,38 +79,30 @@ def generate_missing_directories(out_paths):
     print("hello")
 
 
-def merge_many_to_one_metadata(not_aggregated_data, metadata):
-    """ m : 1 merge. Raises error if rows are only identified
-        in one dataset """
-    merged_dataset = not_aggregated_data.merge(
-        metadata,
-        left_index=True,
-        right_index=True,
-        validate="many_to_one",
-        indicator=True,
-    )
-    assert not (
-        merged_dataset["_merge"] != "both"
-    ).any(), "Rows can not be merged/ Metadata fraudulent"
-    merged_dataset.drop(columns=["_merge"], inplace=True)
-    return merged_dataset
-
-
-def merge_one_to_one_metadata(aggregated_data, metadata):
-    """ 1 : 1 merge. Raises error if rows are only identified
-    in one dataset """
-    merged_dataset = aggregated_data.merge(
-        metadata,
-        left_index=True,
-        right_index=True,
-        validate="one_to_one",
-        indicator=True,
+def join_metadata(data, metadata):
+    """ m : 1 join of metadata columns by position. Every swap_config_id of data is
+    translated to its row in metadata once (hash lookup) and the metadata columns
+    are gathered with these codes; no merge is run. Raises error if rows of data
+    have no metadata.
+
+    Args:
+        data (pd.DataFrame): dataset indexed by swap_config_id (one or many rows per
+        configuration).
+        metadata (pd.DataFrame): dataset with metainformation about run, unique
+        swap_config_id.
+
+    Returns:
+        (pd.DataFrame): data with the metadata columns appended.
+    """
+    assert metadata.index.is_unique, "Metadata fraudulent"
+    config_codes = metadata.index.get_indexer(data.index)
+    assert (config_codes >= 0).all(), "Rows can not be merged/ Metadata fraudulent"
+    return data.assign(
+        **{
+            column: metadata[column].to_numpy()[config_codes]
+            for column in metadata.columns
+        }
     )
-    assert not (
-        merged_dataset["_merge"] != "both"
-    ).any(), "Rows can not be merged/ Metadata fraudulent"
-    merged_dataset.drop(columns=["_merge"], inplace=True)
-    return merged_dataset
 
 def extract_simulation_name(data_path): 
     """ expected path is from type /filename_with_underscore_SimulationName
@@ -66,3 +117,64 @@ def extract_simulation_name(data_path):
     filename = data_path.stem 
     simulation_name = filename[filename.rfind('_') + 1:]
     return simulation_name
+
+
+def select_longest_horizon(payout_data, metadata):
+    """Restrict multi-horizon payout data to the longest simulated horizon.
+    Single-horizon data is returned unchanged.
+
+    Args:
+        payout_data (pd.DataFrame): dataset with payout data
+        metadata (pd.DataFrame): dataset with metainformation about run
+
+    Returns:
+        (pd.DataFrame, pd.DataFrame): payout data and metadata of the longest horizon.
+    """
+    if "trading_days" not in metadata.columns:
+        return payout_data, metadata
+    metadata = metadata[metadata["trading_days"] == metadata["trading_days"].max()]
+    payout_data = payout_data[payout_data.index.isin(metadata.index)]
+    return payout_data, metadata.drop(columns="trading_days")
+
+
+def scenario_grid(scenario_config):
+    """Deposit-return scenarios of scenario_config.json. Every deposit return is a
+    number or a list of numbers (all combinations are evaluated), or "scenarios"
+    holds a list of {return_on_euro_deposits, return_on_usd_deposits} pairs.
+
+    Args:
+        scenario_config (dict): assumed macroeconomic conditions.
+
+    Returns:
+        (pd.DataFrame): one row of SCENARIO_COLUMNS per scenario.
+    """
+    if "scenarios" in scenario_config:
+        scenarios = pd.DataFrame(scenario_config["scenarios"], columns=SCENARIO_COLUMNS)
+        assert scenarios.notna().all(axis=None), "Scenario without deposit return"
+    else:
+        rates = np.meshgrid(
+            *(np.atleast_1d(scenario_config[column]) for column in SCENARIO_COLUMNS),
+            indexing="ij",
+        )
+        scenarios = pd.DataFrame(
+            {column: rate.reshape(-1) for column, rate in zip(SCENARIO_COLUMNS, rates)}
+        )
+    return scenarios.astype(np.float64)
+
+
+def select_baseline_scenario(payout_data, metadata):
+    """Restrict payout data to the first deposit-return scenario of
+    scenario_config.json (see scenario_grid).
+
+    Args:
+        payout_data (pd.DataFrame): dataset with payout data
+        metadata (pd.DataFrame): dataset with metainformation about run
+
+    Returns:
+        (pd.DataFrame, pd.DataFrame): payout data and metadata of the baseline
+        scenario.
+    """
+    baseline = metadata[SCENARIO_COLUMNS].iloc[0]
+    metadata = metadata[(metadata[SCENARIO_COLUMNS] == baseline).all(axis=1)]
+    payout_data = payout_data[payout_data.index.isin(metadata.index)]
+    return payout_data, metadata
@@ -0,0 +1,98 @@
+""" Testing the content-addressed result cache. """
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.result_cache import content_hash
+from src.result_cache import load_or_compute
+from src.simulation.task_simulate_sample import generate_historical_returns
+from src.simulation.task_simulate_sample import generate_bootstrapped_returns
+from src.simulation.task_simulate_sample import simulation_cache_key
+from src.simulation_analysis.task_swap_payout import calc_payout_blocks
+
+
+@pytest.fixture
+def log_return():
+    dates = pd.date_range("1999-01-05", periods=30, freq="B")
+    return pd.Series(np.random.default_rng(0).normal(0, 0.01, 30), index=dates)
+
+
+@pytest.fixture
+def sim_config():
+    return {
+        "trading_days": 5,
+        "bootsstrap_sim_num": 10,
+        "simulation_seed": 1,
+        "summary_only": False,
+        "bootstrap_engine": "native",
+        "bootstrap_chunk_size": 5,
+        "bootstrap_workers": 1,
+    }
+
+
+def test_content_hash_depends_on_contents_only():
+    values = np.arange(4.0)
+    assert content_hash(values, {"a": 1, "b": [2]}) == content_hash(
+        values.copy(), {"b": [2], "a": 1}
+    )
+    assert content_hash(values) != content_hash(values.astype(np.float32))
+    assert content_hash(values) != content_hash(values.reshape(2, 2))
+    assert content_hash("1") != content_hash(1)
+
+
+def test_load_or_compute_computes_once(tmp_path):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return np.arange(3)
+
+    for _ in range(2):
+        result = load_or_compute("test", content_hash("key"), compute, tmp_path)
+
+    np.testing.assert_array_equal(result, np.arange(3))
+    assert len(calls) == 1
+
+
+def test_simulation_key_ignores_irrelevant_fields(log_return, sim_config):
+    key = simulation_cache_key(generate_bootstrapped_returns, log_return, sim_config)
+
+    assert key == simulation_cache_key(
+        generate_bootstrapped_returns,
+        log_return.copy(),
+        {**sim_config, "bootstrap_workers": 4},
+    )
+    assert key == simulation_cache_key(
+        generate_bootstrapped_returns, log_return, {**sim_config, "figure_workers": 2}
+    )
+    assert key != simulation_cache_key(
+        generate_bootstrapped_returns, log_return, {**sim_config, "simulation_seed": 2}
+    )
+    assert key != simulation_cache_key(
+        generate_bootstrapped_returns, log_return * 2, sim_config
+    )
+    assert simulation_cache_key(
+        generate_historical_returns, log_return, sim_config
+    ) == simulation_cache_key(
+        generate_historical_returns, log_return, {**sim_config, "simulation_seed": 2}
+    )
+
+
+def test_cached_payout_blocks_only_compute_new_cells(tmp_path):
+    cumulative_forex_change = pd.Series(np.random.default_rng(0).normal(0, 0.1, 40))
+    scenario_config = {"return_on_euro_deposits": 0.01, "return_on_usd_deposits": 0.02}
+
+    calc_payout_blocks(
+        cumulative_forex_change, [2, 5], [0, 0.5], scenario_config, tmp_path
+    )
+    n_cached = len(list(tmp_path.rglob("*.pickle")))
+    blocks, _ = calc_payout_blocks(
+        cumulative_forex_change, [2, 5, 10], [0, 0.5], scenario_config, tmp_path
+    )
+
+    expected_blocks, _ = calc_payout_blocks(
+        cumulative_forex_change, [2, 5, 10], [0, 0.5], scenario_config
+    )
+    assert (n_cached, len(list(tmp_path.rglob("*.pickle")))) == (4, 6)
+    for column, values in expected_blocks[0][1].items():
+        np.testing.assert_allclose(blocks[0][1][column], values)